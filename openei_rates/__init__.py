@@ -12,15 +12,43 @@ __all__ = [
     "rate",
     "api",
     "openei_rates",
+    "cache",
+    "aio",
+    "catalog",
+    "table",
+    "snapshot",
+    "stream",
+    "accumulator",
 ]
 
+import importlib
 import logging
-import os
- 
-logging.basicConfig(level=os.environ.get("LOGLEVEL", "INFO"))
 
+# Logging is configured by the application, not the library
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
 
 
+def __getattr__(name):
+    # Submodules are imported on first use, so ``import openei_rates`` stays cheap
+    if name in __all__:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 
+def warmup(parallel: bool = False, full: bool = False):
+    """Compiles the pricing kernels ahead of the first bill. Compiled code is cached on disk,
+    so only the first process after an install or upgrade pays the full compile time.
+
+    :param  parallel:   (Optional) Whether to compile the multi-threaded kernels too. Defaults to ``False``.
+    :type   parallel:   ``bool``
+
+    :param  full:   (Optional) Whether to compile the kernels for every billing option, not just a default
+                    ``RateSchedule.get_costs``. Defaults to ``False``.
+    :type   full:   ``bool``
+
+    :return:    The time taken, in seconds.
+    :rtype:     ``float``
+    """
+    from .helpers.warmup import compile_kernels
+    return compile_kernels(parallel, full)
@@ -0,0 +1,279 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .helpers.sched import tier_cost
+from .helpers.costs import cumulative_tier_costs_from
+
+
+class BillAccumulator(object):
+    """Keeps month-to-date charges for a single meter up to date as readings arrive.
+
+    Each ``push`` costs O(1): energy and coincident charges are added for the one reading,
+    the demand window is a rolling sum of the last ``span`` readings, and TOU periods are
+    looked up once per hour from the schedule's cached hourly tables.
+    """
+
+    columns = ['qty', 'energy_cost', 'tou_demand_cost', 'coincident_cost', 'flat_demand_cost', 'fixed_cost', 'total']
+
+    def __init__(
+        self,
+        rate_schedule,
+        interval: pd.Timedelta = pd.Timedelta('5min'),
+        cumulative_tiers: bool = False,
+        ):
+        """
+        :param  rate_schedule:  The schedule to bill against.
+        :type   rate_schedule:  `RateSchedule`
+
+        :param  interval:   (Optional) The spacing of the readings. Defaults to 5 minutes.
+        :type   interval:   ``pandas.Timedelta``
+
+        :param  cumulative_tiers:   If ``True``, energy tiers apply to cumulative usage within the month and TOU period.
+        :type   cumulative_tiers:   ``bool``
+        """
+        self.rate_schedule = rate_schedule
+        self.interval = pd.Timedelta(interval)
+        self.cumulative_tiers = cumulative_tiers
+
+        self.interval_hours = self.interval / pd.Timedelta('1h')
+        self.span = max(1, round(pd.Timedelta('{}min'.format(rate_schedule.demand_window)) / self.interval))
+
+        self.last_timestamp = None
+        self.month = None
+        self._hour = None
+
+    def _start_month(self, ts: pd.Timestamp, periods: tuple):
+        rs = self.rate_schedule
+
+        self.month = (ts.year, ts.month)
+        self.month_start = ts
+        self.count = 0
+        self.qty = 0.0
+        self.energy_cost = 0.0
+        self.coincident_cost = 0.0
+
+        self.window = deque()
+        self.window_sum = 0.0
+        # The best window so far: demand, start time and the periods at its start
+        self.peak = (0.0, ts, periods)
+
+        self.usage = np.zeros(rs.energy_rates.shape[0]) if rs.energy_rates is not None else None
+
+    def _periods(self, ts: pd.Timestamp):
+        # TOU periods only change on the hour
+        hour = (ts.year, ts.dayofyear, ts.hour)
+        if hour != self._hour:
+            rs = self.rate_schedule
+            SType = rs.SType
+            hour_of_year = (ts.dayofyear - 1) * 24 + ts.hour
+
+            def lookup(schedule_type):
+                table = rs.hourly_periods(ts.year, schedule_type)
+                return int(table[hour_of_year]) if table is not None else None
+
+            energy = (rs.energy_rates is not None) and (rs.energy_weekday_schedule is not None) and (rs.energy_weekend_schedule is not None)
+
+            self._hour = hour
+            self._hour_periods = (
+                lookup(SType.ENERGY) if energy else None,
+                lookup(SType.TOU_DEMAND),
+                lookup(SType.FLAT_DEMAND),
+                lookup(SType.COINCIDENT),
+            )
+        return self._hour_periods
+
+    def push(self, timestamp, kw: float):
+        """Adds a reading.
+
+        :param  timestamp:  The start of the reading's interval, after every reading pushed so far.
+                            Months and TOU periods follow its wall time, so tz-aware readings
+                            across a DST change are billed like ``RateSchedule.get_costs`` bills them.
+        :type   timestamp:  ``pandas.Timestamp``
+
+        :param  kw: Average power over the interval.
+        :type   kw: ``float``
+
+        :return:    The final charges of the previous month if this reading starts a new one, else ``None``.
+        :rtype:     ``pandas.Series``
+
+        :raises:    ``ValueError`` if **timestamp** is not after the previous reading.
+        """
+        rs = self.rate_schedule
+        stamp = pd.Timestamp(timestamp)
+
+        # Order by the instant; a fall-back hour repeats wall times
+        if self.last_timestamp is not None and stamp <= self.last_timestamp:
+            raise ValueError('Readings must be in order. {} is not after {}.'.format(stamp, self.last_timestamp))
+        self.last_timestamp = stamp
+
+        ts = stamp.tz_localize(None) if stamp.tz is not None else stamp
+
+        kw = float(kw)
+        periods = self._periods(ts)
+        energy_period, _, _, coincident_period = periods
+
+        closed = None
+        if (ts.year, ts.month) != self.month:
+            if self.month is not None:
+                closed = self.snapshot(final=True)
+            self._start_month(ts, periods)
+
+        self.count += 1
+        self.qty += kw
+
+        # Energy
+        kwh = kw * self.interval_hours
+        if energy_period is not None:
+            if self.cumulative_tiers:
+                self.energy_cost += cumulative_tier_costs_from(
+                    np.array([kwh]), np.array([energy_period], dtype=np.uint8), rs.energy_rates, self.usage
+                )[0]
+            else:
+                self.energy_cost += tier_cost(kwh, rs.energy_rates[energy_period])
+        else:
+            self.energy_cost += kwh * rs.default_energy_price
+
+        # Coincident
+        if (coincident_period is not None) and (rs.coincident_rates is not None):
+            self.coincident_cost += tier_cost(kw, rs.coincident_rates[coincident_period])
+
+        # Demand: a rolling window of the last span readings
+        self.window.append((kw, ts, periods))
+        self.window_sum += kw
+        if len(self.window) > self.span:
+            self.window_sum -= self.window.popleft()[0]
+        if len(self.window) == self.span:
+            demand = self.window_sum / self.span
+            if demand > self.peak[0]:
+                self.peak = (demand, self.window[0][1], self.window[0][2])
+
+        return closed
+
+    @property
+    def peak_demand(self):
+        """The month-to-date peak demand and the start of its window.
+
+        :rtype: ``tuple``
+        """
+        if self.month is None:
+            return 0.0, None
+
+        demand, start, _ = self.peak
+        # A month shorter than the demand window is one window
+        if self.count < self.span:
+            demand = max(0.0, self.qty / self.count)
+            start = self.month_start
+        return demand, start
+
+    def _peak_periods(self):
+        if self.count < self.span:
+            return self.window[0][2]
+        return self.peak[2]
+
+    def snapshot(self, final: bool = False):
+        """Returns the month-to-date charges.
+
+        :param  final:  If ``True``, the whole fixed charge is included. Otherwise it is prorated by
+                        the share of the month covered so far.
+        :type   final:  ``bool``
+
+        :return:    A ``pandas.Series`` with the same columns as ``RateSchedule.get_costs``, named by the month's end,
+                    or ``None`` before the first reading.
+        :rtype:     ``pandas.Series``
+        """
+        if self.month is None:
+            return None
+
+        rs = self.rate_schedule
+        demand, _ = self.peak_demand
+        _, demand_period, flat_period, _ = self._peak_periods()
+
+        tou_demand = 0.0
+        if demand_period is not None and rs.demand_rates is not None:
+            tou_demand = tier_cost(demand, rs.demand_rates[demand_period])
+
+        flat_demand = 0.0
+        if flat_period is not None and rs.flat_demand_rates is not None:
+            flat_demand = tier_cost(demand, rs.flat_demand_rates[flat_period])
+
+        month_end = pd.Timestamp(year=self.month[0], month=self.month[1], day=1) + pd.offsets.MonthEnd(0)
+
+        fixed = float(rs.fixed_monthly_charge)
+        if not final:
+            last = self.last_timestamp
+            if last.tz is not None:
+                last = last.tz_localize(None)
+            month_length = month_end + pd.Timedelta('1D') - pd.Timestamp(year=self.month[0], month=self.month[1], day=1)
+            fixed *= min(1.0, (last + self.interval - self.month_start) / month_length)
+
+        charges = pd.Series(
+            [self.qty, self.energy_cost, tou_demand, self.coincident_cost, flat_demand, fixed, 0.0],
+            index=self.columns,
+            name=month_end
+        )
+        charges['total'] = charges.iloc[1:-1].sum()
+        return charges
+
+    def checkpoint(self):
+        """Returns the accumulator's state as a JSON-serializable ``dict``.
+
+        :rtype: ``dict``
+        """
+        def stamp(ts):
+            return ts.isoformat() if ts is not None else None
+
+        state = {
+            'interval': self.interval.isoformat(),
+            'cumulative_tiers': self.cumulative_tiers,
+            'last_timestamp': stamp(self.last_timestamp),
+            'month': list(self.month) if self.month is not None else None,
+        }
+
+        if self.month is not None:
+            state.update({
+                'month_start': stamp(self.month_start),
+                'count': self.count,
+                'qty': self.qty,
+                'energy_cost': self.energy_cost,
+                'coincident_cost': self.coincident_cost,
+                'window': [[kw, stamp(ts), list(p)] for kw, ts, p in self.window],
+                'window_sum': self.window_sum,
+                'peak': [self.peak[0], stamp(self.peak[1]), list(self.peak[2])],
+                'usage': self.usage.tolist() if self.usage is not None else None,
+            })
+
+        return state
+
+    @classmethod
+    def restore(cls, rate_schedule, state: dict):
+        """Rebuilds an accumulator from ``checkpoint`` output.
+
+        :param  rate_schedule:  The schedule the checkpoint was taken against.
+        :type   rate_schedule:  `RateSchedule`
+
+        :param  state:  The checkpoint.
+        :type   state:  ``dict``
+
+        :rtype: `BillAccumulator`
+        """
+        def stamp(s):
+            return pd.Timestamp(s) if s is not None else None
+
+        acc = cls(rate_schedule, interval=pd.Timedelta(state['interval']), cumulative_tiers=state['cumulative_tiers'])
+        acc.last_timestamp = stamp(state['last_timestamp'])
+
+        if state['month'] is not None:
+            acc.month = tuple(state['month'])
+            acc.month_start = stamp(state['month_start'])
+            acc.count = state['count']
+            acc.qty = state['qty']
+            acc.energy_cost = state['energy_cost']
+            acc.coincident_cost = state['coincident_cost']
+            acc.window = deque((kw, stamp(ts), tuple(p)) for kw, ts, p in state['window'])
+            acc.window_sum = state['window_sum']
+            acc.peak = (state['peak'][0], stamp(state['peak'][1]), tuple(state['peak'][2]))
+            acc.usage = np.array(state['usage']) if state['usage'] is not None else None
+
+        return acc
@@ -0,0 +1,144 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .api import OpenEIApi
+from .rate import Rate
+from .cache import schedule_cache
+from . import logger
+
+
+class AsyncOpenEIApi(object):
+    """An asyncio counterpart of ``OpenEIApi``.
+
+    Queries run on a bounded thread pool over one ``OpenEIApi``, so they share its
+    connection pool, retries, rate limiting and response cache. At most
+    **concurrency** requests are in flight at once.
+    """
+
+    def __init__(self, api_key: str = None, api: OpenEIApi = None, concurrency: int = 10, **kwargs):
+        """
+        Creates an AsyncOpenEIApi client.
+
+        :param  api_key:    An OpenEI API key. Ignored if **api** is given.
+        :type   api_key:    ``str``
+
+        :param  api:    (Optional) An existing client to share. It is left open by ``close``. Otherwise one is
+                        created with a connection pool the size of **concurrency**, and **kwargs** are passed to it.
+        :type   api:    ``OpenEIApi``
+
+        :param  concurrency:    Maximum number of requests in flight.
+        :type   concurrency:    ``int``
+        """
+        # Only a client created here is closed with this one
+        self._owns_api = api is None
+        if api is None:
+            kwargs.setdefault('pool_size', concurrency)
+            api = OpenEIApi(api_key, **kwargs)
+
+        self.api = api
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Shuts down the worker threads, without blocking the event loop while requests
+        in flight finish, and closes the pooled connections of a client created here.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        if self._owns_api:
+            self.api.close()
+
+    async def run(self, func, *args):
+        """Runs a blocking call on the worker pool, bounded by the concurrency limit.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    async def rate_query(self, params: dict = {}):
+        """Asynchronous ``OpenEIApi.rate_query``.
+
+        :return:    A tuple of the HTTP status code and the response ``items``.
+        """
+        return await self.run(self.api.rate_query, params)
+
+
+class AsyncOpenEIRates(object):
+    """An asyncio counterpart of ``OpenEIRates`` for fetching many rates at once.
+    """
+
+    def __init__(self, api_key: str = None, api: AsyncOpenEIApi = None, concurrency: int = 10, **kwargs):
+
+        # A shared client is left open on exit
+        self._owns_api = api is None
+        self.api = api if api is not None else AsyncOpenEIApi(api_key, concurrency=concurrency, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._owns_api:
+            await self.api.close()
+
+    async def get_rate_by_label(self, label: str):
+        """Looks up a rate based on the rate's label.
+
+        :return:    A `Rate` if found, ``None`` if not found.
+        """
+        code, items = await self.api.rate_query({'getpage': label})
+
+        if code == 200 and items:
+            return Rate(items[0])
+        return None
+
+    async def get_rate_schedule(self, label: str, use_cache: bool = True):
+        """Fetches and builds the `RateSchedule` for a rate label.
+
+        :param  use_cache:  If ``True``, a schedule already parsed in this process for the label is reused,
+                            and a new one is stored, as by ``Rate.get_rate_schedule`` for a rate without a
+                            ``begin_date``. See ``cache.ScheduleCache``.
+        :type   use_cache:  ``bool``
+
+        :return:    A `RateSchedule` if found, ``None`` if not found.
+        """
+        if use_cache:
+            cached = schedule_cache.get(label)
+            if cached is not None:
+                return cached
+
+        params = {
+            'getpage': label,
+            'detail': 'full',
+            'limit': 1
+        }
+        code, items = await self.api.rate_query(params)
+
+        if items:
+            from .rateschedule import RateSchedule
+            rs = await self.api.run(RateSchedule, items[0])
+            if use_cache:
+                schedule_cache.put(rs)
+            return rs
+
+        logger.warning('No rate schedule found for {} (HTTP {}).'.format(label, code))
+        return None
+
+    async def get_rate_schedules(self, labels: list):
+        """Fetches the `RateSchedule` for every label concurrently.
+
+        :param  labels: OpenEI rate labels.
+        :type   labels: ``list``
+
+        :return:    A ``list`` of `RateSchedule`s in the same order as **labels**,
+                    with ``None`` for labels that were not found.
+        """
+        return list(await asyncio.gather(*[self.get_rate_schedule(label) for label in labels]))
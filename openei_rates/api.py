@@ -1,7 +1,52 @@
-import requests
 import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING
 
 from . import logger
+from .cache import ResponseCache
+
+if TYPE_CHECKING:
+    import requests
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket used to stay under the API's rate limit.
+
+    Tokens refill at **rate** per second up to **capacity**. Taking a token
+    from an empty bucket reserves it, and the caller waits until it refills.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Takes a token and returns how many seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= 1.0
+
+            if self.tokens >= 0.0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        """Takes a token, blocking until it is available.
+        """
+        wait = self.reserve()
+        if wait > 0.0:
+            time.sleep(wait)
+
 
 class OpenEIApi(object):
 
@@ -10,12 +55,137 @@ class OpenEIApi(object):
 
     response_format = 'json'
 
-    def __init__(self, api_key: str, zip_code: str = ''):
+    # OpenEI keys are limited to 1,000 requests per hour
+    default_rate_limit = 1000. / 3600.
+
+    retry_statuses = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        api_key: str,
+        zip_code: str = '',
+        cache: ResponseCache = None,
+        pool_size: int = 10,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 60.,
+        rate_limit: float = default_rate_limit,
+        burst: int = 10,
+        timeout: float = 30.,
+        ):
+        """
+        Creates an OpenEIApi client.
+
+        :param  api_key:    An OpenEI API key.
+        :type   api_key:    ``str``
+
+        :param  cache:  (Optional) A response cache to serve repeated queries from.
+        :type   cache:  ``ResponseCache``
+
+        :param  pool_size:  Number of keep-alive connections kept open to the API.
+        :type   pool_size:  ``int``
+
+        :param  max_retries:    How many times a failed request (connection errors, 429 and 5xx) is retried.
+        :type   max_retries:    ``int``
+
+        :param  backoff:    Base delay in seconds. Retry *n* waits a random time up to ``backoff * 2 ** n``,
+                            or as long as the server's ``Retry-After`` header asks.
+        :type   backoff:    ``float``
+
+        :param  max_backoff:    Upper bound on the exponential backoff delay in seconds.
+        :type   max_backoff:    ``float``
+
+        :param  rate_limit: Requests per second allowed by the client-side token bucket.
+                            Defaults to OpenEI's limit of 1,000 per hour. ``None`` disables throttling.
+        :type   rate_limit: ``float``
+
+        :param  burst:  How many requests may be sent at once before throttling kicks in.
+        :type   burst:  ``int``
+
+        :param  timeout:    Seconds to wait for the server before giving up on a request.
+        :type   timeout:    ``float``
+        """
 
         self.api_key = api_key
         self.zip_code = zip_code
         self.prefrred_unit = 'kWh'
         self.approved_only = False
+        self.cache = cache
+
+        self.rate_endpoint = OpenEIApi._rate_endpoint
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.throttle = TokenBucket(rate_limit, burst) if rate_limit else None
+
+        # requests is only imported once a client is created
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Closes the pooled connections.
+        """
+        self.session.close()
+
+    def _retry_after(self, r: 'requests.Response'):
+        """Returns the delay in seconds requested by a ``Retry-After`` header, or ``None``.
+        """
+        header = r.headers.get('Retry-After')
+        if not header:
+            return None
+        try:
+            return max(0., float(header))
+        except ValueError:
+            pass
+        try:
+            return max(0., parsedate_to_datetime(header).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int):
+        # Full jitter keeps many workers from retrying in lockstep
+        return random.uniform(0., min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _get(self, url: str, params: dict):
+        """Sends a GET on the pooled session, retrying transient failures.
+        """
+        import requests
+
+        attempt = 0
+        while True:
+            if self.throttle is not None:
+                self.throttle.acquire()
+
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning('Request failed ({}). Retrying in {:.2f}s.'.format(e, delay))
+            else:
+                if r.status_code not in self.retry_statuses or attempt >= self.max_retries:
+                    return r
+                delay = self._retry_after(r)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning('Response: HTTP {}. Retrying in {:.2f}s.'.format(r.status_code, delay))
+                r.close()
+
+            time.sleep(delay)
+            attempt += 1
     
     def rate_query(self, params: dict = {}):
 
@@ -30,9 +200,19 @@ class OpenEIApi(object):
             p['approved'] = 'true' if self.approved_only else 'false'
 
         p.update(params)
+
+        if self.cache is not None:
+            items = self.cache.get(p)
+            if items is not None:
+                logger.info('Serving response from cache.')
+                return (200, items)
+            if self.cache.offline:
+                logger.warning('Response not cached, and the cache is offline.')
+                return (503, None)
+
         logger.info('Sending request.')
 
-        r = requests.get(OpenEIApi._rate_endpoint, params = p)
+        r = self._get(self.rate_endpoint, p)
         
         
         if r.status_code == 403:
@@ -58,6 +238,8 @@ class OpenEIApi(object):
                 
                 items = j.get('items')
                 if items:
+                    if self.cache is not None:
+                        self.cache.set(p, items)
                     return (r.status_code, items)
             
             except ValueError as ve:
@@ -73,4 +255,55 @@ class OpenEIApi(object):
                 return (503, None)
         
         return (r.status_code, None)
-    
\ No newline at end of file
+
+    # The API returns at most this many items per request
+    max_page_size = 500
+
+    def iter_rates(self, params: dict = {}, page_size: int = max_page_size, prefetch: bool = False):
+        """Walks every page of a query, yielding items as each page is decoded.
+        Only one page (two when prefetching) is held in memory at a time.
+
+        :param  params: Query parameters, as for ``rate_query``. An ``offset`` sets where to start.
+        :type   params: ``dict``
+
+        :param  page_size:  Number of items requested per page. Capped at ``max_page_size``.
+        :type   page_size:  ``int``
+
+        :param  prefetch:   If ``True``, the next page is fetched on a background thread
+                            while the current one is consumed.
+        :type   prefetch:   ``bool``
+
+        :return:    A generator of rate ``dict``s.
+
+        :raises:    ``ConnectionError`` if a page fails with anything other than a not-found response.
+        """
+        page_size = max(1, min(page_size, __class__.max_page_size))
+        offset = int(params.get('offset', 0))
+
+        def fetch(offset):
+            p = dict(params)
+            p['limit'] = page_size
+            p['offset'] = offset
+            code, items = self.rate_query(p)
+            if code not in (200, 404):
+                raise ConnectionError('Failed to fetch rates at offset {} (HTTP {}).'.format(offset, code))
+            return items or []
+
+        if not prefetch:
+            while True:
+                items = fetch(offset)
+                yield from items
+                if len(items) < page_size:
+                    return
+                offset += page_size
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, offset)
+            while future is not None:
+                items = future.result()
+                future = None
+                if len(items) == page_size:
+                    offset += page_size
+                    future = executor.submit(fetch, offset)
+                yield from items
+
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from . import logger
+
+
+class ResponseCache(object):
+    """A content-addressed, on-disk cache of ``rate_query`` results.
+
+    Each response is stored as a JSON file named by a hash of the normalized query
+    parameters (without the API key), so any process pointed at the same directory
+    shares it. Writes go to a temporary file that is atomically renamed into place,
+    so concurrent writers never leave a partial entry behind.
+    """
+
+    suffix = '.json'
+    excluded_params = {'api_key'}
+
+    def __init__(self, path: str, ttl: float = None, max_size: int = None, offline: bool = False):
+        """
+        Creates a ResponseCache.
+
+        :param  path:   Directory the cache entries live in. It is created if needed.
+        :type   path:   ``str``
+
+        :param  ttl:    (Optional) Seconds an entry stays fresh. Defaults to ``None`` (never expires).
+        :type   ttl:    ``float``
+
+        :param  max_size:   (Optional) Maximum total size of the cache in bytes. The least recently used
+                            entries are evicted to stay under it. Defaults to ``None`` (unbounded).
+        :type   max_size:   ``int``
+
+        :param  offline:    If ``True``, entries are served regardless of age and the API is never contacted.
+                            A directory of fixtures can stand in for the live API this way.
+        :type   offline:    ``bool``
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.offline = offline
+
+        os.makedirs(self.path, exist_ok=True)
+
+    @classmethod
+    def normalize(cls, params: dict):
+        """Returns the parameters that identify a query, as a dict of strings.
+        """
+        return {
+            str(k): str(v) for k, v in params.items() if k not in cls.excluded_params
+        }
+
+    @classmethod
+    def key(cls, params: dict):
+        """Returns the cache key for a set of query parameters.
+        """
+        normalized = json.dumps(cls.normalize(params), sort_keys=True)
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _file(self, key: str):
+        return os.path.join(self.path, key + self.suffix)
+
+    def get(self, params: dict):
+        """Looks up a cached response.
+
+        :param  params: The query parameters.
+        :type   params: ``dict``
+
+        :return:    The cached ``items``, or ``None`` if there is no fresh entry.
+        """
+        fname = self._file(self.key(params))
+
+        try:
+            with open(fname) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl is not None and not self.offline:
+            if time.time() - entry.get('fetched', 0) > self.ttl:
+                return None
+
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(fname, None)
+        except OSError:
+            pass
+
+        return entry.get('items')
+
+    def set(self, params: dict, items: list):
+        """Stores a response.
+
+        :param  params: The query parameters.
+        :type   params: ``dict``
+
+        :param  items:  The decoded ``items`` of the response.
+        :type   items:  ``list``
+        """
+        entry = {
+            'params': self.normalize(params),
+            'fetched': time.time(),
+            'items': items,
+        }
+
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp, self._file(self.key(params)))
+        except OSError as e:
+            logger.warning('Could not write to the response cache: {}'.format(e))
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+
+        if self.max_size is not None:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in ``max_size``.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.path):
+            if name.startswith('.') or not name.endswith(self.suffix):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        entries.sort()
+        for mtime, size, name in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                # Another process got there first
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes every entry.
+        """
+        for name in os.listdir(self.path):
+            if name.endswith(self.suffix):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+
+class ScheduleCache(object):
+    """A size-bounded, in-process LRU of parsed `RateSchedule` objects.
+
+    Entries are keyed by tariff label and ``startdate``, so a new revision of a tariff is a
+    new entry. Cached schedules are shared by every caller and every thread, so their
+    arrays are made read-only when stored: copy one before changing its rates or schedules.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Creates a ScheduleCache.
+
+        :param  maxsize:    The most schedules kept. The least recently used are dropped first.
+        :type   maxsize:    ``int``
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(rate_info: dict):
+        """Returns the cache key for a rate response.
+        """
+        return rate_info.get('label'), rate_info.get('startdate')
+
+    def get(self, label: str, startdate=None):
+        """Looks up a schedule.
+
+        :param  label:      The tariff label.
+        :type   label:      ``str``
+
+        :param  startdate:  The tariff's ``startdate``, in seconds since the epoch.
+        :type   startdate:  ``int``
+
+        :return:    The cached `RateSchedule`, or ``None``.
+        """
+        with self._lock:
+            rs = self._entries.get((label, startdate))
+            if rs is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end((label, startdate))
+            return rs
+
+    def put(self, rate_schedule, startdate=None):
+        """Stores a schedule under its label and **startdate**, making its arrays read-only.
+        """
+        rate_schedule.freeze()
+        with self._lock:
+            key = (rate_schedule.label, startdate)
+            self._entries[key] = rate_schedule
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_create(self, rate_info: dict):
+        """Returns the cached schedule for a rate response, parsing and storing it on a miss.
+
+        :param  rate_info:  A rate from a ``detail=full`` query.
+        :type   rate_info:  ``dict``
+
+        :rtype: `RateSchedule`
+        """
+        label, startdate = self.key(rate_info)
+        rs = self.get(label, startdate)
+        if rs is None:
+            from .rateschedule import RateSchedule
+            rs = RateSchedule(rate_info)
+            self.put(rs, startdate)
+        return rs
+
+    def info(self):
+        """Returns the hit and miss counts and the current size.
+
+        :rtype: ``dict``
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        """Removes every entry and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by every `Rate` in the process
+schedule_cache = ScheduleCache()
@@ -0,0 +1,270 @@
+import bisect
+import datetime
+
+import numpy as np
+
+from .rate import Rate
+
+
+class RateCatalog(object):
+    """An indexed, list-like collection of `Rate`s.
+
+    Rates are indexed by label, utility, EIA id and sector, by start date for active-date
+    queries, and by name trigrams for substring searches, so lookups do not scan every rate.
+    Iteration and filtering preserve insertion order.
+
+    Indexes are built on the first lookup that needs them, so wrapping a list is cheap.
+    Catalogs smaller than ``min_index_size`` are filtered by a scan and never indexed.
+    """
+
+    # Length of the name fragments in the token index
+    gram = 3
+
+    # Below this many rates, a scan is cheaper than building the indexes
+    min_index_size = 1000
+
+    def __init__(self, rates: list = None):
+
+        self._rates = list(rates or [])
+
+        # Field and name indexes, built lazily
+        self._by_label = None
+        self._by_utility = None
+        self._by_eia = None
+        self._by_sector = None
+        self._by_gram = None
+
+        # Sorted start dates and their rate ids, rebuilt lazily
+        self._starts = None
+        self._start_ids = None
+        self._ends = None
+
+    def __len__(self):
+        return len(self._rates)
+
+    def __iter__(self):
+        return iter(self._rates)
+
+    def __getitem__(self, i):
+        return self._rates[i]
+
+    def __bool__(self):
+        return bool(self._rates)
+
+    def __repr__(self):
+        return '<RateCatalog({} rates)>'.format(len(self._rates))
+
+    @classmethod
+    def _grams(cls, s: str):
+        return {s[i:i + cls.gram] for i in range(len(s) - cls.gram + 1)}
+
+    def _index_fields(self, rid: int, rate: Rate):
+        if rate.label is not None:
+            # The first rate with a label wins, like a scan of the list
+            self._by_label.setdefault(rate.label, rate)
+        self._by_utility.setdefault(rate.utility or '', set()).add(rid)
+        self._by_eia.setdefault(rate.eia_id, set()).add(rid)
+        self._by_sector.setdefault(rate.sector, set()).add(rid)
+
+    def _index_name(self, rid: int, rate: Rate):
+        for g in self._grams(rate.name or ''):
+            self._by_gram.setdefault(g, set()).add(rid)
+
+    def _fields(self):
+        if self._by_label is None:
+            self._by_label, self._by_utility, self._by_eia, self._by_sector = {}, {}, {}, {}
+            for rid, rate in enumerate(self._rates):
+                self._index_fields(rid, rate)
+
+    def _names(self):
+        if self._by_gram is None:
+            self._by_gram = {}
+            for rid, rate in enumerate(self._rates):
+                self._index_name(rid, rate)
+
+    def add(self, rate: Rate):
+        """Adds a rate to the catalog and any indexes already built.
+        """
+        rid = len(self._rates)
+        self._rates.append(rate)
+
+        if self._by_label is not None:
+            self._index_fields(rid, rate)
+        if self._by_gram is not None:
+            self._index_name(rid, rate)
+
+        self._starts = None
+
+    # Behave like the list this replaces
+    append = add
+
+    def extend(self, rates: list):
+        for rate in rates:
+            self.add(rate)
+
+    def get(self, label: str):
+        """Returns the first rate added with **label**, or ``None``.
+        """
+        self._fields()
+        return self._by_label.get(label)
+
+    def _select(self, ids):
+        return [self._rates[i] for i in sorted(ids)]
+
+    def _utility_ids(self, utility: str):
+        # Substring match over the distinct utility names, not every rate
+        self._fields()
+        ids = set()
+        for name, rids in self._by_utility.items():
+            if utility in name:
+                ids |= rids
+        return ids
+
+    def _name_ids(self, name: str):
+        if len(name) < self.gram:
+            return {i for i, rate in enumerate(self._rates) if name in (rate.name or '')}
+
+        self._names()
+        ids = None
+        for g in sorted(self._grams(name), key=lambda g: len(self._by_gram.get(g, ()))):
+            ids = set(self._by_gram.get(g, ())) if ids is None else ids & self._by_gram.get(g, set())
+            if not ids:
+                return set()
+        # Trigrams can match out of order, so confirm the substring
+        return {i for i in ids if name in self._rates[i].name}
+
+    def _build_date_index(self):
+        starts = []
+        for rid, rate in enumerate(self._rates):
+            if rate.begin_date:
+                starts.append((rate.begin_date, rid))
+        starts.sort()
+
+        self._starts = [s for s, rid in starts]
+        self._start_ids = np.array([rid for s, rid in starts], dtype=np.intp)
+        self._ends = np.array(
+            [self._rates[rid].end_date or datetime.datetime.max for s, rid in starts],
+            dtype='datetime64[us]'
+        )
+
+    def _active_ids(self, dt: datetime.datetime):
+        if self._starts is None:
+            self._build_date_index()
+
+        # Every rate that began on or before dt, minus those that have ended
+        k = bisect.bisect_right(self._starts, dt)
+        live = self._ends[:k] > np.datetime64(dt, 'us')
+        return set(self._start_ids[:k][live].tolist())
+
+    def by_utility(self, utility: str):
+        """Returns the rates whose utility name contains **utility**.
+        """
+        return self._select(self._utility_ids(utility))
+
+    def by_eia(self, eia_id):
+        """Returns the rates for a utility's EIA id.
+        """
+        self._fields()
+        return self._select(self._by_eia.get(eia_id, ()))
+
+    def by_sector(self, sector: str):
+        """Returns the rates in a sector.
+        """
+        self._fields()
+        return self._select(self._by_sector.get(sector, ()))
+
+    def search_name(self, name: str):
+        """Returns the rates whose name contains **name**.
+        """
+        return self._select(self._name_ids(name))
+
+    def active(self, dt: datetime.datetime):
+        """Returns the rates in effect at **dt**.
+        """
+        return self._select(self._active_ids(dt))
+
+    def filter(
+            self,
+            utility: str = '',
+            name: str = '',
+            active: bool = True,
+            only_approved: bool = False,
+            sectors: list = None,
+            active_date: datetime.datetime = None,
+            eia_id=None,
+        ):
+        """Returns the rates matching every given criterion, in insertion order.
+        Criteria left blank are ignored.
+
+        :param  utility:    Substring of the utility name.
+        :param  name:       Substring of the rate name.
+        :param  active:     If ``True``, only rates in effect at **active_date**.
+        :param  only_approved:  If ``True``, only approved rates.
+        :param  sectors:    Sectors to include.
+        :param  active_date:    The date for **active**.
+        :param  eia_id:     A utility EIA id.
+
+        :rtype: ``list``
+        """
+        if len(self._rates) < self.min_index_size:
+            return self.scan(self._rates, utility, name, active, only_approved, sectors, active_date, eia_id)
+
+        self._fields()
+        candidates = []
+
+        if utility:
+            candidates.append(self._utility_ids(utility))
+        if eia_id is not None:
+            candidates.append(self._by_eia.get(eia_id, set()))
+        if sectors:
+            ids = set()
+            for sector in sectors:
+                ids |= self._by_sector.get(sector, set())
+            candidates.append(ids)
+        if name:
+            candidates.append(self._name_ids(name))
+        if active and active_date:
+            candidates.append(self._active_ids(active_date))
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = set.intersection(*candidates)
+        else:
+            ids = range(len(self._rates))
+
+        rates = self._select(ids)
+        if only_approved:
+            rates = [rate for rate in rates if rate.approved]
+        return rates
+
+    @staticmethod
+    def scan(
+            rates: list,
+            utility: str = '',
+            name: str = '',
+            active: bool = True,
+            only_approved: bool = False,
+            sectors: list = None,
+            active_date: datetime.datetime = None,
+            eia_id=None,
+        ):
+        """Filters a list of rates in one pass, without indexing it. Takes the same criteria as ``filter``.
+
+        :rtype: ``list``
+        """
+        out = []
+        for rate in rates:
+            if utility and utility not in (rate.utility or ''):
+                continue
+            if eia_id is not None and rate.eia_id != eia_id:
+                continue
+            if sectors and rate.sector not in sectors:
+                continue
+            if name and name not in (rate.name or ''):
+                continue
+            if active and active_date and not rate.is_active(active_date):
+                continue
+            if only_approved and not rate.approved:
+                continue
+            out.append(rate)
+        return out
@@ -0,0 +1,102 @@
+import numba as nb
+import numpy as np
+
+from .sched import tier_cost
+from .demand import peak_window
+from .costs import cumulative_tier_costs
+
+
+@nb.njit(parallel=True, cache=True)
+def batch_interval_cost(
+        qty_matrix: np.array,
+        bounds: np.array,
+        periods: np.array,
+        struct: np.array,
+        scale: float = 1.0):
+    """Prices every interval of every meter and sums the costs per segment.
+
+    :param qty_matrix:  A 2-D array of meters x intervals.
+    :param bounds:      Segment boundaries from ``segment_bounds``.
+    :param periods:     The TOU period of each interval, shared by all meters.
+    :param struct:      The rate structure the periods index into.
+    :param scale:       Multiplier applied to each quantity before pricing,
+                        e.g. interval hours to turn kW into kWh.
+
+    :returns:           A 2-D array of meters x segments.
+    """
+    n_meters = qty_matrix.shape[0]
+    n_segments = bounds.shape[0] - 1
+
+    out = np.zeros((n_meters, n_segments))
+
+    for m in nb.prange(n_meters):
+        for s in range(n_segments):
+            total = 0.0
+            for i in range(bounds[s], bounds[s + 1]):
+                total += tier_cost(qty_matrix[m, i] * scale, struct[periods[i]])
+            out[m, s] = total
+
+    return out
+
+
+@nb.njit(parallel=True, cache=True)
+def batch_demand_cost(
+        qty_matrix: np.array,
+        bounds: np.array,
+        periods: np.array,
+        struct: np.array,
+        span: int):
+    """Finds each meter's peak window demand per segment and prices it at the
+    period the peak window starts in.
+
+    :returns:   A tuple of 2-D arrays of meters x segments: the demand costs,
+                the peak demands (window means), and the peak interval indexes.
+    """
+    n_meters = qty_matrix.shape[0]
+    n_segments = bounds.shape[0] - 1
+
+    costs = np.zeros((n_meters, n_segments))
+    peaks = np.zeros((n_meters, n_segments))
+    indexes = np.zeros((n_meters, n_segments), dtype=np.intp)
+
+    for m in nb.prange(n_meters):
+        for s in range(n_segments):
+            start = bounds[s]
+            end = bounds[s + 1]
+            w = min(span, end - start)
+
+            idx, total = peak_window(qty_matrix[m, start:end], w)
+            demand = total / w
+
+            costs[m, s] = tier_cost(demand, struct[periods[start + idx]])
+            peaks[m, s] = demand
+            indexes[m, s] = start + idx
+
+    return costs, peaks, indexes
+
+
+@nb.njit(parallel=True, cache=True)
+def batch_cumulative_tier_cost(
+        qty_matrix: np.array,
+        bounds: np.array,
+        periods: np.array,
+        struct: np.array,
+        scale: float = 1.0,
+        per_period: bool = True):
+    """Prices every meter against cumulative usage tiers and sums the costs per segment.
+    See ``cumulative_tier_costs``.
+
+    :returns:   A 2-D array of meters x segments.
+    """
+    n_meters = qty_matrix.shape[0]
+    n_segments = bounds.shape[0] - 1
+
+    out = np.zeros((n_meters, n_segments))
+
+    for m in nb.prange(n_meters):
+        costs = cumulative_tier_costs(qty_matrix[m] * scale, periods, bounds, struct, per_period)
+        for s in range(n_segments):
+            out[m, s] = np.sum(costs[bounds[s]:bounds[s + 1]])
+
+    return out
+
@@ -2,144 +2,149 @@ import numba as nb
 import numpy as np
 # import pandas as pd
 
-from typing import Callable
-
-from .sched import get_Tier
-from .demand import get_Peak
-from ..data_objects import Tier, TierIndex, Period
-from .demand import peak_period, basic_period
+from .sched import get_Tier, get_tier_indexes, tier_index
+from ..data_objects import TierIndex, Period
 from .window import (
     window,
-    month_changed,
-    hour_changed,
-    assign_distribute,
-    assign_end,
-    assign_front,
-    assign_at_index
+    window_parallel,
+    Reduce,
+    ASSIGN_CODES,
+    assign_distribute
 )
 
 
-@nb.njit
 def energy_cost(
         qty_array: np.array,
+        bounds: np.array,
+        periods: np.array,
         price_struct: np.array,
-        months: np.array,
-        hours: np.array,
-        is_weekend: np.array,
-        wd_schedule: np.array,
-        we_schedule: np.array,
-        interval_time: float,
         assignment_func=assign_distribute,
-        net_meter: bool = False,
-        retail_net: bool = False):
-    
-    qlen = qty_array.shape[0]
-
-    out = np.zeros(qlen, dtype=np.float32)
+        net_meter: bool = True,
+        retail_net: bool = False,
+        parallel: bool = False):
+    """Prices the energy in each segment (e.g. each hour) at the tier its total reaches.
+
+    :param qty_array:       Energy per interval (kWh).
+    :param bounds:          Segment boundaries. Segments must not span TOU periods.
+    :param periods:         The energy TOU period of each interval.
+    :param assignment_func: One of the ``window.assign_*`` functions, or an ``Assign`` code.
+    :param parallel:        If ``True``, segments are spread across threads.
+
+    :returns:   A ``numpy.array`` with the cost assigned to each interval.
+    """
+    kernel = window_parallel if parallel else window
 
-    _window(
+    return kernel(
         qty_array,
-        out,
+        np.zeros(qty_array.shape[0]),
+        bounds,
+        periods,
         price_struct,
-        months,
-        hours,
-        is_weekend,
-        wd_schedule,
-        we_schedule,
-        interval_time,
+        1.0,
+        1,
         net_meter,
-        hour_changed,
-        basic_period,
-        assignment_func,
-        np.sum
+        Reduce.BASIC,
+        ASSIGN_CODES.get(assignment_func, assignment_func),
+        retail_net
     )
 
-    return out
-
 
-@nb.njit
 def tou_demand_cost(
         qty_array: np.array,
+        bounds: np.array,
+        periods: np.array,
         price_struct: np.array,
-        months: np.array,
-        hours: np.array,
-        is_weekend: np.array,
         window_span: int,
-        wd_schedule: np.array,
-        we_schedule: np.array,
         interval_hours: float,
-        net_meter: bool,
-        normalize: bool = False):
-
-    qlen = qty_array.shape[0]
+        assignment_func=assign_distribute,
+        net_meter: bool = False,
+        parallel: bool = False):
+    """Prices the peak demand of each segment (normally each billing month),
+    at the TOU period where the peak window starts.
 
-    out = np.zeros(qlen, dtype=np.float32)
+    :param qty_array:       Power readings per interval (kW).
+    :param window_span:     The demand window, in intervals.
+    :param assignment_func: One of the ``window.assign_*`` functions, or an ``Assign`` code.
+    :param parallel:        If ``True``, segments are spread across threads.
 
-    assign_func = assign_distribute
-    if normalize:
-        assign_func = assign_at_index
+    :returns:   A ``numpy.array`` with the charge assigned to each interval.
+    """
+    kernel = window_parallel if parallel else window
 
-    window(
+    return kernel(
         qty_array,
-        out,
+        np.zeros(qty_array.shape[0]),
+        bounds,
+        periods,
         price_struct,
-        months,
-        hours,
-        is_weekend,
-        wd_schedule,
-        we_schedule,
         interval_hours,
+        window_span,
         net_meter,
-        month_changed,
-        peak_period,
-        assignment_func,
-        np.sum,
-        window_span=window_span
+        Reduce.PEAK_NORMALIZED,
+        ASSIGN_CODES.get(assignment_func, assignment_func),
+        False
     )
 
-    return out 
 
-
-@nb.njit
 def flat_demand_cost(
         qty_array: np.array,
+        bounds: np.array,
+        periods: np.array,
         price_struct: np.array,
-        month_interval: Interval,
-        schedule: np.array,
+        window_span: int,
+        interval_hours: float,
+        assignment_func=assign_distribute,
+        net_meter: bool = False,
+        parallel: bool = False):
+    """Prices the peak demand of each segment against the flat demand structure.
+
+    :param periods: The flat demand period of each interval, from the month schedule.
+
+    :returns:   A ``numpy.array`` with the charge assigned to each interval.
+    """
+    return tou_demand_cost(
+        qty_array,
+        bounds,
+        periods,
+        price_struct,
+        window_span,
+        interval_hours,
+        assignment_func,
+        net_meter,
+        parallel
+    )
 
-        ):
 
-@nb.njit
+@nb.njit(cache=True)
 def calculate_tou_cost(qty, month, hour, schedule: np.array, struct: np.array):
     """Calculate the cost of the energy for the interval.
     """
-    tou = None
-
-    try:
-        tou = get_tou(month, hour, schedule, struct)
-    except IndexError as ie:
-        raise ie
+    period = Period(
+        interval_hours=1.0,
+        span=1,
+        month=month,
+        hour=hour,
+        weekend=False
+    )
 
-    tier = get_tou_tier(qty, tou)
+    tier = get_Tier(qty, period, struct, schedule)
 
     rate_price = 0.0
-    adj_price = 0.0
 
-    if tier is not None:
+    # If we're positive, we use the rate
+    if qty >= 0:
+        rate_price = qty * tier.price
+
+    # If we're negative, we use the sell price. This is what will happen under NEM 2.0 in Califoirnia.
+    else:
+        rate_price = qty * tier.sell
 
-        # If we're positive, we use the rate
-        if qty >= 0:
-            rate_price = qty * tier[RateIndex.RATE]
+    adj_price = abs(qty) * tier.adj
 
-        # If we're negative, we use the sell price. This is what will happen under NEM 2.0 in Califoirnia.
-        else:
-            rate_price = qty * tier[RateIndex.SELL]
-        
-        adj_price = abs(qty) * tier[RateIndex.ADJ]
-    
     return adj_price + rate_price
 
-@nb.jit(nopython=True, nogil=False)
+
+@nb.jit(nopython=True, nogil=True, cache=True)
 def calculate_flat_cost(
     qty: float,
     month: int,
@@ -148,29 +153,163 @@ def calculate_flat_cost(
     ):
     """Calculates the demand charges for a particular quantity of power at a given date and time. 
     """
-    flat_price = 0.0
-    if flat_schedule and flat_struct:
-        # It's a little differnt for flat schedules
-        tou = get_flat_month(month, flat_schedule, flat_struct)
-        tier = get_tou_tier(qty, tou)
-        p = 0.0
-        # If we're positive, we use the rate
-        if qty >= 0:
-            p = qty * tier[RateIndex.RATE]
+    # It's a little differnt for flat schedules
+    period = Period(
+        interval_hours=1.0,
+        span=1,
+        month=month,
+        hour=0,
+        weekend=False
+    )
+    tier = get_Tier(qty, period, flat_struct, flat_schedule)
+    p = 0.0
+    # If we're positive, we use the rate
+    if qty >= 0:
+        p = qty * tier.price
+
+    # If we're negative, we use the sell price. This is what will happen under NEM 2.0 in Califoirnia.
+    else:
+        p = qty * tier.sell
+
+    adj = abs(qty) * tier.adj
+
+    return adj + p
+
+
+def calculate_period_costs(
+        qty_array: np.array,
+        periods: np.array,
+        struct: np.array):
+    """Prices every interval given its already-resolved TOU period.
+
+    :returns:   A ``numpy.array`` of type ``float64`` with one cost per
+                interval.
+    """
+    qty = np.asarray(qty_array, dtype=np.float64)
+
+    tiers = get_tier_indexes(qty, periods, struct)
+
+    rows = struct[periods, tiers].astype(np.float64)
+
+    # Buy at the rate, sell at the sell price
+    cost = np.where(
+        qty >= 0,
+        qty * rows[:, TierIndex.RATE],
+        qty * rows[:, TierIndex.SELL]
+    )
+    cost += np.abs(qty) * rows[:, TierIndex.ADJ]
+
+    return cost
+
+
+@nb.njit(nogil=True, cache=True)
+def _cumulative_segment(
+        qty_array: np.array,
+        out: np.array,
+        start: int,
+        end: int,
+        periods: np.array,
+        struct: np.array,
+        usage: np.array,
+        per_period: bool):
+
+    n_tiers = struct.shape[1]
+
+    for i in range(start, end):
+        qty = qty_array[i]
+        tou = struct[periods[i]]
+        u = periods[i] if per_period else 0
+
+        # Start at the tier usage has reached so far
+        t = tier_index(usage[u], tou)
+
+        if qty < 0:
+            out[i] = qty * tou[t, TierIndex.SELL] - qty * tou[t, TierIndex.ADJ]
+            continue
+
+        cost = 0.0
+        remaining = qty
+        while remaining > 0.0:
+            tier_max = tou[t, TierIndex.MAX]
+            part = remaining
+            if t < n_tiers - 1 and tier_max > 0.0:
+                part = min(remaining, max(tier_max - usage[u], 0.0))
+
+            cost += part * (tou[t, TierIndex.RATE] + tou[t, TierIndex.ADJ])
+            usage[u] += part
+            remaining -= part
+            t += 1
+            if t >= n_tiers:
+                t = n_tiers - 1
+
+        out[i] = cost
+
+
+@nb.njit(nogil=True, cache=True)
+def cumulative_tier_costs(
+        qty_array: np.array,
+        periods: np.array,
+        bounds: np.array,
+        struct: np.array,
+        per_period: bool = True):
+    """Prices energy against tiers that apply to cumulative usage within each billing period.
+
+    Usage accumulates from the start of every segment in **bounds** (normally billing months),
+    per TOU period or across all periods. An interval that crosses a tier's max is split, each
+    part priced at its own tier. Exports are priced at the sell price of the tier usage has
+    reached, and do not reduce it. Runs in one O(n) pass without the GIL.
+
+    :param qty_array:   Energy per interval (kWh).
+    :param periods:     The TOU period of each interval.
+    :param bounds:      Billing period boundaries from ``segment_bounds``.
+    :param struct:      The rate structure the periods index into. Tier maxes are cumulative.
+    :param per_period:  If ``True``, usage accumulates separately for each TOU period.
+
+    :returns:   A ``numpy.array`` of type ``float64`` with one cost per interval.
+    """
+    out = np.zeros(qty_array.shape[0])
+
+    usage = np.zeros(struct.shape[0])
 
-        # If we're negative, we use the sell price. This is what will happen under NEM 2.0 in Califoirnia.
-        else:
-            p = qty * tier[RateIndex.SELL]
-        
-        adj = abs(qty) * tier[RateIndex.ADJ] 
+    for s in range(bounds.shape[0] - 1):
+        usage[:] = 0.0
+        _cumulative_segment(qty_array, out, bounds[s], bounds[s + 1], periods, struct, usage, per_period)
 
-        flat_price = adj + p
-    
-    return flat_price 
+    return out
 
 
+@nb.njit(parallel=True, cache=True)
+def cumulative_tier_costs_parallel(
+        qty_array: np.array,
+        periods: np.array,
+        bounds: np.array,
+        struct: np.array,
+        per_period: bool = True):
+    """``cumulative_tier_costs`` with the billing periods spread across threads.
+    Usage resets at every segment, so the result is identical to the serial kernel.
+    """
+    out = np.zeros(qty_array.shape[0])
 
+    for s in nb.prange(bounds.shape[0] - 1):
+        usage = np.zeros(struct.shape[0])
+        _cumulative_segment(qty_array, out, bounds[s], bounds[s + 1], periods, struct, usage, per_period)
 
+    return out
 
-    
 
+@nb.njit(nogil=True, cache=True)
+def cumulative_tier_costs_from(
+        qty_array: np.array,
+        periods: np.array,
+        struct: np.array,
+        usage: np.array,
+        per_period: bool = True):
+    """Continues ``cumulative_tier_costs`` for one billing period from the usage so far.
+    **usage** (one entry per TOU period) is updated in place, so a period can be priced
+    in pieces.
+
+    :returns:   A ``numpy.array`` of type ``float64`` with one cost per interval.
+    """
+    out = np.zeros(qty_array.shape[0])
+    _cumulative_segment(qty_array, out, 0, qty_array.shape[0], periods, struct, usage, per_period)
+    return out
@@ -0,0 +1,222 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# 1970-01-01 was a Thursday
+_EPOCH_DAYOFWEEK = 3
+
+
+def _day_ordinals(index: pd.DatetimeIndex):
+    # Local wall-clock days, as days since the epoch
+    naive = index.tz_localize(None) if index.tz is not None else index
+    return naive.values.astype('datetime64[D]').astype(np.int64)
+
+
+class DayClassifier(object):
+    """Classifies days as workdays or off days (weekends and holidays) for whole indexes at once.
+
+    Off days are kept as a bitmap over a range of day ordinals, so classifying an index is
+    a single gather. Days outside the range are classified by weekday alone. Holidays are
+    evaluated only for the years an index reaches, the first time it reaches them.
+    """
+
+    def __init__(self, calendar, start_year: int, end_year: int, weekmask: tuple):
+        """
+        :param  calendar:   A Pandas holiday calendar.
+        :type   calendar:   ``pandas.tseries.holiday.AbstractHolidayCalendar``
+
+        :param  start_year: First year covered by the bitmap.
+        :param  end_year:   Last year covered by the bitmap.
+
+        :param  weekmask:   Days of the week that are workdays (Monday is 0).
+        :type   weekmask:   ``tuple``
+        """
+        self.calendar = calendar
+        self.start_year = int(start_year)
+        self.end_year = int(end_year)
+        self.weekmask = tuple(weekmask)
+
+        self.first_day = np.datetime64('{}-01-01'.format(self.start_year), 'D').astype(np.int64)
+        last_day = np.datetime64('{}-12-31'.format(self.end_year), 'D').astype(np.int64)
+
+        self.workday_of_week = np.isin(np.arange(7), self.weekmask)
+
+        days = np.arange(self.first_day, last_day + 1)
+        self.offdays = ~self.workday_of_week[(days + _EPOCH_DAYOFWEEK) % 7]
+
+        # Years whose holidays are already in the bitmap
+        self._loaded = np.zeros(self.end_year - self.start_year + 1, dtype=bool)
+        self._lock = threading.Lock()
+        self._holidays = None
+
+    @property
+    def holidays(self):
+        """The holidays between the first and last year, evaluated on first access.
+
+        :rtype: ``pandas.DatetimeIndex``
+        """
+        if self._holidays is None:
+            self._load(self.start_year, self.end_year)
+            self._holidays = get_holidays(self.calendar, self.start_year, self.end_year)
+        return self._holidays
+
+    def _load(self, start_year: int, end_year: int):
+        # Adds the holidays of a span of years to the bitmap
+        first = start_year - self.start_year
+        last = end_year - self.start_year
+        if self._loaded[first:last + 1].all():
+            return
+
+        with self._lock:
+            if self._loaded[first:last + 1].all():
+                return
+
+            holidays = get_holidays(self.calendar, start_year, end_year)
+            holiday_days = _day_ordinals(pd.DatetimeIndex(holidays)) - self.first_day
+            holiday_days = holiday_days[(holiday_days >= 0) & (holiday_days < self.offdays.size)]
+            self.offdays[holiday_days] = True
+
+            self._loaded[first:last + 1] = True
+
+    def _load_days(self, days: np.array):
+        # Loads the years spanned by day offsets that are all in range
+        if days.size:
+            years = (np.array([days.min(), days.max()]) + self.first_day).astype('datetime64[D]').astype('datetime64[Y]')
+            start_year, end_year = years.astype(np.int64) + 1970
+            self._load(int(start_year), int(end_year))
+
+    def mask(self, index: pd.DatetimeIndex):
+        """Returns a boolean mask that is ``True`` for timestamps on weekends and holidays.
+
+        :param  index:  Timestamps to classify.
+        :type   index:  ``pandas.DatetimeIndex``
+
+        :rtype: ``numpy.array``
+        """
+        days = _day_ordinals(index) - self.first_day
+
+        in_range = (days >= 0) & (days < self.offdays.size)
+        if in_range.all():
+            self._load_days(days)
+            return self.offdays[days]
+
+        self._load_days(days[in_range])
+        out = ~self.workday_of_week[(days + self.first_day + _EPOCH_DAYOFWEEK) % 7]
+        out[in_range] = self.offdays[days[in_range]]
+        return out
+
+    def is_offday(self, ts):
+        """Returns ``True`` if a single timestamp falls on a weekend or holiday.
+        """
+        return bool(self.mask(pd.DatetimeIndex([pd.Timestamp(ts)]))[0])
+
+
+# Evaluated holidays by calendar and year span, least recently used first
+_holidays = OrderedDict()
+_holidays_lock = threading.Lock()
+max_holiday_spans = 32
+
+
+def _rule_key(rule):
+    offset = rule.offset
+    if isinstance(offset, list):
+        offset = tuple(offset)
+    days_of_week = tuple(rule.days_of_week) if rule.days_of_week is not None else None
+    return (
+        rule.name, rule.year, rule.month, rule.day, offset, rule.observance,
+        rule.start_date, rule.end_date, days_of_week,
+    )
+
+
+def _calendar_key(calendar):
+    # Calendars are identified by their rules: instances built with different rules
+    # share the default name, and equal rules always give the same holidays
+    try:
+        key = (type(calendar), tuple(_rule_key(rule) for rule in calendar.rules))
+        hash(key)
+    except (AttributeError, TypeError):
+        key = (type(calendar), calendar)
+    return key
+
+
+def get_holidays(calendar, start_year: int, end_year: int):
+    """Returns the holidays of a calendar between two years (inclusive), memoized process-wide.
+
+    Evaluating holiday rules is slow, so results are kept by calendar class and rules and year
+    span, and a span already covered by a cached, wider span is sliced from it. At most
+    ``max_holiday_spans`` spans are kept.
+
+    :param  calendar:   A Pandas holiday calendar.
+    :type   calendar:   ``pandas.tseries.holiday.AbstractHolidayCalendar``
+
+    :rtype: ``pandas.DatetimeIndex``
+    """
+    start_year = int(start_year)
+    end_year = int(end_year)
+    cal_key = _calendar_key(calendar)
+    key = cal_key + (start_year, end_year)
+
+    start = pd.Timestamp('{}-01-01'.format(start_year))
+    end = pd.Timestamp('{}-12-31'.format(end_year))
+
+    with _holidays_lock:
+        holidays = _holidays.get(key)
+        if holidays is None:
+            for (c_type, c_rules, c_start, c_end), cached in _holidays.items():
+                if (c_type, c_rules) == cal_key and c_start <= start_year and end_year <= c_end:
+                    holidays = cached[(cached >= start) & (cached <= end)]
+                    break
+        if holidays is not None:
+            _holidays[key] = holidays
+            _holidays.move_to_end(key)
+            return holidays
+
+    holidays = calendar.holidays(start=start, end=end)
+
+    with _holidays_lock:
+        holidays = _holidays.setdefault(key, holidays)
+        _holidays.move_to_end(key)
+        while len(_holidays) > max_holiday_spans:
+            _holidays.popitem(last=False)
+
+    return holidays
+
+
+# Shared classifiers, least recently used first
+_classifiers = OrderedDict()
+_classifiers_lock = threading.Lock()
+max_classifiers = 64
+
+
+def day_classifier(calendar, start_year: int, end_year: int, weekmask):
+    """Returns a shared `DayClassifier` for a holiday calendar and range of years.
+
+    Classifiers are cached by calendar class and rules, year range and weekmask, so every
+    `RateSchedule` on the same calendar reuses one instead of re-evaluating holiday rules.
+    A classifier evaluates holidays only for the years it is asked about.
+    At most ``max_classifiers`` are kept.
+
+    :param  calendar:   A Pandas holiday calendar.
+    :type   calendar:   ``pandas.tseries.holiday.AbstractHolidayCalendar``
+
+    :rtype: `DayClassifier`
+    """
+    key = _calendar_key(calendar) + (int(start_year), int(end_year), tuple(weekmask))
+
+    with _classifiers_lock:
+        classifier = _classifiers.get(key)
+        if classifier is not None:
+            _classifiers.move_to_end(key)
+            return classifier
+
+    classifier = DayClassifier(calendar, start_year, end_year, weekmask)
+
+    with _classifiers_lock:
+        classifier = _classifiers.setdefault(key, classifier)
+        _classifiers.move_to_end(key)
+        while len(_classifiers) > max_classifiers:
+            _classifiers.popitem(last=False)
+
+    return classifier
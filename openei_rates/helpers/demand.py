@@ -1,71 +1,175 @@
-
 import numpy as np
 import numba as nb
 
 from ..data_objects import Period, DemandResult
 
 
-@nb.njit
-def peak_period(
-        qty_array: np.array,
-        period: Period,
-        net: bool,
-        agg_func: callable,
-        ):
+@nb.njit(cache=True)
+def peak_window(qty_array: np.array, span: int):
+    """Finds the window of ``span`` intervals with the largest sum.
+    Uses a running sum, so the search is O(n) with no slicing.
+
+    :returns:   A tuple of the window's start index and its sum.
+    """
     length = qty_array.shape[0]
 
-    if period.span > length:
+    if span > length:
         raise IndexError('qty_array is smaller than the interval window.')
-    if agg_func is None:
-        raise ValueError('Cannot have a NoneType callable.')
+    if span < 1:
+        raise ValueError('The interval window must be at least 1.')
 
-    peak = 0
+    total = 0.0
+    for i in range(span):
+        total += qty_array[i]
+
+    peak = 0.0
     idx = 0
-    for i in range(length - period.span):
-        x = agg_func(qty_array[i:i + period.span])
-        if x > peak:
-            peak = x
+    if total > peak:
+        peak = total
+
+    # Slide the window one interval at a time, including the final offset
+    for i in range(1, length - span + 1):
+        total += qty_array[i + span - 1] - qty_array[i - 1]
+        if total > peak:
+            peak = total
             idx = i
-   
-    normalized = False
-    if agg_func == np.mean:
-        normalized = True
+
+    return idx, peak
+
+
+@nb.njit(cache=True)
+def peak_period(
+        qty_array: np.array,
+        period: Period,
+        net: bool,
+        ):
+    """Finds the peak window sum of ``period.span`` intervals.
+    """
+    idx, peak = peak_window(qty_array, period.span)
 
     return DemandResult(
-        normalized=normalized,
-        index=idx,
+        normalized=False,
+        peak_index=idx,
         qty=peak,
         span=period.span,
         net_metered=net
     )
 
 
-@nb.njit
-def basic_period(
+@nb.njit(cache=True)
+def peak_period_normalized(
         qty_array: np.array,
         period: Period,
         net: bool,
-        agg_func: callable):
+        ):
+    """Finds the peak window of ``period.span`` intervals, reported as the
+    window mean. For power readings, this is the demand over the window.
+    """
+    idx, peak = peak_window(qty_array, period.span)
 
-    if agg_func is None:
-        raise ValueError('Cannot have a NoneType callable.')
+    return DemandResult(
+        normalized=True,
+        peak_index=idx,
+        qty=peak / period.span,
+        span=period.span,
+        net_metered=net
+    )
 
+
+@nb.njit(cache=True)
+def basic_period(
+        qty_array: np.array,
+        period: Period,
+        net: bool,
+        ):
+    """Sums the whole period. Negative quantities are dropped unless net metered.
+    """
     result = 0.0
 
     if net:
-        result = agg_func(qty_array)
+        result = np.sum(qty_array)
     else:
-        result = agg_func(np.maximum(qty_array, 0.))
+        result = np.sum(np.maximum(qty_array, 0.))
 
-    normalized = False
+    return DemandResult(
+        normalized=False,
+        peak_index=0,
+        qty=result,
+        span=period.span,
+        net_metered=net
+    )
 
-    if agg_func == np.mean:
-        normalized = True
+
+@nb.njit(cache=True)
+def basic_period_normalized(
+        qty_array: np.array,
+        period: Period,
+        net: bool,
+        ):
+    """Averages the whole period. Negative quantities are dropped unless net metered.
+    """
+    result = 0.0
+
+    if qty_array.shape[0] > 0:
+        if net:
+            result = np.mean(qty_array)
+        else:
+            result = np.mean(np.maximum(qty_array, 0.))
 
     return DemandResult(
-        normalized=normalized,
-        index=0,
+        normalized=True,
+        peak_index=0,
         qty=result,
         span=period.span,
         net_metered=net
     )
+
+
+@nb.njit(parallel=True, cache=True)
+def ratchet_demand(
+        peaks: np.array,
+        keys: np.array,
+        ratchet_pct: np.array,
+        lookback: int,
+        floor: float,
+        ceiling: float,
+        history_peaks: np.array,
+        history_keys: np.array,
+        ):
+    """Turns monthly peaks into billing demands for many meters at once.
+
+    A month's billing demand is the larger of its own peak and its ratchet percentage of the
+    highest peak in the **lookback** months before it, then clipped to **floor** and **ceiling**
+    the same way as ``Peak.clip``. Trailing peaks come from earlier columns and from the history.
+
+    :param peaks:           A 2-D array of meters x months of metered peak demand.
+    :param keys:            The month of each column as ``year * 12 + month - 1``, ascending.
+    :param ratchet_pct:     The ratchet percentage for each calendar month (12).
+    :param floor:           The minimum billing demand, or ``-inf``.
+    :param ceiling:         The maximum billing demand, or ``inf``.
+    :param history_peaks:   A 2-D array of meters x earlier months of peaks. May have no columns.
+    :param history_keys:    The month keys of the history columns, ascending and before ``keys[0]``.
+
+    :returns:   A 2-D array of meters x months.
+    """
+    n_meters, n_months = peaks.shape
+    out = np.empty((n_meters, n_months))
+
+    for m in nb.prange(n_meters):
+        for j in range(n_months):
+            trailing = 0.0
+            for k in range(history_keys.shape[0]):
+                if keys[j] - lookback <= history_keys[k] < keys[j]:
+                    trailing = max(trailing, history_peaks[m, k])
+            for k in range(j):
+                if keys[j] - lookback <= keys[k]:
+                    trailing = max(trailing, peaks[m, k])
+
+            demand = max(peaks[m, j], ratchet_pct[keys[j] % 12] * trailing)
+
+            # Same order as Peak.clip
+            demand = max(floor, demand)
+            demand = min(ceiling, demand)
+            out[m, j] = demand
+
+    return out
@@ -3,7 +3,38 @@ import numba as nb
 from ..data_objects import Period, TierIndex, Tier
 
 
-@nb.jit(nopython=True, nogil=False)
+@nb.njit(cache=True)
+def tier_index(qty: float, tou: np.array):
+    """Returns the index of the tier that **qty** falls in for one period's
+    tiers. A tier is selected when its max is unlimited (``<= 0``) or the
+    quantity fits under it. Quantities exceeding every tier use the last tier.
+    """
+    last = tou.shape[0] - 1
+    for i in range(last):
+        tier_max = tou[i, TierIndex.MAX]
+        if tier_max <= 0. or qty <= tier_max:
+            return i
+    return last
+
+
+@nb.njit(cache=True)
+def tier_cost(qty: float, tou: np.array):
+    """Prices **qty** against one period's tiers. Positive quantities are
+    bought at the rate, negative ones sold at the sell price, and the
+    adjustment applies to both.
+    """
+    row = tou[tier_index(qty, tou)]
+
+    cost = 0.0
+    if qty >= 0:
+        cost = qty * row[TierIndex.RATE]
+    else:
+        cost = qty * row[TierIndex.SELL]
+
+    return cost + abs(qty) * row[TierIndex.ADJ]
+
+
+@nb.jit(nopython=True, nogil=True, cache=True)
 def get_Tier(qty: float, period: Period,
              struct: np.array, schedule: np.array):
     """Returns the rate information for the supplied TOU.
@@ -60,16 +91,7 @@ def get_Tier(qty: float, period: Period,
     assert tou.shape[1] == TierIndex.ARRAY_LENGTH,\
         'Incorrectly shaped Tier rows.'
 
-    i = 0
-    row = np.array([np.inf, 0., 0., 0.], dtype=np.float32)
-
-    while i < tou.shape[0]:
-        row = tou[i, :]
-        if row[TierIndex.MAX] <= 0.:
-            break
-        elif qty <= row[TierIndex.MAX]:        
-            break
-        i += 1
+    row = tou[tier_index(qty, tou), :]
 
     return Tier(
         max=row[TierIndex.MAX],
@@ -77,3 +99,44 @@ def get_Tier(qty: float, period: Period,
         adj=row[TierIndex.ADJ],
         sell=row[TierIndex.SELL]
     )
+
+
+def get_tou_periods(months: np.array, hours: np.array, is_weekend: np.array,
+                    wd_schedule: np.array, we_schedule: np.array):
+    """Returns the TOU period index for every interval at once.
+
+    :param months:      Month of each interval (1-12).
+    :param hours:       Hour of each interval (0-23).
+    :param is_weekend:  Boolean mask of weekend/holiday intervals.
+    :param wd_schedule: A 12x24 weekday schedule array.
+    :param we_schedule: A 12x24 weekend schedule array.
+
+    :returns:           A ``numpy.array`` of period indexes, one per interval.
+    """
+    month_index = np.asarray(months, dtype=np.intp) - 1
+    hour_index = np.asarray(hours, dtype=np.intp)
+
+    return np.where(
+        is_weekend,
+        we_schedule[month_index, hour_index],
+        wd_schedule[month_index, hour_index]
+    )
+
+
+def get_tier_indexes(qty_array: np.array, periods: np.array,
+                     struct: np.array):
+    """Vectorized counterpart of ``get_Tier``. Picks the tier for every
+    interval given its quantity and period.
+
+    A tier is selected when its max is unlimited (``<= 0``) or the quantity
+    fits under it. Quantities exceeding every tier use the last tier.
+
+    :returns:   A ``numpy.array`` of tier indexes, one per interval.
+    """
+    maxes = struct[periods, :, TierIndex.MAX]
+    fits = (maxes <= 0.) | (np.asarray(qty_array)[:, None] <= maxes)
+
+    tiers = np.argmax(fits, axis=1)
+    tiers[~fits.any(axis=1)] = struct.shape[1] - 1
+
+    return tiers
@@ -0,0 +1,32 @@
+import numba as nb
+
+from contextlib import contextmanager
+
+
+def max_threads():
+    """Returns the size of numba's thread pool (``NUMBA_NUM_THREADS``, by default every core)."""
+    return nb.config.NUMBA_NUM_THREADS
+
+
+@contextmanager
+def num_threads(threads: int = None):
+    """Limits the ``parallel=True`` kernels to **threads** threads while the block runs.
+    ``None`` leaves the current setting alone. The setting is per calling thread.
+
+    :param threads: The number of threads, from 1 to ``max_threads()``.
+
+    :raises:    ``ValueError`` if **threads** is out of range.
+    """
+    if threads is None:
+        yield
+        return
+
+    if not (1 <= threads <= max_threads()):
+        raise ValueError('threads must be between 1 and {}.'.format(max_threads()))
+
+    previous = nb.get_num_threads()
+    nb.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        nb.set_num_threads(previous)
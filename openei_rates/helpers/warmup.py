@@ -0,0 +1,72 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _sample_rate_info():
+    flat = [[0] * 24 for _ in range(12)]
+
+    info = {
+        'label': 'warmup',
+        'demandratewindow': 15,
+        'energyratestructure': [[{'max': 10., 'rate': 0.1}, {'rate': 0.2, 'adj': 0.01, 'sell': 0.05}]],
+        'energyweekdayschedule': flat,
+        'energyweekendschedule': flat,
+        'demandratestructure': [[{'rate': 1.0}]],
+        'demandweekdayschedule': flat,
+        'demandweekendschedule': flat,
+        'flatdemandstructure': [[{'rate': 1.0}]],
+        'flatdemandmonths': [0] * 12,
+        'fixedmonthlycharge': 1.0,
+        'coincidentratestructure': [[{'rate': 1.0}]],
+        'coincidentrateschedule': flat,
+    }
+
+    return info
+
+
+def compile_kernels(parallel: bool = False, full: bool = False):
+    """Compiles the kernels ``RateSchedule`` uses, for the array types it produces, by
+    pricing a small synthetic load. With numba's on-disk cache, later processes load the
+    compiled code instead of compiling it again.
+
+    Only the kernels a default ``get_costs`` call runs are loaded unless more are asked for,
+    since every extra kernel adds to the start-up time this is meant to cut.
+
+    :param parallel:    Whether to compile the multi-threaded kernels too.
+    :param full:        Whether to compile every other variant: cumulative tiers, charges booked
+                        at month end, batch and streaming billing, and demand ratchets.
+
+    :returns:   The time taken, in seconds.
+    """
+    from ..rateschedule import RateSchedule
+
+    start = time.perf_counter()
+
+    index = pd.date_range(start='2020-01-31 12:00', periods=96, freq='15min')
+    qty = np.linspace(-1., 20., index.size)
+    s = pd.Series(qty, index=index)
+
+    # Schedules from the schedule cache are read-only, which numba compiles separately
+    schedules = (RateSchedule(_sample_rate_info()), RateSchedule(_sample_rate_info()).freeze())
+
+    for rs in schedules:
+        rs.get_costs(s)
+        if parallel:
+            rs.get_costs(s, parallel=True)
+
+    if full:
+        for rs in schedules:
+            for cumulative in (False, True):
+                for distribute in (False, True):
+                    rs.get_costs(s, distribute_monthly=distribute, cumulative_tiers=cumulative)
+                    if parallel:
+                        rs.get_costs(s, distribute_monthly=distribute, cumulative_tiers=cumulative, parallel=True)
+
+            for cumulative in (False, True):
+                rs.get_batch_costs(np.vstack((qty, qty)), index, cumulative_tiers=cumulative)
+                list(rs.iter_costs([s.iloc[:48], s.iloc[48:]], cumulative_tiers=cumulative))
+            rs.get_batch_costs(np.vstack((qty, qty)), index, ratchet=True)
+
+    return time.perf_counter() - start
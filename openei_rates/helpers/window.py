@@ -1,186 +1,308 @@
 import numba as nb
 import numpy as np
-# import pandas as pd
+import pandas as pd
 
-from .sched import get_Tier
-from ..data_objects import Tier, Period
+from typing import NamedTuple
 
+from .sched import tier_index
+from .demand import peak_period, peak_period_normalized, basic_period, basic_period_normalized
+from ..data_objects import Tier, TierIndex, Period
 
-@nb.njit
+
+def segment_bounds(keys: np.array):
+    """Returns the boundaries of runs of equal **keys**, e.g. billing months.
+    Segment ``i`` spans ``bounds[i]:bounds[i + 1]``.
+
+    :param keys:    A sorted 1-D array of segment keys, one per interval.
+
+    :returns:       A ``numpy.array`` of ``intp`` with the start of every
+                    segment followed by the total length.
+    """
+    keys = np.asarray(keys)
+    return np.concatenate((
+        [0],
+        np.flatnonzero(np.diff(keys)) + 1,
+        [keys.shape[0]]
+    )).astype(np.intp)
+
+
+def _wall_ns(index: pd.DatetimeIndex):
+    # Segments follow local wall-clock time for tz-aware indexes
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.asi8
+
+
+def hour_keys(index: pd.DatetimeIndex):
+    return _wall_ns(index) // 3600000000000
+
+
+def day_keys(index: pd.DatetimeIndex):
+    return _wall_ns(index) // 86400000000000
+
+
+def month_keys(index: pd.DatetimeIndex):
+    return index.year.values * 12 + index.month.values
+
+
+def billing_cycle_keys(index: pd.DatetimeIndex, read_dates):
+    """Assigns every interval to the billing cycle that starts at the latest
+    meter read at or before it. Intervals before the first read form cycle 0.
+
+    :param read_dates:  The meter read (cycle start) dates.
+    """
+    reads = pd.DatetimeIndex(read_dates)
+    if index.tz is not None and reads.tz is None:
+        reads = reads.tz_localize(index.tz)
+    return np.searchsorted(np.sort(reads.asi8), index.asi8, side='right')
+
+
+SEGMENT_KEYS = {
+    'hour': hour_keys,
+    'day': day_keys,
+    'month': month_keys,
+}
+
+
+def period_bounds(index: pd.DatetimeIndex, by='month'):
+    """Returns the segment boundaries of **index** for a billing segmentation.
+
+    :param index:   A sorted ``pandas.DatetimeIndex``.
+    :param by:      One of ``'hour'``, ``'day'`` or ``'month'``, or a callable
+                    that maps the index to one key per interval, e.g.
+                    ``lambda i: billing_cycle_keys(i, reads)``.
+
+    :returns:       Boundaries as returned by ``segment_bounds``.
+    """
+    if callable(by):
+        keys = by(index)
+    else:
+        try:
+            keys = SEGMENT_KEYS[by](index)
+        except KeyError:
+            raise ValueError('Unknown segmentation: {}'.format(by))
+
+    return segment_bounds(keys)
+
+
+def spread_segments(values: np.array, bounds: np.array, distribute: bool = True):
+    """Expands one value per segment to one value per interval, spread evenly over the
+    segment or booked on its last interval.
+
+    :param values:      One value per segment.
+    :param bounds:      Segment boundaries from ``segment_bounds``.
+    :param distribute:  If ``False``, each value is booked on the segment's last interval.
+    """
+    sizes = np.diff(bounds)
+    if distribute:
+        return np.repeat(values / sizes, sizes)
+
+    out = np.zeros(bounds[-1])
+    out[bounds[1:] - 1] = values
+    return out
+
+
+# Reductions and cost assignments are selected by code rather than passed as functions,
+# so the kernels that use them can be cached on disk.
+Reduce = NamedTuple(
+    'ReduceNT',
+    [
+        ('PEAK', int),
+        ('PEAK_NORMALIZED', int),
+        ('BASIC', int),
+        ('BASIC_NORMALIZED', int),
+    ]
+)(0, 1, 2, 3)
+
+Assign = NamedTuple(
+    'AssignNT',
+    [
+        ('FRONT', int),
+        ('END', int),
+        ('DISTRIBUTE', int),
+        ('AT_INDEX', int),
+    ]
+)(0, 1, 2, 3)
+
+
+@nb.njit(cache=True)
 def assign_front(a: np.array, val: float, index: int):
     a[0] = val
     return None
 
 
-@nb.njit
+@nb.njit(cache=True)
 def assign_end(a: np.array, val: float, index: int):
     a[-1] = val
     return None
 
 
-@nb.njit
+@nb.njit(cache=True)
 def assign_distribute(a: np.array, val: float, index: int):
-    a[:] = val / np.size(a, 0)
+    a[:] = val / a.shape[0]
     return None
 
 
-@nb.njit
+@nb.njit(cache=True)
 def assign_at_index(a: np.array, val: float, index: int):
     a[index] = val
     return None
 
 
-@nb.njit
+ASSIGN_CODES = {
+    assign_front: Assign.FRONT,
+    assign_end: Assign.END,
+    assign_distribute: Assign.DISTRIBUTE,
+    assign_at_index: Assign.AT_INDEX,
+}
+
+
+@nb.njit(cache=True)
+def _assign(a: np.array, val: float, index: int, mode: int):
+    if mode == Assign.FRONT:
+        assign_front(a, val, index)
+    elif mode == Assign.END:
+        assign_end(a, val, index)
+    elif mode == Assign.AT_INDEX:
+        assign_at_index(a, val, index)
+    else:
+        assign_distribute(a, val, index)
+
+
+@nb.njit(cache=True)
+def _reduce(qty_array: np.array, period: Period, net: bool, mode: int):
+    if mode == Reduce.PEAK:
+        return peak_period(qty_array, period, net)
+    elif mode == Reduce.PEAK_NORMALIZED:
+        return peak_period_normalized(qty_array, period, net)
+    elif mode == Reduce.BASIC_NORMALIZED:
+        return basic_period_normalized(qty_array, period, net)
+    return basic_period(qty_array, period, net)
+
+
+@nb.njit(cache=True)
 def _window_cost(
         out_a: np.array,
         qty_total: float,
         tier: Tier,
         index: int,
         retail_net: bool,
-        assignment_func):
+        assign_mode: int):
 
-    total_cost = qty_total * tier.adj
+    total_cost = abs(qty_total) * tier.adj
 
     if qty_total < 0 and not retail_net:
         total_cost += (qty_total * tier.sell)
     else:
         total_cost += qty_total * tier.price
 
-    assignment_func(out_a, total_cost, index)
-
+    _assign(out_a, total_cost, index, assign_mode)
 
-@nb.njit
-def _sched(weekend: bool, wd_a: np.array, we_a: np.array):
-    sched = wd_a
-    if weekend and we_a.shape[0] > 0:
-        sched = we_a
-    return sched
 
-
-@nb.njit
-def hour_changed(a: Period, b: Period):
-    return not (a.hour == b.hour)
-
-
-@nb.njit
-def month_changed(a: Period, b: Period):
-    return not (a.month == b.month)
-
-
-@nb.njit
-def window(
+@nb.njit(cache=True)
+def _window_segment(
         qty_array: np.array,
         out: np.array,
+        start: int,
+        end: int,
+        periods: np.array,
         price_struct: np.array,
-        months: np.array,
-        hours: np.array,
-        is_weekend: np.array,
-        wd_schedule: np.array,
-        we_schedule: np.array,
         interval_hours: float,
+        window_span: int,
         net_meter: bool,
-        period_change_func,
-        demand_func,
-        cost_assignment_func,
-        demand_agg_func,
-        retail_net: bool = False,
-        window_span: int = 1):
+        reduce_mode: int,
+        assign_mode: int,
+        retail_net: bool):
 
-    num = qty_array.shape[0]
+    if end <= start:
+        return
 
     current_period = Period(
         interval_hours=interval_hours,
-        span=window_span,
-        month=months[0],
-        hour=hours[0],
-        weekend=is_weekend[0],
+        span=min(window_span, end - start),
+        month=0,
+        hour=0,
+        weekend=False,
     )
 
-    window_index = 0
-    for i in range(num):
-        # qty = process_period(qty_array, net_meter, interval_time, avg)
-        new_period = Period(
-            interval_hours=current_period.interval_hours,
-            span=current_period.span,
-            month=months[i],
-            hour=hours[i],
-            weekend=is_weekend[i]
-        )
+    demand_result = _reduce(qty_array[start:end], current_period, net_meter, reduce_mode)
 
-        # Did our interval change?
-        if period_change_func(current_period, new_period):
-
-            # Get the window search done
-            demand_result = demand_func(
-                qty_array[window_index:i],
-                current_period,
-                net_meter,
-                demand_agg_func
-            )
-
-            tou_period = Period(
-                interval_hours=current_period.interval_hours,
-                span=current_period.span,
-                month=months[window_index:i][demand_result.index],
-                hour=hours[window_index:i][demand_result.index],
-                weekend=is_weekend[window_index:i][demand_result.index]
-            )
-
-            tier = get_Tier(
-                demand_result.qty,
-                tou_period,
-                price_struct,
-                _sched(
-                    is_weekend[window_index:i][demand_result.index],
-                    wd_schedule,
-                    we_schedule
-                )
-            )
-
-            _window_cost(
-                qty_array[window_index:i],
-                out[window_index:i],
-                demand_result.qty,
-                tier,
-                demand_result.index,
-                retail_net,
-                cost_assignment_func
-            )
-
-            window_index = i
-
-        # Change the current period every hour
-        if not (current_period.hour == new_period.hour):
-            current_period = new_period
-
-        # endif
-        i += 1
-
-    # Out of loop
-    # do the last window
-    demand_result = demand_func(
-        qty_array[window_index:num],
-        current_period,
-        net_meter,
-        demand_agg_func
-    )
+    tou = price_struct[periods[start + demand_result.peak_index]]
+    row = tou[tier_index(demand_result.qty, tou)]
 
-    tier = get_Tier(
-        demand_result.qty,
-        current_period,
-        price_struct,
-        _sched(
-            is_weekend[window_index:num][demand_result.index],
-            wd_schedule,
-            we_schedule
-        )
+    tier = Tier(
+        max=row[TierIndex.MAX],
+        price=row[TierIndex.RATE],
+        adj=row[TierIndex.ADJ],
+        sell=row[TierIndex.SELL]
     )
 
     _window_cost(
-        qty_array[window_index:num],
-        out[window_index:num],
+        out[start:end],
         demand_result.qty,
         tier,
+        demand_result.peak_index,
         retail_net,
-        cost_assignment_func
+        assign_mode
     )
+
+
+@nb.njit(cache=True)
+def window(
+        qty_array: np.array,
+        out: np.array,
+        bounds: np.array,
+        periods: np.array,
+        price_struct: np.array,
+        interval_hours: float,
+        window_span: int,
+        net_meter: bool,
+        reduce_mode: int,
+        assign_mode: int,
+        retail_net: bool = False):
+    """Reduces every segment of **qty_array**, prices the result and writes the cost
+    into **out**.
+
+    Each segment is priced at the TOU period of the interval the reduction points to
+    (the start of the peak window, or the segment start). Windows longer than a
+    segment are shortened to fit it.
+
+    :param bounds:      Segment boundaries from ``segment_bounds`` or ``period_bounds``.
+    :param periods:     The period of each interval, indexing into **price_struct**.
+    :param window_span: The demand window, in intervals.
+    :param reduce_mode: A ``Reduce`` code naming one of the ``helpers.demand`` reductions.
+    :param assign_mode: An ``Assign`` code for how the cost is spread over the segment.
+    :param retail_net:  If ``True``, net exports are credited at the retail rate.
+    """
+    for s in range(bounds.shape[0] - 1):
+        _window_segment(
+            qty_array, out, bounds[s], bounds[s + 1], periods, price_struct,
+            interval_hours, window_span, net_meter, reduce_mode, assign_mode, retail_net
+        )
+
+    return out
+
+
+@nb.njit(parallel=True, cache=True)
+def window_parallel(
+        qty_array: np.array,
+        out: np.array,
+        bounds: np.array,
+        periods: np.array,
+        price_struct: np.array,
+        interval_hours: float,
+        window_span: int,
+        net_meter: bool,
+        reduce_mode: int,
+        assign_mode: int,
+        retail_net: bool = False):
+    """``window`` with the segments spread across threads. Segments only write to
+    their own slice of **out**, so the result is identical to ``window``.
+    """
+    for s in nb.prange(bounds.shape[0] - 1):
+        _window_segment(
+            qty_array, out, bounds[s], bounds[s + 1], periods, price_struct,
+            interval_hours, window_span, net_meter, reduce_mode, assign_mode, retail_net
+        )
+
+    return out
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from .api import OpenEIApi
+from .cache import ResponseCache
+from .catalog import RateCatalog
 from .rate import Rate
 import datetime
 import re
@@ -11,17 +13,28 @@ class OpenEIRates(object):
 
     allowed_sectors = ['Residential', 'Commercial', 'Industrial', 'Lighting']
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache: ResponseCache = None):
 
-        self.api = OpenEIApi(api_key)
+        self.api = OpenEIApi(api_key, cache=cache)
 
-        self.rates = []
+        self.rates = RateCatalog()
 
         self.utility_filter = ''
         self.rate_name_filter = ''
         self.active_date = datetime.datetime.now()
     
 
+    @property
+    def rates(self):
+        """The current rates, as an indexed `RateCatalog`.
+        """
+        return self._rates
+
+    @rates.setter
+    def rates(self, rates):
+        # Wrapping only copies the list; indexes are built when first queried
+        self._rates = rates if isinstance(rates, RateCatalog) else RateCatalog(rates)
+
     def _sectors(self, sector_str: str):
         possible_sectors = list(map(lambda x: x.title(), re.findall(r'[\w]+', sector_str)))
         return [s for s in possible_sectors if s in self.allowed_sectors]
@@ -43,38 +56,21 @@ class OpenEIRates(object):
         if not active_date:
             active_date = self.active_date
 
-        newlist = []
-        rlist = rates if rates else self.rates
-        
-        sectors = self._sectors(sector)
-
-        rate: Rate
-        for rate in rlist:
-            add_status = []
-
-            # If utility is blank, default to True
-            # Otherwise, see if the string is in the field
-            if utility:
-                add_status.append(utility in rate.utility)
+        criteria = dict(
+            utility = utility,
+            name = name,
+            active = active,
+            only_approved = only_approved,
+            sectors = self._sectors(sector),
+            active_date = active_date
+        )
+
+        # A list passed in is filtered once, so it is scanned rather than indexed
+        if rates and not isinstance(rates, RateCatalog):
+            newlist = RateCatalog.scan(rates, **criteria)
+        else:
+            newlist = (rates or self.rates).filter(**criteria)
 
-            # Same as utility, but with name
-            if name:
-                add_status.append(name in rate.name)
-
-            # Get approval status equality
-            if only_approved:
-                add_status.append(rate.approved)
-
-            # See if the rate's sector is in of the allowed sectors of the filter
-            if sectors:
-                add_status.append(rate.sector in sectors)
-
-            if active and active_date:
-                add_status.append( rate.is_active(active_date) )
-
-            if all(add_status):
-                newlist.append(rate)
-        
         if replace or not rates:
             self.rates = newlist
         
@@ -135,9 +131,9 @@ class OpenEIRates(object):
         """
 
         if use_cached:
-            for rate in self.rates:
-                if rate.label == label:
-                    return Rate
+            rate = self.rates.get(label)
+            if rate is not None:
+                return rate
 
         params = {
             'getpage': label
@@ -1,11 +1,29 @@
+import calendar
 import datetime
 from .api import OpenEIApi
-from .rateschedule import RateSchedule
+from .cache import schedule_cache
 
 class Rate(object):
     """A Rate object holds metadata about a rate. It pulls down a new RateSchedule only when needed.
     """
 
+    __slots__ = (
+        'sector',
+        'approved',
+        'openei_uri',
+        'name',
+        'label',
+        'utility',
+        'description',
+        'source',
+        'source_parent_uri',
+        'wiring',
+        'eia_id',
+        'begin_date',
+        'end_date',
+        'rate_schedule',
+    )
+
     def __init__(self, d: dict):
 
         self.sector = d.get('sector')
@@ -39,7 +57,26 @@ class Rate(object):
                 return dt < self.end_date if self.end_date else True
         return False
     
-    def get_rate_schedule(self, api: OpenEIApi):
+    def get_rate_schedule(self, api: OpenEIApi, use_cache: bool = True):
+        """Fetches and parses this rate's schedule.
+
+        :param  api:        The API to query.
+        :type   api:        `OpenEIApi`
+
+        :param  use_cache:  If ``True``, a schedule already parsed in this process for the same label and
+                            ``begin_date`` is reused, and a new one is stored. See ``cache.ScheduleCache``.
+        :type   use_cache:  ``bool``
+
+        :return:    The `RateSchedule`, or ``None`` if the API returned nothing.
+        """
+        # Stored under the startdate it was looked up by, so a rate without one finds it again
+        startdate = calendar.timegm(self.begin_date.utctimetuple()) if self.begin_date else None
+        if use_cache:
+            cached = schedule_cache.get(self.label, startdate)
+            if cached is not None:
+                self.rate_schedule = cached
+                return cached
+
         params = {
             'getpage': self.label,
             'detail': 'full',
@@ -48,7 +85,10 @@ class Rate(object):
         code, items = api.rate_query(params)
         
         if items:
+            from .rateschedule import RateSchedule
             self.rate_schedule = RateSchedule(items[0])
+            if use_cache:
+                schedule_cache.put(self.rate_schedule, startdate)
 
             return self.rate_schedule
 
@@ -1,26 +1,31 @@
 import numpy as np
 import datetime
 import pandas as pd
-from pandas.tseries.holiday import AbstractHolidayCalendar
-from pandas.tseries.holiday import USFederalHolidayCalendar
 
-from .helpers.sched import get_tou
-from .helpers.costs import get_tou_tier, get_tou, calculate_flat_cost, calculate_tou_cost, process_period, period_cost
+from typing import TYPE_CHECKING
 
-from .helpers.demand import get_Peak
+# The compiled kernels (and numba) are imported by the methods that price loads
+from .helpers.daytype import day_classifier
 
 from . import logger
 
-from .data_objects import Peak, Tier
+from .data_objects import TierIndex
+
+if TYPE_CHECKING:
+    from pandas.tseries.holiday import AbstractHolidayCalendar
+
 
 class RateSchedule(object):
     """Contains all the pricing and time-of-use (TOU) information for a particular rate.
     """
 
-    default_start_date = AbstractHolidayCalendar.start_date
-    default_end_date = AbstractHolidayCalendar.end_date
+    # The span of pandas.tseries.holiday.AbstractHolidayCalendar
+    default_start_date = pd.Timestamp(datetime.datetime(1970, 1, 1))
+    default_end_date = pd.Timestamp(datetime.datetime(2200, 12, 31))
     weekmask = [0, 1, 2, 3, 4 ] # Workdays
     default_demand_window = 15
+    # How many months back a demand ratchet reaches
+    ratchet_lookback = 11
 
     class SType(object):
         __slots__ = ()
@@ -43,7 +48,7 @@ class RateSchedule(object):
         self,
         rate_info: dict, 
         default_price: float = .13,
-        holiday_calendar: AbstractHolidayCalendar = USFederalHolidayCalendar()
+        holiday_calendar: 'AbstractHolidayCalendar' = None
         ):
         """
         Creates a RateSchedule object.
@@ -57,6 +62,7 @@ class RateSchedule(object):
 
         :param  holiday_calendar:   A Pandas holiday calendar used for calculating holiday times for determining appropiate rates.
                                     Defaults to using the [Pandas US federal holiday calendar](https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html).
+                                    Holidays are evaluated once per calendar and span of years, and shared between schedules.
         :type   holiday_calendar:   ``pandas.tseries.holiday.AbstractHolidayCalendar``
         """
 
@@ -70,15 +76,16 @@ class RateSchedule(object):
         end_dt = rate_info.get('enddate', None)
 
         self.features = set({})
+
+        if holiday_calendar is None:
+            from pandas.tseries.holiday import USFederalHolidayCalendar
+            holiday_calendar = USFederalHolidayCalendar()
         
-        if begin_dt and end_dt:
+        # Off days come from a classifier shared by every schedule on the same calendar and years
+        start_year = pd.Timestamp(begin_dt, unit='s').year if begin_dt and end_dt else __class__.default_start_date.year
+        end_year = pd.Timestamp(end_dt, unit='s').year if begin_dt and end_dt else __class__.default_end_date.year
 
-            self.holidays = holiday_calendar.holidays(
-                    start = pd.Timestamp.fromtimestamp(begin_dt),
-                    end = pd.Timestamp.fromtimestamp(end_dt)
-                )
-        else:
-            self.holidays = holiday_calendar.holidays()
+        self.day_classifier = day_classifier(holiday_calendar, start_year, end_year, __class__.weekmask)
 
         self.label = rate_info.get('label')
 
@@ -106,18 +113,18 @@ class RateSchedule(object):
 
         # Demand charges
         d_rate_struct = rate_info.get('demandratestructure')
-        self.demand_rates = RateSchedule.build_rate_structure(d_rate_struct)    
+        self.demand_rates = RateSchedule.build_rate_structure(d_rate_struct)
 
         d_flat_struct = rate_info.get('flatdemandstructure')
-        self.flat_demand_rates = RateSchedule.build_rate_structure(d_flat_struct)  
+        self.flat_demand_rates = RateSchedule.build_rate_structure(d_flat_struct)
 
         # Coincident
         c_rate_struct = rate_info.get('coincidentratestructure')
-        self.coincident_rates = __class__.build_rate_structure(c_rate_struct)  
+        self.coincident_rates = __class__.build_rate_structure(c_rate_struct)
 
         # Energy rate
         e_rate_struct = rate_info.get('energyratestructure')
-        if not e_rate_struct:
+        if e_rate_struct is None or len(e_rate_struct) == 0:
             e_rate_struct = [[{'rate': default_price}]]
             logger.warn('Energy pricing structure not found. Falling back to default price!')
         self.energy_rates = __class__.build_rate_structure(e_rate_struct)
@@ -131,28 +138,31 @@ class RateSchedule(object):
         d_wd_sched = rate_info.get('demandweekdayschedule')
         d_we_sched = rate_info.get('demandweekendschedule')
         d_flat_sched = rate_info.get('flatdemandmonths')
-        self.demand_weekday_schedule = np.array(d_wd_sched, dtype=np.uint8) if d_wd_sched else None
-        self.demand_weekend_schedule = np.array(d_we_sched, dtype=np.uint8) if d_we_sched else None
-        self.flat_demand_months = np.array(d_flat_sched, dtype=np.uint8) if d_flat_sched else None
+        self.demand_weekday_schedule = __class__.build_schedule(d_wd_sched)
+        self.demand_weekend_schedule = __class__.build_schedule(d_we_sched)
+        self.flat_demand_months = __class__.build_schedule(d_flat_sched)
 
 
         e_wd_sched = rate_info.get('energyweekdayschedule')
         e_we_sched = rate_info.get('energyweekendschedule')
-        if not e_wd_sched:
+        self.energy_weekday_schedule = __class__.build_schedule(e_wd_sched)
+        self.energy_weekend_schedule = __class__.build_schedule(e_we_sched)
+        if self.energy_weekday_schedule is None:
             logger.warn('Could not load weekday energy TOU schedule. Falling back to default!')
-        if not e_we_sched:
+            self.energy_weekday_schedule = np.copy(default_tou)
+        if self.energy_weekend_schedule is None:
             logger.warn('Could not load weekend energy TOU schedule. Falling back to default!')
-        self.energy_weekday_schedule = np.array(e_wd_sched, dtype=np.uint8) if e_wd_sched else np.copy(default_tou)
-        self.energy_weekend_schedule = np.array(e_we_sched, dtype=np.uint8) if e_we_sched else np.copy(default_tou)
+            self.energy_weekend_schedule = np.copy(default_tou)
 
         c_sched = rate_info.get('coincidentrateschedule')
-        self.coincident_schedule = np.array(c_sched, dtype=np.uint8) if c_sched else None
+        self.coincident_schedule = __class__.build_schedule(c_sched)
 
 
-        self.demand_ratchet_pct = np.array(
-            rate_info.get('demandrachetpercentage', [0.0 for i in range(12)]),
-            dtype = np.float32
-        )
+        # URDB spells it 'demandratchetpercentage'; older responses and fixtures use 'demandrachetpercentage'
+        ratchet_pct = rate_info.get('demandratchetpercentage')
+        if ratchet_pct is None:
+            ratchet_pct = rate_info.get('demandrachetpercentage', [0.0 for i in range(12)])
+        self.demand_ratchet_pct = np.asarray(ratchet_pct, dtype = np.float32)
 
 
         # Fixed monthly charges
@@ -164,6 +174,9 @@ class RateSchedule(object):
 
         # Net metering?
         self.use_net_metering = rate_info.get('usenetmetering', False)
+
+        # Hourly period tables by (schedule type, year), built on first use
+        self._hourly_periods = {}
     
     def __str__(self):
         coin_ = 'coincident ' if (self.coincident_rates is not None) and (self.coincident_schedule is not None) else ''
@@ -176,6 +189,17 @@ class RateSchedule(object):
     def __repr__(self):
         return '<RateSchedule({})>'.format(self.label)
 
+    def freeze(self):
+        """Makes the schedule's rate structures, schedules and ratchets read-only, so a
+        schedule shared between callers cannot be changed in place by one of them.
+
+        :returns:   The schedule.
+        """
+        for value in vars(self).values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+        return self
+
     @classmethod
     def build_rate_structure(cls, struct: list):
         """Builds a rate structure Numpy array. The array will always be 3-dimensional.
@@ -183,32 +207,86 @@ class RateSchedule(object):
         The Rate Structure (X) n >= 1 Periods.
         Each Period (Y) has n >= 1 Tiers.
         Each Tier (Z) has a length of 4 (n = 4).
+        Periods with fewer tiers are padded as described in ``build_tiered_structure``.
 
         :param  struct: A list of rates and rate information. A 3-dimensional ``list`` (a ``list`` of ``list``s of ``list``s).
         :type   struct: ``list``
 
         :return:    A 3-dimensional  ``numpy.array`` of type ``numpy.float32``
                     or ``None`` if **struct** is ``None``.
+                    An array passed in as **struct** is returned as-is, without copying.
         """
-        if struct:
-            struct_a = []
-            for period in struct:
-                period_a = []
-                
-                for tier in period:
-                    tier_a = [0 for i in range(RateIndex.ARRAY_LENGTH)]
-                    tier_a[RateIndex.MAX_USE] = tier.get('max', 0.0)
-                    tier_a[RateIndex.RATE] = tier.get('rate', 0.0)
-                    tier_a[RateIndex.ADJ] = tier.get('rate', 0.0)
-                    tier_a[RateIndex.SELL] = tier.get('sell', 0.0)
-                    period_a.append(tier_a)
-                
-                struct_a.append(period_a)
-            
-            return np.array(struct_a, dtype=np.float32)
+        return cls.build_tiered_structure(struct)[0]
+
+    @classmethod
+    def build_tiered_structure(cls, struct: list):
+        """Builds a rate structure array from a possibly ragged list of periods, and the tier count of each period.
+
+        Periods with fewer tiers than the longest are padded with copies of their last tier whose max is
+        ``inf``. Tier lookups stop at the first sentinel, and a quantity past the last real tier is priced
+        at that tier, as before, so the kernels need no tier counts.
+
+        :param  struct: A list of periods, each a list of tier ``dict``s, or an array.
+        :type   struct: ``list``
+
+        :return:    A tuple of the ``numpy.float32`` array with shape (periods, tiers, 4) and a ``numpy.int64``
+                    array of tier counts, or ``(None, None)`` if **struct** is empty.
+                    Tier counts of an array count the tiers before any trailing sentinels.
+        :rtype:     ``tuple``
+        """
+        if isinstance(struct, np.ndarray):
+            if not struct.size:
+                return None, None
+            a = np.asarray(struct, dtype=np.float32)
+            real = ~np.isposinf(a[:, :, TierIndex.MAX])
+            counts = np.maximum(a.shape[1] - np.argmax(real[:, ::-1], axis=1), 1)
+            counts[~real.any(axis=1)] = 1
+            return a, counts.astype(np.int64)
+
+        if not struct:
+            return None, None
+
+        counts = np.array([max(len(period), 1) for period in struct], dtype=np.int64)
+        rows = np.array(
+            [
+                [tier.get(name, 0.0) or 0.0 for name in ('max', 'rate', 'adj', 'sell')]
+                for period in struct for tier in (period or [{}])
+            ],
+            dtype=np.float32
+        ).reshape(-1, TierIndex.ARRAY_LENGTH)
+
+        # Fill the real tiers in one assignment, then every padding slot with its period's last tier
+        a = np.empty((counts.size, counts.max(), TierIndex.ARRAY_LENGTH), dtype=np.float32)
+        real = np.arange(a.shape[1]) < counts[:, np.newaxis]
+        a[real] = rows
+        padding = ~real
+        if padding.any():
+            a[padding] = np.repeat(rows[np.cumsum(counts) - 1], a.shape[1] - counts, axis=0)
+            a[padding, TierIndex.MAX] = np.inf
+
+        return a, counts
+
+    @classmethod
+    def build_schedule(cls, sched):
+        """Builds a TOU schedule ``numpy.array`` of type ``numpy.uint8``.
+        Arrays that are already ``uint8``, such as memory-mapped snapshots, are not copied.
+
+        :param  sched:  A ``list`` of period indexes by month (and hour), or an array.
+
+        :return:    A ``numpy.array``, or ``None`` if **sched** is ``None`` or empty.
+        """
+        if sched is None or len(sched) == 0:
+            return None
+        return np.asarray(sched, dtype=np.uint8)
+
+    # Names accepted for each schedule type by ``get_structure_at`` and ``get_structures_at``
+    schedule_aliases = {
+        'energy': SType.ENERGY, 'en': SType.ENERGY,
+        'demand': SType.TOU_DEMAND, 'de': SType.TOU_DEMAND, 'tou_demand': SType.TOU_DEMAND,
+        'flat_demand': SType.FLAT_DEMAND, 'fd': SType.FLAT_DEMAND,
+        'coincident': SType.COINCIDENT, 'co': SType.COINCIDENT,
+    }
 
-        return None
-    
     def get_structure_at(self, ts, schedule_type: str = 'energy'):
         """Fetch rate structure information for a given timestamp.
 
@@ -223,30 +301,297 @@ class RateSchedule(object):
 
         :raises:    ``AttributeError`` if **schedule_type** is not a valid option.
         """
+        _, structures = self.get_structures_at(pd.DatetimeIndex([pd.Timestamp(ts)]), schedule_type)
+        return structures[0] if structures is not None else None
+
+    def get_structures_at(self, index, schedule_type: str = 'energy'):
+        """Looks up the TOU period and rate structure of every timestamp at once, from the cached hourly tables.
+
+        :param  index:  The timestamps.
+        :type   index:  ``pandas.DatetimeIndex`` or anything it can be built from
 
-        if schedule_type not in ['demand', 'flat_demand', 'coincident', 'energy', 'en', 'fd', 'de', 'co']:
+        :param  schedule_type:  Indicates which schedule to use. See ``get_structure_at``. Defaults to "energy".
+        :type   schedule_type:  ``str``
+
+        :return:    A tuple of the period of each timestamp (``numpy.uint8``) and its tiers, with shape
+                    (timestamps, tiers, 4), or ``(None, None)`` if the given schedule or rates are not initialized.
+                    Prices are ``structures[:, 0, TierIndex.RATE]`` for untiered rates.
+        :rtype:     ``tuple``
+
+        :raises:    ``AttributeError`` if **schedule_type** is not a valid option.
+        """
+        if schedule_type not in __class__.schedule_aliases:
             raise AttributeError
 
-        stamp = pd.Timestamp(ts)
+        stype = __class__.schedule_aliases[schedule_type]
+        rates = {
+            self.SType.ENERGY: self.energy_rates,
+            self.SType.TOU_DEMAND: self.demand_rates,
+            self.SType.FLAT_DEMAND: self.flat_demand_rates,
+            self.SType.COINCIDENT: self.coincident_rates,
+        }[stype]
 
-        weekend = stamp.date() in self.holidays or stamp.dayofweek not in __class__.weekmask
+        if rates is None:
+            return None, None
 
-        if schedule_type in ['flat_demand', 'fd'] and self.flat_demand_months and self.flat_demand_rates:
-            flat_index = get_flat_month(stamp.month, self.flat_demand_months, self.flat_demand_rates)
-            return self.flat_demand_rates[flat_index]
+        periods = self.tou_periods(pd.DatetimeIndex(index), stype)
+        if periods is None:
+            return None, None
 
-        elif schedule_type in ['coincident', 'co'] and self.coincident_schedule and self.coincident_rates:
-            return get_tou_info(stamp.month, stamp.hour, self.coincident_schedule, self.coincident_rates)
+        return periods, rates[periods]
 
-        elif schedule_type in ['energy', 'en'] and self.energy_rates:
-            sched = self.energy_weekend_schedule if weekend else self.energy_weekday_schedule
-            return get_tou_info(stamp.month, stamp.hour, sched, self.energy_rates) if sched else None
-        
-        elif schedule_type in ['demand', 'de'] and self.demand_rates:
-            sched = self.demand_weekend_schedule if weekend else self.demand_weekday_schedule
-            return get_tou_info(stamp.month, stamp.hour, sched, self.demand_rates) if sched else None
-        
-        return None
+    def time_features(self, index: pd.DatetimeIndex):
+        """Derives the calendar features used for TOU lookups for a whole index at once.
+
+        :param  index:  The index of the intervals to be priced.
+        :type   index:  ``pandas.DatetimeIndex``
+
+        :return:    A tuple of ``numpy.array``s: months (1-12), hours (0-23),
+                    and a boolean mask that is ``True`` on weekends and holidays.
+        :rtype:     ``tuple``
+        """
+        months = index.month.values
+        hours = index.hour.values
+
+        is_weekend = self.day_classifier.mask(index)
+
+        return months, hours, is_weekend
+
+    def hourly_periods(self, year: int, schedule_type: str = SType.ENERGY):
+        """Returns the TOU period for every hour of a calendar year (8760 or 8784 hours),
+        with holidays and the weekmask already applied. Tables are built once per
+        schedule type and year, then cached.
+
+        :param  year:   The calendar year.
+        :type   year:   ``int``
+
+        :param  schedule_type:  One of "energy", "tou_demand", "flat_demand" or "coincident".
+        :type   schedule_type:  ``str``
+
+        :return:    A ``numpy.array`` of type ``numpy.uint8``, or ``None`` if the schedule is not set.
+        :rtype:     ``numpy.array``
+
+        :raises:    ``ValueError`` if **schedule_type** is not a valid option.
+        """
+        key = (schedule_type, year)
+        if key in self._hourly_periods:
+            return self._hourly_periods[key]
+
+        from .helpers.sched import get_tou_periods
+
+        hours_index = pd.date_range(start='{}-01-01'.format(year), end='{}-12-31 23:00'.format(year), freq='h')
+        months, hours, is_weekend = self.time_features(hours_index)
+
+        if schedule_type == self.SType.ENERGY:
+            periods = get_tou_periods(months, hours, is_weekend, self.energy_weekday_schedule, self.energy_weekend_schedule)
+        elif schedule_type == self.SType.TOU_DEMAND:
+            periods = None
+            if (self.demand_weekday_schedule is not None) and (self.demand_weekend_schedule is not None):
+                periods = get_tou_periods(months, hours, is_weekend, self.demand_weekday_schedule, self.demand_weekend_schedule)
+        elif schedule_type == self.SType.COINCIDENT:
+            periods = None
+            if self.coincident_schedule is not None:
+                periods = self.coincident_schedule[months - 1, hours]
+        elif schedule_type == self.SType.FLAT_DEMAND:
+            periods = None
+            if self.flat_demand_months is not None:
+                periods = self.flat_demand_months[months - 1]
+        else:
+            raise ValueError('"{}" is not a valid rate schedule type. schedule_type must be one of {}'.format(schedule_type, self.SType.ALL))
+
+        if periods is not None:
+            periods = np.ascontiguousarray(periods, dtype=np.uint8)
+            periods.setflags(write=False)
+
+        self._hourly_periods[key] = periods
+        return periods
+
+    @property
+    def holidays(self):
+        """The holidays of the schedule's calendar over its years. Evaluated on first access;
+        billing only evaluates the years it prices.
+
+        :rtype: ``pandas.DatetimeIndex``
+        """
+        return self.day_classifier.holidays
+
+    @property
+    def energy_tiered(self):
+        """``True`` if any energy period has usage tiers, so price depends on quantity as well as time.
+        """
+        maxes = self.energy_rates[:, :-1, TierIndex.MAX]
+        return bool(((maxes > 0.) & np.isfinite(maxes)).any())
+
+    def hourly_prices(self, year: int):
+        """Returns the energy price for every hour of a calendar year. Only defined for
+        tariffs without usage tiers, where price depends on the hour alone.
+
+        :param  year:   The calendar year.
+        :type   year:   ``int``
+
+        :return:    A tuple of ``numpy.array``s of type ``float64``: the buy price (rate plus adjustment)
+                    and the sell price (sell minus adjustment) per kWh, one per hour.
+        :rtype:     ``tuple``
+
+        :raises:    ``ValueError`` if the energy rates have usage tiers.
+        """
+        if self.energy_tiered:
+            raise ValueError('Hourly prices are not defined for tiered energy rates.')
+
+        rows = self.energy_rates[self.hourly_periods(year), 0].astype(np.float64)
+
+        buy = rows[:, TierIndex.RATE] + rows[:, TierIndex.ADJ]
+        sell = rows[:, TierIndex.SELL] - rows[:, TierIndex.ADJ]
+        return buy, sell
+
+    def tou_periods(self, index: pd.DatetimeIndex, schedule_type: str = SType.ENERGY):
+        """Looks up the TOU period of every timestamp in **index** with one gather per
+        calendar year into the cached hourly tables.
+
+        :param  index:  The index of the intervals to be priced.
+        :type   index:  ``pandas.DatetimeIndex``
+
+        :param  schedule_type:  One of "energy", "tou_demand", "flat_demand" or "coincident".
+        :type   schedule_type:  ``str``
+
+        :return:    A ``numpy.array`` of period indexes, or ``None`` if the schedule is not set.
+        :rtype:     ``numpy.array``
+        """
+        naive = index.tz_localize(None) if index.tz is not None else index
+        stamps = naive.values.astype('datetime64[h]')
+        years = naive.year.values
+
+        periods = np.empty(index.size, dtype=np.uint8)
+        for year in np.unique(years):
+            table = self.hourly_periods(int(year), schedule_type)
+            if table is None:
+                return None
+            in_year = years == year
+            hour_of_year = (stamps[in_year] - np.datetime64('{}-01-01T00'.format(year), 'h')).astype(np.intp)
+            periods[in_year] = table[hour_of_year]
+
+        return periods
+
+    @staticmethod
+    def peak_positions(index: pd.DatetimeIndex, system_peaks):
+        """Returns the positions of the intervals in **index** that contain the system peaks, in order
+        and once per interval however many peaks fall in it. Peaks before the first interval or after
+        the last are dropped. Naive peaks are read in the index's time zone, and aware peaks against a
+        naive index in their own wall time.
+
+        :param  index:  A sorted interval index.
+        :type   index:  ``pandas.DatetimeIndex``
+
+        :param  system_peaks:   The utility's system peak times.
+        :type   system_peaks:   ``array-like`` of timestamps
+
+        :return:    A ``numpy.array`` of type ``intp``.
+        :rtype:     ``numpy.array``
+        """
+        peaks = pd.DatetimeIndex(system_peaks)
+        if index.tz is not None and peaks.tz is None:
+            peaks = peaks.tz_localize(index.tz)
+        elif index.tz is None and peaks.tz is not None:
+            peaks = peaks.tz_localize(None)
+
+        interval = index[1] - index[0] if index.size > 1 else pd.Timedelta(0)
+        pos = index.searchsorted(peaks, side='right') - 1
+
+        keep = (pos >= 0) & (peaks < index[-1] + interval)
+        return np.unique(pos[keep]).astype(np.intp)
+
+    def billing_demands(self, peaks: np.array, keys: np.array, history_peaks: np.array = None, history_keys: np.array = None):
+        """Applies the demand ratchet and the demand limits to monthly peaks, for one or many meters.
+        A month is billed at the larger of its peak and its ``demand_ratchet_pct`` of the highest peak
+        in the previous ``ratchet_lookback`` months, clipped to ``demand_minimum`` and ``demand_maximum``
+        like ``Peak.clip``. Limits of 0 are treated as unset.
+
+        :param  peaks:  Metered peak demand, meters x months (or one row).
+        :type   peaks:  ``numpy.array``
+
+        :param  keys:   The month of each column as ``year * 12 + month - 1``, ascending.
+        :type   keys:   ``numpy.array``
+
+        :param  history_peaks:  (Optional) Peaks of earlier months, meters x months.
+        :type   history_peaks:  ``numpy.array``
+
+        :param  history_keys:   (Optional) The month keys of **history_peaks**.
+        :type   history_keys:   ``numpy.array``
+
+        :return:    Billing demands with the shape of **peaks** as a 2-D array.
+        :rtype:     ``numpy.array``
+        """
+        from .helpers.demand import ratchet_demand
+
+        peaks = np.atleast_2d(np.asarray(peaks, dtype=np.float64))
+        if history_peaks is None:
+            history_peaks = np.zeros((peaks.shape[0], 0))
+            history_keys = np.zeros(0, dtype=np.int64)
+
+        return ratchet_demand(
+            peaks,
+            np.asarray(keys, dtype=np.int64),
+            self.demand_ratchet_pct,
+            self.ratchet_lookback,
+            float(self.demand_minimum) if self.demand_minimum else -np.inf,
+            float(self.demand_maximum) if self.demand_maximum else np.inf,
+            np.atleast_2d(np.asarray(history_peaks, dtype=np.float64)),
+            np.asarray(history_keys, dtype=np.int64),
+        )
+
+    def ratcheted_demand_costs(self, loads: np.array, index: pd.DatetimeIndex, bounds: np.array, span: int):
+        """Prices every meter's monthly billing demand (see ``billing_demands``) in one pass over the months.
+        Charges are priced at the TOU and flat periods where each month's peak window starts.
+
+        :param  loads:  A 2-D array of meters x intervals of average power.
+        :type   loads:  ``numpy.array``
+
+        :param  index:  The shared interval index.
+        :type   index:  ``pandas.DatetimeIndex``
+
+        :param  bounds: Billing month boundaries.
+        :type   bounds: ``numpy.array``
+
+        :param  span:   The demand window, in intervals.
+        :type   span:   ``int``
+
+        :return:    A tuple of meters x months arrays: TOU demand costs, flat demand costs and billing demands.
+        :rtype:     ``tuple``
+        """
+        from .helpers.batch import batch_demand_cost
+        from .helpers.costs import calculate_period_costs
+
+        n_meters = loads.shape[0]
+        n_months = bounds.size - 1
+
+        tou_periods = None
+        if (self.demand_rates is not None) and (self.demand_weekday_schedule is not None) and (self.demand_weekend_schedule is not None):
+            tou_periods = self.tou_periods(index, self.SType.TOU_DEMAND)
+
+        flat_periods = None
+        if (self.flat_demand_months is not None) and (self.flat_demand_rates is not None):
+            flat_periods = self.tou_periods(index, self.SType.FLAT_DEMAND)
+
+        tou = np.zeros((n_meters, n_months))
+        flat = np.zeros((n_meters, n_months))
+        if tou_periods is None and flat_periods is None:
+            return tou, flat, np.zeros((n_meters, n_months))
+
+        if tou_periods is not None:
+            _, peaks, peak_index = batch_demand_cost(loads, bounds, tou_periods, self.demand_rates, span)
+        else:
+            _, peaks, peak_index = batch_demand_cost(loads, bounds, flat_periods, self.flat_demand_rates, span)
+
+        naive = index.tz_localize(None) if index.tz is not None else index
+        starts = naive[bounds[:-1]]
+        billing = self.billing_demands(peaks, starts.year.values * 12 + starts.month.values - 1)
+
+        if tou_periods is not None:
+            tou = calculate_period_costs(billing.ravel(), tou_periods[peak_index.ravel()], self.demand_rates).reshape(billing.shape)
+        if flat_periods is not None:
+            flat = calculate_period_costs(billing.ravel(), flat_periods[peak_index.ravel()], self.flat_demand_rates).reshape(billing.shape)
+
+        return tou, flat, billing
 
     def _cost(self, s: pd.Series, rtype: str):
 
@@ -271,6 +616,11 @@ class RateSchedule(object):
         demand_series: pd.Series,
         agg: str = 'month',
         distribute_monthly: bool = True,
+        cumulative_tiers: bool = False,
+        parallel: bool = False,
+        threads: int = None,
+        system_peaks=None,
+        ratchet: bool = False,
         ):
         """Calculates the demand charges for a given ``panads.Series``.
 
@@ -285,6 +635,25 @@ class RateSchedule(object):
                                     fixed charges oiver every day of the month.
         :type   distribute_monthly: ``bool``
 
+        :param  cumulative_tiers:   If ``True``, energy tiers apply to cumulative usage within each month and TOU period,
+                                    rather than to each interval's usage on its own.
+        :type   cumulative_tiers:   ``bool``
+
+        :param  parallel:   If ``True``, billing months are priced on separate threads.
+                            Results are identical to serial mode.
+        :type   parallel:   ``bool``
+
+        :param  threads:    (Optional) The number of threads to use. Defaults to numba's setting.
+        :type   threads:    ``int``
+
+        :param  system_peaks:   (Optional) The utility's system peak times. If given, coincident demand is only
+                                read and charged at the intervals containing them, instead of at every interval.
+        :type   system_peaks:   ``array-like`` of timestamps
+
+        :param  ratchet:    If ``True``, demand charges are priced at each month's billing demand, with the
+                            demand ratchet and demand limits applied. See ``billing_demands``.
+        :type   ratchet:    ``bool``
+
         :return:    A dataframe ahowing the different charges for a given month. 
         :rtype:     ``pandas.DatafRame``
 
@@ -293,6 +662,16 @@ class RateSchedule(object):
 
         if (demand_series.empty) or (demand_series.size <= 2):
             return None
+
+        from .helpers.costs import (
+            calculate_period_costs,
+            cumulative_tier_costs,
+            cumulative_tier_costs_parallel,
+            tou_demand_cost,
+            flat_demand_cost,
+        )
+        from .helpers.window import period_bounds, assign_distribute, assign_end, spread_segments
+        from .helpers.threads import num_threads
         
         if not (isinstance(demand_series.index, pd.DatetimeIndex)):
             raise IndexError
@@ -315,126 +694,292 @@ class RateSchedule(object):
 
         interval_hours = interval_delta / pd.Timedelta('1h')
 
-        demand_window_intervals = round( interval_delta / pd.Timedelta('{}min'.format(self.demand_window)))
-
-        # First, check out these demand charges
-        if (self.demand_rates is not None) and (self.demand_weekday_schedule is not None) and (self.demand_weekend_schedule is not None):
+        demand_window_intervals = max(1, round(pd.Timedelta('{}min'.format(self.demand_window)) / interval_delta))
+
+        def month_assign(func):
+            # Spread a monthly charge over the month, or book it on the month's last interval
+            def assign(ser: pd.Series):
+                charge = func(ser)
+                if distribute_monthly:
+                    return np.full(ser.size, charge / ser.size)
+                out = np.zeros(ser.size)
+                out[-1] = charge
+                return out
+            return assign
+
+        with num_threads(threads):
+            qty = df['qty'].values.astype(np.float64)
+            month_bounds = period_bounds(df.index, 'month')
+            assign = assign_distribute if distribute_monthly else assign_end
+
+            ratcheted = None
+            if ratchet:
+                ratcheted = self.ratcheted_demand_costs(qty[np.newaxis, :], df.index, month_bounds, demand_window_intervals)
+
+            # First, check out these demand charges
+            if (self.demand_rates is not None) and (self.demand_weekday_schedule is not None) and (self.demand_weekend_schedule is not None) and ratcheted is not None:
+                df['tou_demand_cost'] = spread_segments(ratcheted[0][0], month_bounds, distribute_monthly)
+            elif (self.demand_rates is not None) and (self.demand_weekday_schedule is not None) and (self.demand_weekend_schedule is not None):
+                df['tou_demand_cost'] = tou_demand_cost(
+                    qty,
+                    month_bounds,
+                    self.tou_periods(df.index, self.SType.TOU_DEMAND),
+                    self.demand_rates,
+                    demand_window_intervals,
+                    interval_hours,
+                    assign,
+                    False,
+                    parallel
+                )
 
-            def get_demand_cost(ser: pd.Series):
-                idx, reported_val, max_val = get_interval_max_demand(ser.values, n_intervals=demand_window_intervals)
-                ts = ser.reset_index()['index'].iloc[idx]
-                cost = 0.0
-                try:
-                # if we're on a holiday or weekend
-                    if ts.date() in self.holidays or ts.dayofweek not in self.weekmask:
-                        cost = calculate_tou_cost(reported_val, ts.month, ts.hour, self.demand_weekend_schedule, self.demand_rates)
-                    # Otherwise, it's a weekday
-                    cost = calculate_tou_cost(reported_val, ts.month, ts.hour, self.demand_weekday_schedule, self.demand_rates)
-                except:
-                    pass
-
-            if distribute_monthly:
-                # Set every interval to have the value evenly distributed
-                df['tou_demand_cost'] = df.groupby(mg)['qty'].transform(lambda x: get_demand_cost(x) / x.size)
+            # Default to zero for the column        
             else:
-                # Assign the value of the charge to the end of the month
-                df['tou_demand_cost'] = df.groupby(mg)['qty'].agg(get_demand_cost)
-
-        # Default to zero for the column        
-        else:
-            df['tou_demand_cost'] = 0
+                df['tou_demand_cost'] = 0
                 
-        # Now do the same for flat demand
-        if (self.flat_demand_months is not None) and (self.flat_demand_rates is not None):
-
-            def get_flat_demand_cost(ser: pd.Series):
-                idx, reported_val, max_val = get_interval_max_demand(ser.values, n_intervals=demand_window_intervals)
-                ts = ser.reset_index()['index'].iloc[idx]
-                # if we're on a holiday or weekend
-                if ts in self.holidays or ts.dayofweek not in self.weekmask:
-                    return calculate_flat_cost(reported_val, ts.month, self.flat_demand_months, self.flat_demand_rates)
-                # Otherwise, it's a weekday
-                return calculate_flat_cost(reported_val, ts.month, self.flat_demand_months, self.flat_demand_rates)
-
-            if distribute_monthly:
-                # Set every interval to have the value evenly distributed
-                df['flat_demand_cost'] = df.groupby(mg)['qty'].transform(lambda x: get_flat_demand_cost(x) / x.size)
+            # Now do the same for flat demand
+            if (self.flat_demand_months is not None) and (self.flat_demand_rates is not None) and ratcheted is not None:
+                df['flat_demand_cost'] = spread_segments(ratcheted[1][0], month_bounds, distribute_monthly)
+            elif (self.flat_demand_months is not None) and (self.flat_demand_rates is not None):
+                df['flat_demand_cost'] = flat_demand_cost(
+                    qty,
+                    month_bounds,
+                    self.tou_periods(df.index, self.SType.FLAT_DEMAND),
+                    self.flat_demand_rates,
+                    demand_window_intervals,
+                    interval_hours,
+                    assign,
+                    False,
+                    parallel
+                )
             else:
-                # Assign the value of the charge to the end of the month
-                df['flat_demand_cost'] = df.groupby(mg)['qty'].agg(get_flat_demand_cost)
-        else:
-            df['flat_demand_cost'] = 0
+                df['flat_demand_cost'] = 0
             
-        # Coincident charges
-        if (self.coincident_rates is not None) and (self.coincident_schedule is not None):
-            c = df.reset_index()
-            df['coincident_cost'] = c.apply(lambda x: calculate_tou_cost(
-                x['qty'],
-                x['index'].month,
-                x['index'].hour,
-                self.coincident_schedule,
-                self.coincident_rates
-                )
-            )
-        else:
-            df['coincident_cost'] = 0 # __THAT WAS EASY__
+            # Coincident charges
+            if (self.coincident_rates is not None) and (self.coincident_schedule is not None):
+                periods = self.tou_periods(df.index, self.SType.COINCIDENT)
+                if system_peaks is None:
+                    df['coincident_cost'] = calculate_period_costs(qty, periods, self.coincident_rates)
+                else:
+                    # Only read demand at the system peaks
+                    pos = self.peak_positions(df.index, system_peaks)
+                    coincident = np.zeros(qty.size)
+                    np.add.at(coincident, pos, calculate_period_costs(qty[pos], periods[pos], self.coincident_rates))
+                    df['coincident_cost'] = coincident
+            else:
+                df['coincident_cost'] = 0 # __THAT WAS EASY__
             
 
-        # Energy!
-        if (self.energy_rates is not None) and (self.energy_weekday_schedule is not None) and (self.energy_weekend_schedule is not None):
-
-            def get_energy_cost(qty: float, ts: pd.Timestamp):
-                # if we're on a holiday or weekend
-                cost = 0.0
-                try:
-                    if ts in self.holidays or ts.dayofweek not in RateSchedule.weekmask:
-                        cost = calculate_tou_cost(qty * interval_hours, ts.month, ts.hour, self.energy_weekend_schedule, self.energy_rates)        
-                    else:
-                        cost = calculate_tou_cost(qty * interval_hours, ts.month, ts.hour, self.energy_weekday_schedule, self.energy_rates)
-                except IndexError as ie:
-                    logger.error('An IndexError was raised: {}'.format(ie))
-                return cost
-            
-            df['energy_cost'] = df.reset_index().apply(
-                (lambda x: get_energy_cost(x['qty'], x['index'])), 
-                axis=1
-                )
-        else:
-            df['energy_cost'] = df['qty'].apply(lambda x: x * interval_hours * self.default_energy_price)
+            # Energy!
+            if (self.energy_rates is not None) and (self.energy_weekday_schedule is not None) and (self.energy_weekend_schedule is not None):
+
+                periods = self.tou_periods(df.index, self.SType.ENERGY)
+
+                if cumulative_tiers:
+                    kernel = cumulative_tier_costs_parallel if parallel else cumulative_tier_costs
+                    df['energy_cost'] = kernel(
+                        df['qty'].values.astype(np.float64) * interval_hours,
+                        periods,
+                        month_bounds,
+                        self.energy_rates
+                    )
+                else:
+                    df['energy_cost'] = calculate_period_costs(
+                        df['qty'].values * interval_hours,
+                        periods,
+                        self.energy_rates
+                    )
+            else:
+                df['energy_cost'] = df['qty'] * interval_hours * self.default_energy_price
 
         # Monthly fixed costs
         
         fixed_total = self.fixed_monthly_charge
 
-        if distribute_monthly:
-            df['fixed_cost'] = df.groupby(mg)['qty'].transform(lambda x: fixed_total / x.size)
-        else:
-            df['fixed_cost'] = df.groupby(mg).agg(lambda x: fixed_total)
+        df['fixed_cost'] = df.groupby(mg)['qty'].transform(month_assign(lambda x: fixed_total))
                     
         # If we need to sum everything up, let's do it
-        df['total'] = df.apply(
-            lambda x: x['energy_cost'] + x['tou_demand_cost'] + x['coincident_cost'] + x['flat_demand_cost'] + x['fixed_cost']
-        )
+        df['total'] = df[['energy_cost', 'tou_demand_cost', 'coincident_cost', 'flat_demand_cost', 'fixed_cost']].sum(axis=1)
 
         # Finally, aggregate according to the needed aggregation scheme
 
-        df = df[['qty', 'energy_cost', 'tou_demand_cost', 'coincident_cost', 'flat_demand_cost', 'fixed_cost']]
+        df = df[['qty', 'energy_cost', 'tou_demand_cost', 'coincident_cost', 'flat_demand_cost', 'fixed_cost', 'total']]
 
-        return df.groupby(grouper).agg(sum)
+        return df.groupby(grouper).agg('sum')
 
+    def get_batch_costs(
+        self,
+        loads: np.array,
+        index: pd.DatetimeIndex,
+        meters: list = None,
+        cumulative_tiers: bool = False,
+        threads: int = None,
+        system_peaks=None,
+        ratchet: bool = False,
+        ):
+        """Calculates monthly charges for many meters that share one index.
+        Calendar features and TOU periods are computed once, and every meter is priced
+        by parallel compiled kernels.
 
-                
+        :param  loads:  A 2-D array of meters x intervals. Values should reflect average power, not energy.
+        :type   loads:  ``numpy.array``
+
+        :param  index:  The shared, sorted interval index.
+        :type   index:  ``pandas.DatetimeIndex``
 
+        :param  meters: (Optional) Labels for the meters (rows of **loads**). Defaults to row numbers.
+        :type   meters: ``list``
 
+        :param  cumulative_tiers:   If ``True``, energy tiers apply to cumulative usage within each month and TOU period.
+        :type   cumulative_tiers:   ``bool``
 
+        :param  threads:    (Optional) The number of threads to spread meters across. Results do not depend on it.
+        :type   threads:    ``int``
 
+        :param  system_peaks:   (Optional) The utility's system peak times. See ``get_costs``.
+        :type   system_peaks:   ``array-like`` of timestamps
 
+        :param  ratchet:    If ``True``, demand charges are priced at each month's billing demand. See ``billing_demands``.
+        :type   ratchet:    ``bool``
 
+        :return:    A dataframe of charges indexed by meter and month.
+        :rtype:     ``pandas.DataFrame``
 
+        :raises:    ``IndexError`` if **index** is not a ``pandas.DatetimeIndex``.
+        :raises:    ``ValueError`` if **loads** does not have one column per interval.
+        """
+        if not (isinstance(index, pd.DatetimeIndex)):
+            raise IndexError
 
+        from .helpers.batch import batch_interval_cost, batch_demand_cost, batch_cumulative_tier_cost
+        from .helpers.costs import calculate_period_costs
+        from .helpers.window import period_bounds
+        from .helpers.threads import num_threads
 
+        loads = np.atleast_2d(np.asarray(loads, dtype=np.float64))
 
+        if loads.shape[1] != index.size:
+            raise ValueError('loads has {} intervals, but the index has {}.'.format(loads.shape[1], index.size))
 
+        n_meters = loads.shape[0]
 
+        interval_delta = index[1] - index[0]
+        interval_hours = interval_delta / pd.Timedelta('1h')
+        demand_window_intervals = max(1, round(pd.Timedelta('{}min'.format(self.demand_window)) / interval_delta))
+
+        bounds = period_bounds(index, 'month')
+        n_months = bounds.size - 1
+
+        with num_threads(threads):
+            charges = {
+                'qty': np.add.reduceat(loads, bounds[:-1], axis=1),
+            }
+
+            ratcheted = None
+            if ratchet:
+                ratcheted = self.ratcheted_demand_costs(loads, index, bounds, demand_window_intervals)
+
+            # Energy
+            if (self.energy_rates is not None) and (self.energy_weekday_schedule is not None) and (self.energy_weekend_schedule is not None):
+                periods = self.tou_periods(index, self.SType.ENERGY)
+                if cumulative_tiers:
+                    charges['energy_cost'] = batch_cumulative_tier_cost(loads, bounds, periods, self.energy_rates, interval_hours)
+                else:
+                    charges['energy_cost'] = batch_interval_cost(loads, bounds, periods, self.energy_rates, interval_hours)
+            else:
+                charges['energy_cost'] = charges['qty'] * interval_hours * self.default_energy_price
+
+            # TOU demand
+            if ratcheted is not None:
+                charges['tou_demand_cost'] = ratcheted[0]
+            elif (self.demand_rates is not None) and (self.demand_weekday_schedule is not None) and (self.demand_weekend_schedule is not None):
+                periods = self.tou_periods(index, self.SType.TOU_DEMAND)
+                charges['tou_demand_cost'] = batch_demand_cost(loads, bounds, periods, self.demand_rates, demand_window_intervals)[0]
+            else:
+                charges['tou_demand_cost'] = np.zeros((n_meters, n_months))
+
+            # Coincident
+            if (self.coincident_rates is not None) and (self.coincident_schedule is not None):
+                periods = self.tou_periods(index, self.SType.COINCIDENT)
+                if system_peaks is None:
+                    charges['coincident_cost'] = batch_interval_cost(loads, bounds, periods, self.coincident_rates)
+                else:
+                    pos = self.peak_positions(index, system_peaks)
+                    costs = calculate_period_costs(
+                        loads[:, pos].ravel(),
+                        np.tile(periods[pos], n_meters),
+                        self.coincident_rates
+                    ).reshape(n_meters, pos.size)
+                    coincident = np.zeros((n_meters, n_months))
+                    np.add.at(coincident, (slice(None), np.searchsorted(bounds, pos, side='right') - 1), costs)
+                    charges['coincident_cost'] = coincident
+            else:
+                charges['coincident_cost'] = np.zeros((n_meters, n_months))
+
+            # Flat demand
+            if ratcheted is not None:
+                charges['flat_demand_cost'] = ratcheted[1]
+            elif (self.flat_demand_months is not None) and (self.flat_demand_rates is not None):
+                periods = self.tou_periods(index, self.SType.FLAT_DEMAND)
+                charges['flat_demand_cost'] = batch_demand_cost(loads, bounds, periods, self.flat_demand_rates, demand_window_intervals)[0]
+            else:
+                charges['flat_demand_cost'] = np.zeros((n_meters, n_months))
+
+        charges['fixed_cost'] = np.full((n_meters, n_months), float(self.fixed_monthly_charge))
+
+        charges['total'] = (
+            charges['energy_cost'] + charges['tou_demand_cost'] + charges['coincident_cost']
+            + charges['flat_demand_cost'] + charges['fixed_cost']
+        )
+
+        month_starts = index[bounds[:-1]]
+        if month_starts.tz is not None:
+            month_starts = month_starts.tz_localize(None)
+
+        month_index = pd.MultiIndex.from_product(
+            [
+                meters if meters is not None else range(n_meters),
+                month_starts.to_period('M')
+            ],
+            names=['meter', 'month']
+        )
+
+        return pd.DataFrame(
+            {k: v.ravel() for k, v in charges.items()},
+            index=month_index
+        )
+
+    def iter_costs(
+        self,
+        chunks,
+        cumulative_tiers: bool = False,
+        interval: pd.Timedelta = None,
+        ratchet: bool = False,
+        ):
+        """Bills an interval series supplied in chunks, yielding each month's charges as the month closes.
+        Memory is bounded by the chunk size, whatever the length of the series.
+
+        :param  chunks: An iterable of ``pandas.Series`` of average power with ``pandas.DatetimeIndex`` indexes,
+                        in order. See ``stream.iter_csv`` and ``stream.iter_parquet``.
+        :type   chunks: ``iterable``
+
+        :param  cumulative_tiers:   If ``True``, energy tiers apply to cumulative usage within each month and TOU period.
+        :type   cumulative_tiers:   ``bool``
+
+        :param  interval:   (Optional) The interval length. Defaults to the spacing of the first two readings.
+        :type   interval:   ``pandas.Timedelta``
+
+        :param  ratchet:    If ``True``, demand charges are priced at each month's billing demand, ratcheted
+                            against the peaks of months already streamed. See ``billing_demands``.
+        :type   ratchet:    ``bool``
+
+        :return:    A generator of ``pandas.Series``, one per month, with the same columns as ``get_costs``
+                    and named by the month's end.
+        :rtype:     ``generator``
+        """
+        from .stream import BillStream
 
+        stream = BillStream(self, cumulative_tiers=cumulative_tiers, interval=interval, ratchet=ratchet)
+        for chunk in chunks:
+            yield from stream.feed(chunk)
+        yield from stream.close()
 
@@ -0,0 +1,382 @@
+import csv
+import datetime
+import json
+import os
+import re
+
+import numpy as np
+
+from .data_objects import TierIndex
+from . import logger
+
+
+STRUCTURES = (
+    'energyratestructure',
+    'demandratestructure',
+    'flatdemandstructure',
+    'coincidentratestructure',
+)
+
+SCHEDULES = (
+    'energyweekdayschedule',
+    'energyweekendschedule',
+    'demandweekdayschedule',
+    'demandweekendschedule',
+    'coincidentrateschedule',
+)
+
+RATCHET_KEYS = ('demandratchetpercentage', 'demandrachetpercentage')
+
+ARRAY_KEYS = set(STRUCTURES) | set(SCHEDULES) | {'flatdemandmonths'} | set(RATCHET_KEYS)
+
+# Scalar CSV columns that hold numbers. Every other scalar column, including labels and names, stays text
+NUMERIC_COLUMNS = {
+    'eia', 'eiaid',
+    'fixedmonthlycharge', 'minmonthlycharge', 'annualmincharge', 'mincharge',
+    'fixedchargefirstmeter', 'fixedchargeeaaddl',
+    'peakkwcapacitymin', 'peakkwcapacitymax', 'peakkwcapacityhistory',
+    'peakkwhusagemin', 'peakkwhusagemax', 'peakkwhusagehistory',
+    'voltageminimum', 'voltagemaximum',
+    'demandratewindow', 'demandreactivepowercharge',
+}
+
+FORMAT_VERSION = 1
+
+_csv_tier = re.compile(r'^(\w+structure)/period(\d+)/tier(\d+)(\w+)$')
+
+
+def _normalize_item(d: dict):
+    """Unwraps the extended-JSON values used in URDB dumps (``$date``, ``$oid``).
+    """
+    out = {}
+    for k, v in d.items():
+        if isinstance(v, dict):
+            if '$date' in v:
+                v = v['$date'] / 1000.
+            elif '$oid' in v:
+                v = v['$oid']
+        out[k] = v
+    if 'label' not in out and '_id' in out:
+        out['label'] = out['_id']
+    return out
+
+
+def _iter_json(f, chunk_size: int = 1 << 20):
+    """Yields the objects of a JSON array, or of concatenated/line-delimited JSON, one at a time
+    without loading the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    while True:
+        # Skip array brackets, separators and whitespace
+        while pos < len(buf) and buf[pos] in '[],\r\n\t ':
+            pos += 1
+
+        if pos < len(buf):
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                pos = end
+                continue
+        elif eof:
+            return
+
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def _csv_number(v: str):
+    for cast in (int, float):
+        try:
+            return cast(v)
+        except ValueError:
+            pass
+    return v
+
+
+def _csv_value(key: str, v: str):
+    """Parses one CSV cell by its column: arrays are JSON, tier cells and known numeric
+    columns are numbers, and everything else is kept as text.
+    """
+    v = v.strip()
+    if not v:
+        return None
+    if key in ARRAY_KEYS:
+        return json.loads(v)
+    if key in NUMERIC_COLUMNS or _csv_tier.match(key):
+        return _csv_number(v)
+    return v
+
+
+def _csv_date(v):
+    if v is None or isinstance(v, (int, float)):
+        return v
+    dt = datetime.datetime.fromisoformat(v)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.timestamp()
+
+
+def _iter_csv(f):
+    """Yields rate ``dict``s from a URDB CSV export, rebuilding the nested rate structures
+    from its ``<structure>/period<i>/tier<j><attr>`` columns.
+    """
+    for row in csv.DictReader(f):
+        d = {}
+        tiers = {}
+        for k, v in row.items():
+            v = _csv_value(k, v or '')
+            if v is None:
+                continue
+            m = _csv_tier.match(k)
+            if m:
+                name, period, tier, attr = m.groups()
+                tiers.setdefault(name, {}).setdefault(int(period), {}).setdefault(int(tier), {})[attr] = v
+            else:
+                d[k] = v
+
+        for name, periods in tiers.items():
+            d[name] = [
+                [periods[p][t] for t in sorted(periods[p])] for p in sorted(periods)
+            ]
+        for key in ('startdate', 'enddate'):
+            d[key] = _csv_date(d.get(key))
+        yield d
+
+
+def iter_dump(path: str):
+    """Yields rate ``dict``s from a URDB dump, streaming the file.
+
+    :param  path:   A ``.csv`` export, or a ``.json`` file holding an array or line-delimited rates.
+    :type   path:   ``str``
+    """
+    with open(path, newline='' if path.endswith('.csv') else None) as f:
+        items = _iter_csv(f) if path.endswith('.csv') else _iter_json(f)
+        for d in items:
+            yield _normalize_item(d)
+
+
+def _tier_rows(struct: list):
+    """Pads a ragged rate structure to one tier count. See ``RateSchedule.build_tiered_structure``.
+
+    :return:    A ``numpy.array`` of type ``float32`` with shape (periods, tiers, 4).
+    """
+    from .rateschedule import RateSchedule
+    return RateSchedule.build_tiered_structure(struct)[0]
+
+
+def import_snapshot(src: str, dest: str):
+    """Converts a full URDB dump into a snapshot directory in one streaming pass.
+
+    The snapshot holds fixed-shape schedule arrays, a flat array of tier rows with
+    per-rate offsets, line-delimited metadata, and a sorted label index, all of
+    which are memory-mapped by `Snapshot`.
+
+    :param  src:    A URDB dump. See ``iter_dump``.
+    :type   src:    ``str``
+
+    :param  dest:   Directory to write the snapshot to. It is created if needed.
+    :type   dest:   ``str``
+
+    :return:    The number of rates imported.
+    :rtype:     ``int``
+    """
+    os.makedirs(dest, exist_ok=True)
+
+    def out(name):
+        return open(os.path.join(dest, name), 'wb')
+
+    files = {
+        name: out(name + '.bin') for name in (
+            'schedules', 'has_schedule', 'flat_months', 'ratchet', 'tiers', 'struct_index', 'meta_offsets'
+        )
+    }
+    meta = out('meta.jsonl')
+
+    labels = []
+    tier_offset = 0
+    meta_offset = 0
+    n = 0
+
+    try:
+        for d in iter_dump(src):
+            label = d.get('label')
+            if not label:
+                logger.warning('Skipping a rate without a label.')
+                continue
+
+            try:
+                schedules = np.zeros((len(SCHEDULES), 12, 24), dtype=np.uint8)
+                has = np.zeros(len(SCHEDULES) + 1, dtype=np.uint8)
+                for i, key in enumerate(SCHEDULES):
+                    if d.get(key):
+                        schedules[i] = d[key]
+                        has[i] = 1
+
+                flat_months = np.zeros(12, dtype=np.uint8)
+                if d.get('flatdemandmonths'):
+                    flat_months[:] = d['flatdemandmonths']
+                    has[-1] = 1
+
+                ratchet = np.zeros(12, dtype=np.float32)
+                for key in RATCHET_KEYS:
+                    if d.get(key):
+                        ratchet[:] = d[key]
+                        break
+
+                structs = [_tier_rows(d[key]) if d.get(key) else None for key in STRUCTURES]
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning('Skipping malformed rate {}: {}'.format(label, e))
+                continue
+
+            # (offset, periods, tiers) into the flat tier rows, per structure
+            struct_index = np.zeros((len(STRUCTURES), 3), dtype=np.int64)
+            for i, rows in enumerate(structs):
+                if rows is not None:
+                    struct_index[i] = (tier_offset, rows.shape[0], rows.shape[1])
+                    files['tiers'].write(rows.tobytes())
+                    tier_offset += rows.shape[0] * rows.shape[1]
+
+            line = (json.dumps({k: v for k, v in d.items() if k not in ARRAY_KEYS}) + '\n').encode('utf-8')
+            meta.write(line)
+
+            files['schedules'].write(schedules.tobytes())
+            files['has_schedule'].write(has.tobytes())
+            files['flat_months'].write(flat_months.tobytes())
+            files['ratchet'].write(ratchet.tobytes())
+            files['struct_index'].write(struct_index.tobytes())
+            files['meta_offsets'].write(np.int64(meta_offset).tobytes())
+
+            meta_offset += len(line)
+            labels.append(label)
+            n += 1
+
+        files['meta_offsets'].write(np.int64(meta_offset).tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+        meta.close()
+
+    # Sorted label index for binary search
+    label_array = np.array([label.encode('utf-8') for label in labels], dtype=bytes)
+    order = np.argsort(label_array, kind='stable')
+    label_array[order].tofile(os.path.join(dest, 'labels.bin'))
+    order.astype(np.int64).tofile(os.path.join(dest, 'label_rows.bin'))
+
+    with open(os.path.join(dest, 'manifest.json'), 'w') as f:
+        json.dump({
+            'version': FORMAT_VERSION,
+            'count': n,
+            'tier_rows': tier_offset,
+            'label_dtype': label_array.dtype.str,
+            'schedules': SCHEDULES,
+            'structures': STRUCTURES,
+        }, f)
+
+    logger.info('Imported {} rates into {}'.format(n, dest))
+    return n
+
+
+class Snapshot(object):
+    """Read-only, memory-mapped access to a snapshot written by ``import_snapshot``.
+
+    Opening a snapshot only reads its manifest; arrays are paged in by the OS as rates
+    are looked up, so startup does not depend on the size of the dump.
+    """
+
+    def __init__(self, path: str):
+
+        self.path = path
+
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get('version') != FORMAT_VERSION:
+            raise ValueError('Unsupported snapshot version: {}'.format(self.manifest.get('version')))
+
+        n = self.manifest['count']
+
+        self.schedules = self._map('schedules', np.uint8, (n, len(SCHEDULES), 12, 24))
+        self.has_schedule = self._map('has_schedule', np.uint8, (n, len(SCHEDULES) + 1))
+        self.flat_months = self._map('flat_months', np.uint8, (n, 12))
+        self.ratchet = self._map('ratchet', np.float32, (n, 12))
+        self.tiers = self._map('tiers', np.float32, (self.manifest['tier_rows'], TierIndex.ARRAY_LENGTH))
+        self.struct_index = self._map('struct_index', np.int64, (n, len(STRUCTURES), 3))
+        self.meta_offsets = self._map('meta_offsets', np.int64, (n + 1,))
+        self.labels = self._map('labels', np.dtype(self.manifest['label_dtype']), (n,))
+        self.label_rows = self._map('label_rows', np.int64, (n,))
+
+    def _map(self, name, dtype, shape):
+        if 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name + '.bin'), dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def __contains__(self, label: str):
+        return self.row(label) is not None
+
+    def row(self, label: str):
+        """Returns the row of **label**, or ``None``.
+        """
+        encoded = label.encode('utf-8')
+        if len(encoded) > self.labels.dtype.itemsize:
+            return None
+        key = np.array(encoded, dtype=self.labels.dtype)
+        i = int(np.searchsorted(self.labels, key))
+        if i < len(self) and self.labels[i] == key:
+            return int(self.label_rows[i])
+        return None
+
+    def meta(self, row: int):
+        """Returns the scalar fields of a rate.
+        """
+        start, end = int(self.meta_offsets[row]), int(self.meta_offsets[row + 1])
+        with open(os.path.join(self.path, 'meta.jsonl'), 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(end - start).decode('utf-8'))
+
+    def rate_info(self, label: str):
+        """Returns a rate ``dict`` in the API's format. Schedules and rate structures are
+        views into the memory-mapped arrays rather than lists.
+
+        :raises:    ``KeyError`` if **label** is not in the snapshot.
+        """
+        row = self.row(label)
+        if row is None:
+            raise KeyError(label)
+
+        d = self.meta(row)
+
+        for i, key in enumerate(SCHEDULES):
+            if self.has_schedule[row, i]:
+                d[key] = self.schedules[row, i]
+        if self.has_schedule[row, -1]:
+            d['flatdemandmonths'] = self.flat_months[row]
+        d['demandratchetpercentage'] = self.ratchet[row]
+
+        for i, key in enumerate(STRUCTURES):
+            offset, periods, tiers = (int(x) for x in self.struct_index[row, i])
+            if periods:
+                d[key] = self.tiers[offset:offset + periods * tiers].reshape(periods, tiers, TierIndex.ARRAY_LENGTH)
+
+        return d
+
+    def rate_schedule(self, label: str, **kwargs):
+        """Builds the `RateSchedule` for **label** on top of the memory-mapped arrays.
+        Keyword arguments are passed to `RateSchedule`.
+
+        :raises:    ``KeyError`` if **label** is not in the snapshot.
+        """
+        from .rateschedule import RateSchedule
+        return RateSchedule(self.rate_info(label), **kwargs)
@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+
+from .helpers.costs import calculate_period_costs, cumulative_tier_costs_from
+from .helpers.demand import peak_window
+from .helpers.window import segment_bounds, month_keys
+from . import logger
+
+
+class BillStream(object):
+    """Bills an interval series one chunk at a time, so memory stays bounded by the chunk size
+    rather than the length of the series.
+
+    Only the state needed across chunk boundaries is kept: the tail of the current month's
+    demand window, the month-to-date sums, the cumulative tier usage and the peaks of closed
+    months. Charges for a month are emitted as soon as a later month starts.
+    """
+
+    columns = ['qty', 'energy_cost', 'tou_demand_cost', 'coincident_cost', 'flat_demand_cost', 'fixed_cost', 'total']
+
+    # Closed month peaks kept for demand ratchets
+    max_peak_history = 12
+
+    def __init__(
+        self,
+        rate_schedule,
+        cumulative_tiers: bool = False,
+        interval: pd.Timedelta = None,
+        ratchet: bool = False,
+        ):
+        """
+        :param  rate_schedule:  The schedule to bill against.
+        :type   rate_schedule:  `RateSchedule`
+
+        :param  cumulative_tiers:   If ``True``, energy tiers apply to cumulative usage within each month and TOU period.
+        :type   cumulative_tiers:   ``bool``
+
+        :param  interval:   (Optional) The interval length. Defaults to the spacing of the first two readings.
+        :type   interval:   ``pandas.Timedelta``
+
+        :param  ratchet:    If ``True``, demand is billed at the ratcheted billing demand. See ``RateSchedule.billing_demands``.
+        :type   ratchet:    ``bool``
+        """
+        self.rate_schedule = rate_schedule
+        self.cumulative_tiers = cumulative_tiers
+        self.interval = pd.Timedelta(interval) if interval is not None else None
+        self.ratchet = ratchet
+
+        self.last_timestamp = None
+        self.month = None
+        # (month key, peak) pairs of closed months
+        self.peak_history = []
+
+    def _configure(self, index: pd.DatetimeIndex):
+        if self.interval is None:
+            if index.size < 2:
+                raise ValueError('The first chunk needs at least two readings to infer the interval.')
+            self.interval = index[1] - index[0]
+
+        self.tz = index.tz
+        self.interval_hours = self.interval / pd.Timedelta('1h')
+        self.span = max(1, round(pd.Timedelta('{}min'.format(self.rate_schedule.demand_window)) / self.interval))
+
+    def _start_month(self, key: int):
+        rs = self.rate_schedule
+
+        self.month = key
+        self.count = 0
+        self.sums = dict.fromkeys(['qty', 'energy_cost', 'coincident_cost'], 0.0)
+
+        # Demand: the last span - 1 readings of the month, and the best window so far
+        self.tail = np.empty(0)
+        self.tail_demand_periods = np.empty(0, dtype=np.uint8)
+        self.tail_flat_periods = np.empty(0, dtype=np.uint8)
+        self.peak = None
+
+        self.usage = None
+        if rs.energy_rates is not None:
+            self.usage = np.zeros(rs.energy_rates.shape[0])
+
+    def _update_peak(self, qty: np.array, demand_periods: np.array, flat_periods: np.array):
+        window = np.concatenate((self.tail, qty))
+        demand_window = np.concatenate((self.tail_demand_periods, demand_periods))
+        flat_window = np.concatenate((self.tail_flat_periods, flat_periods))
+
+        if window.size >= self.span:
+            idx, total = peak_window(window, self.span)
+            demand = total / self.span
+            # The first result stands; later ones must beat it, so ties go to the earliest window
+            if self.peak is None or demand > self.peak[0]:
+                self.peak = (demand, demand_window[idx], flat_window[idx])
+
+        keep = min(self.span - 1, window.size)
+        self.tail = window[window.size - keep:].copy()
+        self.tail_demand_periods = demand_window[window.size - keep:].copy()
+        self.tail_flat_periods = flat_window[window.size - keep:].copy()
+
+    def _feed_month(self, s: pd.Series):
+        rs = self.rate_schedule
+        SType = rs.SType
+
+        qty = s.values.astype(np.float64)
+        index = s.index
+
+        self.count += qty.size
+        self.sums['qty'] += qty.sum()
+
+        # Energy
+        if (rs.energy_rates is not None) and (rs.energy_weekday_schedule is not None) and (rs.energy_weekend_schedule is not None):
+            periods = rs.tou_periods(index, SType.ENERGY)
+            if self.cumulative_tiers:
+                cost = cumulative_tier_costs_from(qty * self.interval_hours, periods, rs.energy_rates, self.usage)
+            else:
+                cost = calculate_period_costs(qty * self.interval_hours, periods, rs.energy_rates)
+            self.sums['energy_cost'] += cost.sum()
+        else:
+            self.sums['energy_cost'] += qty.sum() * self.interval_hours * rs.default_energy_price
+
+        # Coincident
+        if (rs.coincident_rates is not None) and (rs.coincident_schedule is not None):
+            periods = rs.tou_periods(index, SType.COINCIDENT)
+            self.sums['coincident_cost'] += calculate_period_costs(qty, periods, rs.coincident_rates).sum()
+
+        # Demand periods are read where the month's peak window starts
+        demand_periods = rs.tou_periods(index, SType.TOU_DEMAND) if rs.demand_rates is not None else None
+        flat_periods = rs.tou_periods(index, SType.FLAT_DEMAND) if rs.flat_demand_rates is not None else None
+
+        self._update_peak(
+            qty,
+            demand_periods if demand_periods is not None else np.zeros(qty.size, dtype=np.uint8),
+            flat_periods if flat_periods is not None else np.zeros(qty.size, dtype=np.uint8),
+        )
+
+    def _close_month(self):
+        rs = self.rate_schedule
+
+        # A month shorter than the demand window is one window
+        if self.peak is None and self.tail.size:
+            idx, total = peak_window(self.tail, self.tail.size)
+            self.peak = (total / self.tail.size, self.tail_demand_periods[idx], self.tail_flat_periods[idx])
+
+        demand, demand_period, flat_period = self.peak if self.peak is not None else (0.0, 0, 0)
+        self.peak_history = (self.peak_history + [(self.month, demand)])[-self.max_peak_history:]
+
+        if self.ratchet:
+            history = self.peak_history[:-1]
+            demand = rs.billing_demands(
+                [[demand]],
+                [self.month - 1],
+                [[peak for _, peak in history]],
+                [key - 1 for key, _ in history],
+            )[0, 0]
+
+        tou_demand = 0.0
+        if (rs.demand_rates is not None) and (rs.demand_weekday_schedule is not None) and (rs.demand_weekend_schedule is not None):
+            tou_demand = calculate_period_costs(np.array([demand]), np.array([demand_period]), rs.demand_rates)[0]
+
+        flat_demand = 0.0
+        if (rs.flat_demand_months is not None) and (rs.flat_demand_rates is not None):
+            flat_demand = calculate_period_costs(np.array([demand]), np.array([flat_period]), rs.flat_demand_rates)[0]
+
+        charges = pd.Series({
+            'qty': self.sums['qty'],
+            'energy_cost': self.sums['energy_cost'],
+            'tou_demand_cost': tou_demand,
+            'coincident_cost': self.sums['coincident_cost'],
+            'flat_demand_cost': flat_demand,
+            'fixed_cost': float(rs.fixed_monthly_charge),
+        })[self.columns[:-1]]
+        charges['total'] = charges.iloc[1:].sum()
+
+        year, month = divmod(self.month - 1, 12)
+        charges.name = pd.Timestamp(year=year, month=month + 1, day=1, tz=self.tz) + pd.offsets.MonthEnd(0)
+
+        self.month = None
+
+        return charges
+
+    def feed(self, chunk: pd.Series):
+        """Bills the next chunk of readings.
+
+        :param  chunk:  Average power readings with a ``pandas.DatetimeIndex``, after every reading fed so far.
+        :type   chunk:  ``pandas.Series``
+
+        :return:    The charges for every month the chunk closed, one ``pandas.Series`` per month.
+        :rtype:     ``list``
+
+        :raises:    ``IndexError`` if **chunk** does not have a ``pandas.DatetimeIndex``.
+        :raises:    ``ValueError`` if **chunk** starts before the end of the previous chunk.
+        """
+        if not (isinstance(chunk.index, pd.DatetimeIndex)):
+            raise IndexError
+
+        if chunk.empty:
+            return []
+
+        if self.last_timestamp is None:
+            self._configure(chunk.index)
+        elif chunk.index[0] <= self.last_timestamp:
+            raise ValueError('Chunks must be in order. {} is not after {}.'.format(chunk.index[0], self.last_timestamp))
+
+        self.last_timestamp = chunk.index[-1]
+
+        closed = []
+        keys = month_keys(chunk.index)
+        bounds = segment_bounds(keys)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if keys[start] != self.month:
+                if self.month is not None:
+                    closed.append(self._close_month())
+                self._start_month(keys[start])
+            self._feed_month(chunk.iloc[start:end])
+
+        return closed
+
+    def close(self):
+        """Closes the month in progress.
+
+        :return:    The charges for the last month, if any readings are pending.
+        :rtype:     ``list``
+        """
+        if self.month is None:
+            return []
+        logger.debug('Closing partial month {}'.format(self.month))
+        return [self._close_month()]
+
+
+def iter_csv(path: str, column=None, index_col=0, chunksize: int = 1000000, **kwargs):
+    """Reads an interval series from a CSV file in chunks.
+
+    :param  column:     The column of readings. Defaults to the first column after the index.
+    :param  index_col:  The timestamp column.
+    :param  chunksize:  Rows per chunk.
+
+    Other keyword arguments are passed to ``pandas.read_csv``.
+    """
+    reader = pd.read_csv(path, index_col=index_col, parse_dates=True, chunksize=chunksize, **kwargs)
+    for frame in reader:
+        yield frame[column] if column is not None else frame.iloc[:, 0]
+
+
+def iter_parquet(path: str, column: str, index_col: str, batch_size: int = 1000000):
+    """Reads an interval series from a Parquet file in record batches. Requires ``pyarrow``.
+
+    :param  column:     The column of readings.
+    :param  index_col:  The timestamp column.
+    :param  batch_size: Rows per chunk.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Reading Parquet files requires pyarrow.')
+
+    f = pq.ParquetFile(path)
+    for batch in f.iter_batches(batch_size=batch_size, columns=[index_col, column]):
+        frame = batch.to_pandas()
+        yield pd.Series(frame[column].values, index=pd.DatetimeIndex(frame[index_col]))
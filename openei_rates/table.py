@@ -0,0 +1,204 @@
+import calendar
+import datetime
+
+import numpy as np
+
+from .rate import Rate
+
+
+def _intern(values):
+    """Encodes values as ``int32`` codes into a table of distinct values.
+
+    :return:    A tuple of the codes and the distinct values (an object ``numpy.array``).
+    """
+    lookup = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, v in enumerate(values):
+        code = lookup.get(v)
+        if code is None:
+            code = lookup[v] = len(lookup)
+        codes[i] = code
+
+    categories = np.empty(len(lookup), dtype=object)
+    for v, code in lookup.items():
+        categories[code] = v
+    return codes, categories
+
+
+def _epoch(dt: datetime.datetime):
+    # Rate dates are naive UTC
+    return calendar.timegm(dt.timetuple()) + dt.microsecond / 1e6
+
+
+class RateTable(object):
+    """Columnar storage for large collections of rate metadata.
+
+    Strings are interned as ``int32`` codes, dates are ``int64`` epoch seconds, and
+    `Rate` objects are only built when a row is accessed. Filters are vectorized
+    and follow ``OpenEIRates.filter_rates``.
+    """
+
+    # Column name -> key in the API's rate dict
+    string_columns = {
+        'label': 'label',
+        'name': 'name',
+        'utility': 'utility',
+        'sector': 'sector',
+        'eia_id': 'eia',
+        'openei_uri': 'uri',
+        'description': 'description',
+        'source': 'source',
+        'source_parent_uri': 'sourceparent',
+        'wiring': 'phasewiring',
+    }
+
+    no_start = np.iinfo(np.int64).min
+    no_end = np.iinfo(np.int64).max
+
+    def __init__(self, codes: dict, categories: dict, starts: np.array, ends: np.array, approved: np.array):
+
+        self.codes = codes
+        self.categories = categories
+        self.starts = starts
+        self.ends = ends
+        self.approved = approved
+
+    @classmethod
+    def from_items(cls, items):
+        """Builds a table from rate ``dict``s, as returned by the API, in one pass.
+
+        :param  items:  An iterable of rate ``dict``s, e.g. ``OpenEIApi.iter_rates``.
+        """
+        columns = {k: [] for k in cls.string_columns}
+        starts = []
+        ends = []
+
+        for d in items:
+            for col, key in cls.string_columns.items():
+                columns[col].append(d.get(key))
+            starts.append(d.get('startdate') or cls.no_start)
+            ends.append(d.get('enddate') or cls.no_end)
+
+        codes = {}
+        categories = {}
+        for col, values in columns.items():
+            codes[col], categories[col] = _intern(values)
+
+        return cls(
+            codes,
+            categories,
+            np.array(starts, dtype=np.int64),
+            np.array(ends, dtype=np.int64),
+            np.ones(len(starts), dtype=bool)
+        )
+
+    @classmethod
+    def from_rates(cls, rates: list):
+        """Builds a table from existing `Rate`s.
+        """
+        def as_item(rate):
+            d = {key: getattr(rate, col) for col, key in cls.string_columns.items()}
+            d['startdate'] = calendar.timegm(rate.begin_date.timetuple()) if rate.begin_date else None
+            d['enddate'] = calendar.timegm(rate.end_date.timetuple()) if rate.end_date else None
+            return d
+
+        table = cls.from_items(as_item(rate) for rate in rates)
+        table.approved = np.array([rate.approved for rate in rates], dtype=bool)
+        return table
+
+    def __len__(self):
+        return self.starts.shape[0]
+
+    def __repr__(self):
+        return '<RateTable({} rates)>'.format(len(self))
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the arrays, not counting the interned strings.
+        """
+        return sum(c.nbytes + cat.nbytes for c, cat in zip(self.codes.values(), self.categories.values())) \
+            + self.starts.nbytes + self.ends.nbytes + self.approved.nbytes
+
+    def column(self, col: str):
+        """Returns a string column decoded to an object ``numpy.array``.
+        """
+        return self.categories[col][self.codes[col]]
+
+    def item(self, i: int):
+        """Returns row **i** as a rate ``dict``.
+        """
+        d = {key: self.categories[col][self.codes[col][i]] for col, key in self.string_columns.items()}
+        d['startdate'] = int(self.starts[i]) if self.starts[i] != self.no_start else None
+        d['enddate'] = int(self.ends[i]) if self.ends[i] != self.no_end else None
+        return d
+
+    def __getitem__(self, i):
+        """Integer indexes return a new `Rate`. Slices, index arrays and boolean masks return a sub-table.
+        """
+        if isinstance(i, (int, np.integer)):
+            rate = Rate(self.item(i))
+            rate.approved = bool(self.approved[i])
+            return rate
+        return self.take(np.arange(len(self))[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def take(self, indexes: np.array):
+        """Returns a sub-table of the given rows. The interned strings are shared.
+        """
+        return __class__(
+            {col: c[indexes] for col, c in self.codes.items()},
+            self.categories,
+            self.starts[indexes],
+            self.ends[indexes],
+            self.approved[indexes]
+        )
+
+    def _contains(self, col: str, s: str):
+        # Test each distinct string once, then broadcast by code
+        matches = np.array([v is not None and s in v for v in self.categories[col]], dtype=bool)
+        return matches[self.codes[col]] if matches.size else np.zeros(len(self), dtype=bool)
+
+    def _isin(self, col: str, values: list):
+        matches = np.isin(self.categories[col], list(values))
+        return matches[self.codes[col]] if matches.size else np.zeros(len(self), dtype=bool)
+
+    def active_mask(self, dt: datetime.datetime):
+        """Returns a boolean mask of the rates in effect at **dt**.
+        """
+        t = _epoch(dt)
+        return (self.starts != self.no_start) & (self.starts <= t) & (t < self.ends)
+
+    def mask(
+            self,
+            utility: str = '',
+            name: str = '',
+            active: bool = True,
+            only_approved: bool = False,
+            sectors: list = None,
+            active_date: datetime.datetime = None,
+        ):
+        """Returns a boolean mask of the rates matching every given criterion.
+        Criteria left blank are ignored.
+        """
+        m = np.ones(len(self), dtype=bool)
+
+        if utility:
+            m &= self._contains('utility', utility)
+        if name:
+            m &= self._contains('name', name)
+        if only_approved:
+            m &= self.approved
+        if sectors:
+            m &= self._isin('sector', sectors)
+        if active and active_date:
+            m &= self.active_mask(active_date)
+
+        return m
+
+    def filter(self, **kwargs):
+        """Returns a sub-table of the rates matching every given criterion. See ``mask``.
+        """
+        return self.take(np.flatnonzero(self.mask(**kwargs)))
@@ -1,3 +1,24 @@
 # -*- coding: utf-8 -*-
 
 """Unit test package for openei_rates."""
+
+import json
+import os
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+def demand_schedules():
+    """The `tou_demand.json` schedule without and with its coincident demand charges."""
+    from openei_rates.rateschedule import RateSchedule
+
+    info = load_fixture('tou_demand.json')
+    coincident = RateSchedule(dict(info))
+    for key in ('coincidentratestructure', 'coincidentrateschedule'):
+        info.pop(key)
+    return RateSchedule(info), coincident
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `openei_rates.accumulator`."""
+
+import json
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from openei_rates.accumulator import BillAccumulator
+from openei_rates.rateschedule import RateSchedule
+
+from . import demand_schedules, load_fixture
+
+
+class TestBillAccumulator(unittest.TestCase):
+    """Pushing readings one at a time should match billing them all at once."""
+
+    def setUp(self):
+        self.rs, self.coincident = demand_schedules()
+        self.tiered = RateSchedule(load_fixture('tou_energy.json'))
+
+        i = pd.date_range(start='2019-06-20', end='2019-08-02 11:55', freq='5min')
+        rng = np.random.RandomState(9)
+        self.s = pd.Series(rng.uniform(-2., 20., i.size), index=i)
+
+    def push_all(self, acc, s):
+        closed = []
+        for ts, kw in s.items():
+            month = acc.push(ts, kw)
+            if month is not None:
+                closed.append(month)
+        return closed
+
+    def test_closed_months_match_get_costs(self):
+        for rs in (self.rs, self.tiered):
+            for cumulative in (False, True):
+                acc = BillAccumulator(rs, cumulative_tiers=cumulative)
+                months = self.push_all(acc, self.s) + [acc.snapshot(final=True)]
+
+                full = rs.get_costs(self.s, cumulative_tiers=cumulative)
+                assert [m.name for m in months] == list(full.index)
+                np.testing.assert_allclose(pd.DataFrame(months).values, full.values, rtol=1e-9)
+
+    def test_month_to_date(self):
+        """Snapshots match the month so far, with the fixed charge prorated."""
+        acc = BillAccumulator(self.rs)
+        part = self.s['2019-07-01':'2019-07-16 05:55']
+        self.push_all(acc, self.s[:'2019-07-16 05:55'])
+
+        snapshot = acc.snapshot()
+        full = self.rs.get_costs(part).iloc[0]
+
+        for column in ('qty', 'energy_cost', 'tou_demand_cost', 'flat_demand_cost'):
+            np.testing.assert_allclose(snapshot[column], full[column], rtol=1e-9)
+        np.testing.assert_allclose(snapshot['fixed_cost'], 150.0 * 15.25 / 31)
+
+        demand, start = acc.peak_demand
+        assert part.rolling(3).mean().idxmax() - pd.Timedelta('10min') == start
+
+    def test_coincident_matches_batch(self):
+        acc = BillAccumulator(self.coincident)
+        months = self.push_all(acc, self.s) + [acc.snapshot(final=True)]
+
+        batch = self.coincident.get_batch_costs(self.s.values, self.s.index)
+        np.testing.assert_allclose(
+            [m['coincident_cost'] for m in months],
+            batch['coincident_cost'].values,
+            rtol=1e-9
+        )
+
+    def test_checkpoint_restore(self):
+        acc = BillAccumulator(self.tiered, cumulative_tiers=True)
+        self.push_all(acc, self.s[:'2019-07-20 00:00'])
+
+        state = json.loads(json.dumps(acc.checkpoint()))
+        restored = BillAccumulator.restore(self.tiered, state)
+
+        rest = self.s['2019-07-20 00:05':]
+        self.push_all(acc, rest)
+        self.push_all(restored, rest)
+
+        pd.testing.assert_series_equal(restored.snapshot(), acc.snapshot())
+
+    def test_out_of_order(self):
+        acc = BillAccumulator(self.rs)
+        acc.push('2019-07-01 00:05', 1.)
+
+        with self.assertRaises(ValueError):
+            acc.push('2019-07-01 00:05', 1.)
+
+    def test_dst_fall_back(self):
+        """Aware readings through a repeated wall hour are in order and billed by wall time."""
+        i = pd.date_range(start='2019-10-28', end='2019-11-06', freq='5min', tz='America/Los_Angeles')
+        rng = np.random.RandomState(3)
+        s = pd.Series(rng.uniform(0., 20., i.size), index=i)
+
+        acc = BillAccumulator(self.rs)
+        months = self.push_all(acc, s) + [acc.snapshot(final=True)]
+
+        full = self.rs.get_costs(s)
+        np.testing.assert_allclose(pd.DataFrame(months).values, full.values, rtol=1e-9)
+
+        with self.assertRaises(ValueError):
+            acc.push(s.index[-2], 1.)
@@ -0,0 +1,396 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `openei_rates.api` and the response cache."""
+
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from openei_rates import openei_rates
+from openei_rates.aio import AsyncOpenEIApi, AsyncOpenEIRates
+from openei_rates.api import OpenEIApi, TokenBucket
+from openei_rates.cache import ResponseCache, ScheduleCache, schedule_cache
+from openei_rates.rate import Rate
+from openei_rates.rateschedule import RateSchedule
+
+from . import FIXTURES, load_fixture
+
+RESPONSES = os.path.join(FIXTURES, 'responses')
+
+
+class StandInServer(object):
+    """A local HTTP server that replays scripted ``(status, headers, body)`` responses."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+        self.connections = set()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests.append(self.path)
+                server.connections.add(self.client_address)
+                status, headers, body = server.responses.pop(0) if server.responses else (200, {}, {'items': []})
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = 'http://127.0.0.1:{}/utility_rates'.format(self.httpd.server_port)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestResponseCache(unittest.TestCase):
+    """Tests for `ResponseCache`."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_key_ignores_api_key(self):
+        """The API key and parameter order should not change the key."""
+        a = ResponseCache.key({'api_key': 'one', 'getpage': 'x', 'limit': 1})
+        b = ResponseCache.key({'limit': '1', 'getpage': 'x', 'api_key': 'two'})
+
+        assert a == b
+        assert a != ResponseCache.key({'getpage': 'y', 'limit': 1})
+
+    def test_round_trip(self):
+        cache = ResponseCache(self.path)
+        cache.set({'getpage': 'x'}, [{'label': 'x'}])
+
+        assert cache.get({'getpage': 'x'}) == [{'label': 'x'}]
+        assert cache.get({'getpage': 'y'}) is None
+        assert not [f for f in os.listdir(self.path) if f.endswith('.tmp')]
+
+    def test_ttl(self):
+        """Stale entries are misses, unless the cache is offline."""
+        cache = ResponseCache(self.path, ttl=0.01)
+        cache.set({'getpage': 'x'}, [{'label': 'x'}])
+        time.sleep(0.05)
+
+        assert cache.get({'getpage': 'x'}) is None
+        assert ResponseCache(self.path, ttl=0.01, offline=True).get({'getpage': 'x'}) is not None
+
+    def test_lru_eviction(self):
+        """The least recently used entries go first when the cache is full."""
+        cache = ResponseCache(self.path)
+        for label in 'abc':
+            cache.set({'getpage': label}, [{'label': label * 100}])
+        # Entry sizes vary by a few bytes with the fetch timestamp
+        size = max(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path))
+
+        # Use "a" so that "b" is now the oldest
+        for age, label in zip((90, 60, 30), 'abc'):
+            past = time.time() - age
+            os.utime(cache._file(cache.key({'getpage': label})), (past, past))
+        cache.get({'getpage': 'a'})
+
+        cache.max_size = 3 * size + size // 2
+        cache.set({'getpage': 'd'}, [{'label': 'd' * 100}])
+
+        assert cache.get({'getpage': 'b'}) is None
+        for label in 'acd':
+            assert cache.get({'getpage': label}) is not None
+
+
+class TestScheduleCache(unittest.TestCase):
+    """Tests for `ScheduleCache`."""
+
+    def setUp(self):
+        self.info = load_fixture('tou_demand.json')
+
+    def test_hits_and_misses(self):
+        cache = ScheduleCache()
+        rs = cache.get_or_create(self.info)
+
+        assert cache.get_or_create(dict(self.info)) is rs
+        # A new revision is a new entry
+        assert cache.get_or_create(dict(self.info, startdate=self.info['startdate'] + 1)) is not rs
+        assert cache.info() == {'hits': 1, 'misses': 2, 'size': 2, 'maxsize': 256}
+
+    def test_lru_eviction(self):
+        cache = ScheduleCache(maxsize=2)
+        for start in (1, 2, 3):
+            cache.get_or_create(dict(self.info, startdate=start))
+        cache.get(self.info['label'], 2)
+        cache.get_or_create(dict(self.info, startdate=4))
+
+        assert cache.get(self.info['label'], 3) is None
+        assert cache.get(self.info['label'], 2) is not None
+
+    def test_read_only(self):
+        """Cached schedules cannot be changed in place."""
+        rs = ScheduleCache().get_or_create(self.info)
+
+        for a in (rs.energy_rates, rs.demand_weekday_schedule, rs.demand_ratchet_pct):
+            with self.assertRaises(ValueError):
+                a[0] = 0
+
+        assert RateSchedule(self.info).demand_ratchet_pct.flags.writeable
+
+    def test_rate_reuses_schedule(self):
+        """A second `Rate` for the same revision does not query the API."""
+        info = self.info
+
+        class Api(object):
+            queries = 0
+
+            def rate_query(self, params):
+                self.queries += 1
+                return 200, [info]
+
+        schedule_cache.clear()
+        api = Api()
+        meta = {'label': info['label'], 'startdate': info['startdate']}
+
+        rs = Rate(meta).get_rate_schedule(api)
+        assert Rate(meta).get_rate_schedule(api) is rs
+        assert api.queries == 1
+        assert Rate(meta).get_rate_schedule(api, use_cache=False) is not rs
+        assert schedule_cache.info()['hits'] == 1
+        schedule_cache.clear()
+
+    def test_rate_without_startdate_reuses_schedule(self):
+        """A `Rate` without a begin date finds the schedule it stored."""
+        info = self.info
+
+        class Api(object):
+            queries = 0
+
+            def rate_query(self, params):
+                self.queries += 1
+                return 200, [info]
+
+        schedule_cache.clear()
+        api = Api()
+
+        rs = Rate({'label': info['label']}).get_rate_schedule(api)
+        assert Rate({'label': info['label']}).get_rate_schedule(api) is rs
+        assert api.queries == 1
+        assert schedule_cache.info()['hits'] == 1
+        assert schedule_cache.info()['misses'] == 1
+        schedule_cache.clear()
+
+
+class TestOfflineApi(unittest.TestCase):
+    """Tests that use a fixture directory in place of the live API."""
+
+    def setUp(self):
+        self.cache = ResponseCache(RESPONSES, offline=True)
+        self.eir = openei_rates.OpenEIRates('not-a-key', cache=self.cache)
+
+    def test_get_rate_by_label(self):
+        rate = self.eir.get_rate_by_label('test-tou-energy')
+
+        assert rate.label == 'test-tou-energy'
+        assert rate.sector == 'Residential'
+
+    def test_get_rate_schedule(self):
+        rate = self.eir.get_rate_by_label('test-tou-demand')
+        rs = rate.get_rate_schedule(self.eir.api)
+
+        assert rs.label == 'test-tou-demand'
+        assert rs.demand_rates is not None
+
+    def test_offline_miss(self):
+        """A miss never reaches the network when offline."""
+        api = OpenEIApi('not-a-key', cache=self.cache)
+
+        assert api.rate_query({'getpage': 'thisisnotareal_label'}) == (503, None)
+
+
+class TestSession(unittest.TestCase):
+    """Tests for retries and connection pooling against a local stand-in server."""
+
+    def api(self, server, **kwargs):
+        kwargs.setdefault('backoff', 0.01)
+        kwargs.setdefault('rate_limit', None)
+        api = OpenEIApi('not-a-key', **kwargs)
+        api.rate_endpoint = server.url
+        self.addCleanup(server.close)
+        self.addCleanup(api.close)
+        return api
+
+    def test_retries_transient_errors(self):
+        """5xx and 429 responses are retried until the request succeeds."""
+        server = StandInServer([
+            (503, {}, {}),
+            (429, {'Retry-After': '0'}, {}),
+            (200, {}, {'items': [{'label': 'x'}]}),
+        ])
+        api = self.api(server)
+
+        assert api.rate_query({'getpage': 'x'}) == (200, [{'label': 'x'}])
+        assert len(server.requests) == 3
+
+    def test_gives_up(self):
+        server = StandInServer([(502, {}, {})] * 3)
+        api = self.api(server, max_retries=2)
+
+        assert api.rate_query({'getpage': 'x'}) == (502, None)
+        assert len(server.requests) == 3
+
+    def test_retry_after(self):
+        """The server's Retry-After delay is honored."""
+        server = StandInServer([
+            (429, {'Retry-After': '0.3'}, {}),
+            (200, {}, {'items': [{'label': 'x'}]}),
+        ])
+        api = self.api(server)
+
+        start = time.monotonic()
+        api.rate_query({'getpage': 'x'})
+
+        assert time.monotonic() - start >= 0.3
+
+    def test_connection_reuse(self):
+        """Queries share one keep-alive connection."""
+        server = StandInServer([(200, {}, {'items': [{'label': 'x'}]})] * 5)
+        api = self.api(server)
+
+        for i in range(5):
+            api.rate_query({'getpage': 'x'})
+
+        assert len(server.connections) == 1
+
+    def pages(self):
+        return StandInServer([
+            (200, {}, {'items': [{'label': 'a'}, {'label': 'b'}]}),
+            (200, {}, {'items': [{'label': 'c'}, {'label': 'd'}]}),
+            (200, {}, {'items': [{'label': 'e'}]}),
+        ])
+
+    def offsets(self, server):
+        return [parse_qs(urlparse(r).query)['offset'][0] for r in server.requests]
+
+    def test_iter_rates(self):
+        """Pages are walked until a short page comes back."""
+        server = self.pages()
+        api = self.api(server)
+
+        labels = [item['label'] for item in api.iter_rates({'ratesforutility': 'x'}, page_size=2)]
+
+        assert labels == list('abcde')
+        assert self.offsets(server) == ['0', '2', '4']
+
+    def test_iter_rates_prefetch(self):
+        server = self.pages()
+        api = self.api(server)
+
+        rates = api.iter_rates({'ratesforutility': 'x'}, page_size=2, prefetch=True)
+        assert next(rates)['label'] == 'a'
+
+        # The second page is already on its way
+        time.sleep(0.2)
+        assert len(server.requests) == 2
+
+        assert [item['label'] for item in rates] == list('bcde')
+        assert self.offsets(server) == ['0', '2', '4']
+
+    def test_iter_rates_failure(self):
+        server = StandInServer([(200, {}, {'items': [{'label': 'a'}]}), (500, {}, {})])
+        api = self.api(server, max_retries=0)
+
+        with self.assertRaises(ConnectionError):
+            list(api.iter_rates({}, page_size=1))
+
+    def test_token_bucket(self):
+        """Requests past the burst wait for the bucket to refill."""
+        bucket = TokenBucket(rate=20., capacity=2)
+
+        assert bucket.reserve() == 0.
+        assert bucket.reserve() == 0.
+        self.assertAlmostEqual(bucket.reserve(), 0.05, places=2)
+
+
+class TestAsync(unittest.TestCase):
+    """Tests for the asyncio client."""
+
+    def test_rate_query(self):
+        server = StandInServer([(200, {}, {'items': [{'label': 'x'}]})])
+        self.addCleanup(server.close)
+
+        async def query():
+            async with AsyncOpenEIApi('not-a-key', backoff=0.01, rate_limit=None) as api:
+                api.api.rate_endpoint = server.url
+                return await api.rate_query({'getpage': 'x'})
+
+        assert asyncio.run(query()) == (200, [{'label': 'x'}])
+
+    def test_shared_api_left_open(self):
+        """Closing the async client closes only a client it created."""
+        server = StandInServer([(200, {}, {'items': [{'label': 'x'}]})] * 2)
+        self.addCleanup(server.close)
+
+        shared = OpenEIApi('not-a-key', backoff=0.01, rate_limit=None)
+        shared.rate_endpoint = server.url
+        self.addCleanup(shared.close)
+        closed = []
+        shared.close = lambda: closed.append(True)
+
+        async def query():
+            async with AsyncOpenEIApi(api=shared) as api:
+                await api.rate_query({'getpage': 'x'})
+            async with AsyncOpenEIRates(api=AsyncOpenEIApi(api=shared)) as eir:
+                await eir.api.rate_query({'getpage': 'x'})
+
+        asyncio.run(query())
+        assert not closed
+
+    def test_get_rate_schedules_in_order(self):
+        """Schedules come back in input order, with None for misses."""
+        cache = ResponseCache(RESPONSES, offline=True)
+        labels = ['test-tou-demand', 'thisisnotareal_label', 'test-tou-energy']
+
+        async def fetch():
+            async with AsyncOpenEIRates('not-a-key', concurrency=3, cache=cache) as eir:
+                return await eir.get_rate_schedules(labels)
+
+        schedules = asyncio.run(fetch())
+
+        assert [s.label if s else None for s in schedules] == ['test-tou-demand', None, 'test-tou-energy']
+
+    def test_get_rate_schedule_cached(self):
+        """The async client shares the process-wide schedule cache."""
+        cache = ResponseCache(RESPONSES, offline=True)
+        schedule_cache.clear()
+        self.addCleanup(schedule_cache.clear)
+
+        async def fetch():
+            async with AsyncOpenEIRates('not-a-key', cache=cache) as eir:
+                return await eir.get_rate_schedule('test-tou-demand'), await eir.get_rate_schedule('test-tou-demand')
+
+        first, second = asyncio.run(fetch())
+
+        assert first is second
+        assert schedule_cache.info()['hits'] == 1
+
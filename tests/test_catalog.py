@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `openei_rates.catalog` and `openei_rates.table`."""
+
+import datetime
+import random
+import unittest
+
+from openei_rates import openei_rates
+from openei_rates.catalog import RateCatalog
+from openei_rates.rate import Rate
+from openei_rates.table import RateTable
+
+UTILITIES = ['Pacific Gas & Electric Co', 'Sacramento Municipal Util Dist', 'Southern California Edison Co']
+SECTORS = ['Residential', 'Commercial', 'Industrial', 'Lighting']
+NAMES = ['Residential TOU', 'E-19 Medium General Demand', 'Time of Day (Option A)', 'Street Lighting', 'EV2-A']
+
+
+def make_rates(n, seed=0):
+    rng = random.Random(seed)
+    rates = []
+    for i in range(n):
+        start = 1262304000 + rng.randint(0, 10 * 365) * 86400
+        d = {
+            'label': 'rate{}'.format(i),
+            'utility': rng.choice(UTILITIES),
+            'sector': rng.choice(SECTORS),
+            'name': '{} {}'.format(rng.choice(NAMES), i % 7),
+            'eia': rng.choice([14328, 16534, 17609]),
+            'startdate': start if rng.random() > 0.05 else None,
+            'enddate': start + rng.randint(30, 2000) * 86400 if rng.random() > 0.5 else None,
+        }
+        rates.append(Rate(d))
+    return rates
+
+
+def brute_filter(rates, utility='', name='', active=True, sectors=None, active_date=None, eia_id=None):
+    out = []
+    for rate in rates:
+        ok = []
+        if utility:
+            ok.append(utility in rate.utility)
+        if name:
+            ok.append(name in rate.name)
+        if sectors:
+            ok.append(rate.sector in sectors)
+        if eia_id is not None:
+            ok.append(rate.eia_id == eia_id)
+        if active and active_date:
+            ok.append(rate.is_active(active_date))
+        if all(ok):
+            out.append(rate)
+    return out
+
+
+class TestRateCatalog(unittest.TestCase):
+    """Tests for `RateCatalog`."""
+
+    def setUp(self):
+        self.rates = make_rates(2000)
+        self.catalog = RateCatalog(self.rates)
+
+    def test_filters_match_linear_scan(self):
+        dates = [datetime.datetime(2009, 1, 1), datetime.datetime(2014, 6, 1), datetime.datetime(2030, 1, 1)]
+        cases = [
+            {},
+            {'utility': 'Edison'},
+            {'name': 'TOU'},
+            {'name': 'Day (Opt'},
+            {'name': 'EV'},
+            {'sectors': ['Commercial', 'Industrial']},
+            {'eia_id': 14328},
+            {'utility': 'Pacific', 'sectors': ['Residential'], 'name': 'TOU 3'},
+        ]
+        for case in cases:
+            for dt in dates:
+                kwargs = dict(case, active_date=dt)
+                assert self.catalog.filter(**kwargs) == brute_filter(self.rates, **kwargs), kwargs
+
+    def test_lookups(self):
+        assert self.catalog.get('rate17') is self.rates[17]
+        assert self.catalog.get('nope') is None
+        assert self.catalog.by_sector('Lighting') == [r for r in self.rates if r.sector == 'Lighting']
+        assert self.catalog.by_eia(16534) == [r for r in self.rates if r.eia_id == 16534]
+
+    def test_lazy_indexes(self):
+        """Wrapping rates builds no index; small catalogs are scanned and large ones index names only when searched."""
+        dt = datetime.datetime(2014, 6, 1)
+        small = RateCatalog(self.rates[:100])
+        assert small.filter(utility='Edison', active_date=dt) == brute_filter(self.rates[:100], utility='Edison', active_date=dt)
+        assert small._by_label is None and small._by_gram is None
+
+        self.catalog.filter(utility='Edison', active_date=dt)
+        assert self.catalog._by_gram is None
+        assert self.catalog.filter(name='TOU', active_date=dt) == brute_filter(self.rates, name='TOU', active_date=dt)
+        assert self.catalog._by_gram is not None
+
+    def test_add_after_query(self):
+        """The date index picks up rates added after it was built."""
+        dt = datetime.datetime(2015, 1, 1)
+        before = len(self.catalog.active(dt))
+        self.catalog.append(Rate({'label': 'new', 'name': 'New', 'utility': 'X', 'startdate': 1262304000}))
+
+        assert len(self.catalog.active(dt)) == before + 1
+
+
+class TestOpenEIRatesFilter(unittest.TestCase):
+    """Tests for `OpenEIRates` on top of the catalog."""
+
+    def test_filter_rates(self):
+        eir = openei_rates.OpenEIRates('not-a-key')
+        rates = make_rates(300)
+        dt = datetime.datetime(2014, 6, 1)
+
+        found = eir.filter_rates(rates, sector='commercial, industrial', active_date=dt)
+
+        assert found == brute_filter(rates, sectors=['Commercial', 'Industrial'], active_date=dt)
+        assert len(eir.rates) == 0
+
+    def test_get_rate_by_label_cached(self):
+        """A cached lookup returns the rate, not the class."""
+        eir = openei_rates.OpenEIRates('not-a-key')
+        eir.rates = make_rates(10)
+
+        assert eir.get_rate_by_label('rate4', use_cached=True) is eir.rates[4]
+
+    def test_get_rate_by_label_duplicates(self):
+        """With duplicate labels, a cached lookup returns the first match."""
+        eir = openei_rates.OpenEIRates('not-a-key')
+        eir.rates = make_rates(10) + [Rate({'label': 'rate4', 'name': 'Duplicate'})]
+
+        assert eir.get_rate_by_label('rate4', use_cached=True) is eir.rates[4]
+
+
+class TestRateTable(unittest.TestCase):
+    """Tests for `RateTable`."""
+
+    def setUp(self):
+        self.rates = make_rates(2000)
+        self.table = RateTable.from_rates(self.rates)
+
+    def test_round_trip(self):
+        """Rows come back as equivalent Rates."""
+        for i in (0, 17, 1999):
+            rate = self.table[i]
+            for attr in Rate.__slots__:
+                if attr != 'rate_schedule':
+                    assert getattr(rate, attr) == getattr(self.rates[i], attr), attr
+
+    def test_filters_match_linear_scan(self):
+        dt = datetime.datetime(2014, 6, 1)
+        cases = [
+            {},
+            {'utility': 'Edison'},
+            {'name': 'Day (Opt'},
+            {'sectors': ['Commercial', 'Industrial']},
+            {'utility': 'Pacific', 'sectors': ['Residential'], 'name': 'TOU 3'},
+        ]
+        for case in cases:
+            kwargs = dict(case, active_date=dt)
+            found = [rate.label for rate in self.table.filter(**kwargs)]
+            assert found == [rate.label for rate in brute_filter(self.rates, **kwargs)], kwargs
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.rates[0].not_an_attribute = 1
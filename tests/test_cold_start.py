@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Cold-start benchmark for `openei_rates`."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds from importing the package to the first bill, in a fresh interpreter with
+# numba's on-disk cache populated (interpreter, numpy and pandas startup excluded)
+COLD_START_BUDGET = float(os.environ.get('OPENEI_RATES_COLD_START_BUDGET', 0.5))
+
+PROBE = '''
+import json, time
+import numpy as np
+import pandas as pd
+
+with open('tests/fixtures/tou_demand.json') as f:
+    info = json.load(f)
+index = pd.date_range(start='2019-01-01', end='2019-12-31 23:45', freq='15min')
+s = pd.Series(np.random.RandomState(0).uniform(0., 20., index.size), index=index)
+
+t = time.perf_counter()
+import openei_rates
+openei_rates.warmup()
+from openei_rates.rateschedule import RateSchedule
+RateSchedule(info).get_costs(s)
+print(json.dumps({'elapsed': time.perf_counter() - t}))
+'''
+
+
+def probe():
+    out = subprocess.check_output([sys.executable, '-c', PROBE], cwd=ROOT)
+    return json.loads(out.decode().strip().splitlines()[-1])['elapsed']
+
+
+class TestColdStart(unittest.TestCase):
+    """A worker that warms up and prices one annual 15-minute bill starts within budget."""
+
+    def test_first_bill(self):
+        # The first run may compile and fill the cache
+        probe()
+
+        # Best of five, so a busy machine does not fail the check
+        elapsed = min(probe() for _ in range(5))
+        assert elapsed < COLD_START_BUDGET, elapsed
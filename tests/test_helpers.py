@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for the compiled kernels in `openei_rates.helpers`."""
+
+import unittest
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import USFederalHolidayCalendar, AbstractHolidayCalendar, Holiday
+
+from openei_rates.data_objects import Period, TierIndex
+from openei_rates.helpers.costs import (
+    cumulative_tier_costs,
+    calculate_period_costs,
+    energy_cost,
+    tou_demand_cost,
+    flat_demand_cost,
+)
+from openei_rates.helpers.window import period_bounds, billing_cycle_keys, assign_end
+from openei_rates.helpers.daytype import day_classifier, get_holidays
+from openei_rates.helpers.demand import (
+    peak_period,
+    peak_period_normalized,
+    basic_period,
+    basic_period_normalized,
+)
+
+
+def brute_peak(a, span):
+    sums = [a[i:i + span].sum() for i in range(a.size - span + 1)]
+    return int(np.argmax(sums)), max(sums)
+
+
+class TestDemand(unittest.TestCase):
+    """Tests for the demand window searches."""
+
+    def setUp(self):
+        rng = np.random.RandomState(7)
+        self.a = rng.uniform(0., 10., 2000)
+
+    def period(self, span):
+        return Period(interval_hours=1. / 60., span=span, month=1, hour=0, weekend=False)
+
+    def test_peak_period_matches_brute_force(self):
+        """The running-sum search should find the same window as slicing."""
+        for span in (1, 15, 30, 2000):
+            idx, peak = brute_peak(self.a, span)
+            result = peak_period(self.a, self.period(span), False)
+
+            assert result.peak_index == idx
+            assert result.span == span
+            assert not result.normalized
+            np.testing.assert_allclose(result.qty, peak)
+
+    def test_peak_period_checks_final_window(self):
+        """The last possible window offset should be searched."""
+        a = np.zeros(100)
+        a[-15:] = 5.
+
+        result = peak_period(a, self.period(15), False)
+
+        assert result.peak_index == 85
+        np.testing.assert_allclose(result.qty, 75.)
+
+    def test_peak_period_normalized(self):
+        """The normalized search reports the window mean."""
+        idx, peak = brute_peak(self.a, 15)
+        result = peak_period_normalized(self.a, self.period(15), True)
+
+        assert result.peak_index == idx
+        assert result.normalized
+        assert result.net_metered
+        np.testing.assert_allclose(result.qty, peak / 15.)
+
+    def test_peak_period_too_short(self):
+        with self.assertRaises(IndexError):
+            peak_period(self.a[:10], self.period(15), False)
+
+    def test_basic_period(self):
+        a = np.array([1., -2., 3.])
+
+        assert basic_period(a, self.period(1), False).qty == 4.
+        assert basic_period(a, self.period(1), True).qty == 2.
+        assert basic_period_normalized(a, self.period(1), True).qty == 2. / 3.
+
+
+class TestDayClassifier(unittest.TestCase):
+    """Tests for the shared weekend/holiday classifier."""
+
+    def setUp(self):
+        self.cal = USFederalHolidayCalendar()
+        self.classifier = day_classifier(self.cal, 2018, 2020, (0, 1, 2, 3, 4))
+
+    def test_mask_matches_per_timestamp(self):
+        i = pd.date_range(start='2017-12-20', end='2021-01-10', freq='67min')
+        holidays = set(self.cal.holidays(start='2018-01-01', end='2020-12-31').date)
+
+        expected = [ts.date() in holidays or ts.dayofweek > 4 for ts in i]
+
+        np.testing.assert_array_equal(self.classifier.mask(i), expected)
+
+    def test_tz_aware(self):
+        """Days are taken from local wall-clock time."""
+        i = pd.DatetimeIndex(['2019-07-04 22:00', '2019-07-05 22:00']).tz_localize('US/Pacific')
+
+        assert list(self.classifier.mask(i)) == [True, False]
+        assert self.classifier.is_offday(pd.Timestamp('2019-07-04 22:00'))
+
+    def test_shared(self):
+        """Classifiers are shared per calendar, years and weekmask."""
+        assert day_classifier(USFederalHolidayCalendar(), 2018, 2020, [0, 1, 2, 3, 4]) is self.classifier
+        assert day_classifier(self.cal, 2018, 2021, (0, 1, 2, 3, 4)) is not self.classifier
+
+    def test_lazy_years(self):
+        """Holidays are evaluated only for the years an index reaches."""
+        classifier = day_classifier(AbstractHolidayCalendar(rules=[Holiday('L', month=7, day=3)]), 1970, 2200, (0, 1, 2, 3, 4))
+        i = pd.date_range(start='2019-06-30', end='2020-07-04', freq='D')
+
+        assert list(classifier.mask(i)[[3, 369]]) == [True, True]
+        assert classifier._loaded.sum() == 2
+        assert classifier.is_offday('2100-07-03')
+        assert pd.Timestamp('2150-07-03') in classifier.holidays
+
+    def test_shared_by_rules(self):
+        """Calendars with different rules get their own classifier."""
+        a = day_classifier(AbstractHolidayCalendar(rules=[Holiday('A', month=3, day=1)]), 2019, 2019, (0, 1, 2, 3, 4))
+        b = day_classifier(AbstractHolidayCalendar(rules=[Holiday('B', month=9, day=9)]), 2019, 2019, (0, 1, 2, 3, 4))
+
+        assert a is not b
+        assert a.is_offday('2019-03-01') and not a.is_offday('2019-09-09')
+        assert b.is_offday('2019-09-09') and not b.is_offday('2019-03-01')
+
+    def test_holiday_store(self):
+        """Holidays are evaluated once and narrower spans are sliced from wider ones."""
+        wide = get_holidays(self.cal, 2000, 2030)
+
+        assert get_holidays(USFederalHolidayCalendar(), 2000, 2030) is wide
+
+        narrow = get_holidays(self.cal, 2019, 2019)
+        expected = self.cal.holidays(start='2019-01-01', end='2019-12-31')
+        assert list(narrow) == list(expected)
+
+    def test_holiday_store_by_rules(self):
+        """Calendars with the same class and name but different rules are kept apart."""
+        a = AbstractHolidayCalendar(rules=[Holiday('A', month=3, day=1)])
+        b = AbstractHolidayCalendar(rules=[Holiday('B', month=9, day=9)])
+
+        assert list(get_holidays(a, 2019, 2019)) == [pd.Timestamp('2019-03-01')]
+        assert list(get_holidays(b, 2019, 2019)) == [pd.Timestamp('2019-09-09')]
+        assert get_holidays(AbstractHolidayCalendar(rules=[Holiday('A', month=3, day=1)]), 2019, 2019) is get_holidays(a, 2019, 2019)
+
+
+class TestCumulativeTiers(unittest.TestCase):
+    """Tests for pricing against cumulative usage tiers."""
+
+    def setUp(self):
+        # Two periods, two tiers: 10 kWh at the first price, unlimited after
+        self.struct = np.zeros((2, 2, TierIndex.ARRAY_LENGTH), dtype=np.float32)
+        self.struct[:, 0, TierIndex.MAX] = 10.
+        self.struct[0, :, TierIndex.RATE] = [0.1, 0.2]
+        self.struct[1, :, TierIndex.RATE] = [0.3, 0.5]
+        self.struct[:, :, TierIndex.SELL] = [0.05, 0.04]
+
+    def costs(self, qty, periods, bounds, per_period=True):
+        return cumulative_tier_costs(
+            np.asarray(qty, dtype=np.float64),
+            np.asarray(periods, dtype=np.uint8),
+            np.asarray(bounds, dtype=np.intp),
+            self.struct,
+            per_period
+        )
+
+    def test_split_at_boundary(self):
+        """An interval crossing a tier max is split between the tiers."""
+        np.testing.assert_allclose(self.costs([6., 6., 3.], [0, 0, 0], [0, 3]), [0.6, 0.4 + 0.4, 0.6])
+
+    def test_resets_each_segment(self):
+        np.testing.assert_allclose(self.costs([12., 12.], [0, 0], [0, 1, 2]), [1.4, 1.4])
+
+    def test_per_period(self):
+        """Usage accumulates per TOU period unless told otherwise."""
+        np.testing.assert_allclose(self.costs([8., 4.], [0, 1], [0, 2]), [0.8, 1.2])
+        np.testing.assert_allclose(self.costs([8., 4.], [0, 1], [0, 2], False), [0.8, 0.6 + 1.0])
+
+    def test_exports(self):
+        """Exports use the sell price of the tier reached and do not reduce usage."""
+        np.testing.assert_allclose(self.costs([11., -2., 1.], [0, 0, 0], [0, 3]), [1.2, -0.08, 0.2])
+
+
+class TestWindow(unittest.TestCase):
+    """Tests for segmentation and the segmented `window` kernel."""
+
+    def setUp(self):
+        self.index = pd.date_range(start='2019-01-30 22:00', end='2019-03-02 02:00', freq='15min')
+        rng = np.random.RandomState(11)
+        self.qty = rng.uniform(-3., 10., self.index.size)
+
+        self.struct = np.zeros((2, 2, TierIndex.ARRAY_LENGTH), dtype=np.float32)
+        self.struct[:, 0, TierIndex.MAX] = 5.
+        self.struct[:, :, TierIndex.RATE] = [[0.1, 0.2], [0.3, 0.4]]
+        self.struct[:, :, TierIndex.ADJ] = 0.01
+        self.struct[:, :, TierIndex.SELL] = 0.05
+        self.periods = (self.index.hour.values >= 16).astype(np.uint8)
+
+    def test_period_bounds(self):
+        for by, freq in (('hour', 'h'), ('day', 'D'), ('month', 'M')):
+            bounds = period_bounds(self.index, by)
+            expected = self.index.to_series().groupby(pd.Grouper(freq=freq)).size()
+            np.testing.assert_array_equal(np.diff(bounds), expected[expected > 0].values)
+
+        with self.assertRaises(ValueError):
+            period_bounds(self.index, 'fortnight')
+
+    def test_billing_cycles(self):
+        reads = ['2019-02-12', '2019-02-27 06:00']
+        bounds = period_bounds(self.index, lambda i: billing_cycle_keys(i, reads))
+
+        assert list(self.index[bounds[1:-1]]) == [pd.Timestamp(r) for r in reads]
+
+    def test_energy_per_interval(self):
+        """Single-interval segments match the vectorized energy path."""
+        bounds = np.arange(self.index.size + 1, dtype=np.intp)
+        np.testing.assert_allclose(
+            energy_cost(self.qty, bounds, self.periods, self.struct),
+            calculate_period_costs(self.qty, self.periods, self.struct),
+            rtol=1e-12
+        )
+
+    def test_tou_demand(self):
+        bounds = period_bounds(self.index, 'month')
+        out = tou_demand_cost(self.qty, bounds, self.periods, self.struct, 4, 0.25, assign_end)
+
+        for s in range(bounds.size - 1):
+            seg = self.qty[bounds[s]:bounds[s + 1]]
+            idx, peak = brute_peak(seg, 4)
+            tou = self.struct[self.periods[bounds[s] + idx]]
+            row = tou[0] if peak / 4 <= 5. else tou[1]
+
+            self.assertAlmostEqual(out[bounds[s + 1] - 1], peak / 4 * (row[TierIndex.RATE] + row[TierIndex.ADJ]), places=5)
+            assert not out[bounds[s]:bounds[s + 1] - 1].any()
+
+
+    def test_flat_demand(self):
+        """Each month's peak is priced at the flat period of the month it falls in, spread over the month."""
+        bounds = period_bounds(self.index, 'month')
+        months = (self.index.month.values % 2).astype(np.uint8)
+        out = flat_demand_cost(self.qty, bounds, months, self.struct, 4, 0.25)
+
+        for s in range(bounds.size - 1):
+            seg = self.qty[bounds[s]:bounds[s + 1]]
+            _, peak = brute_peak(seg, 4)
+            tou = self.struct[months[bounds[s]]]
+            row = tou[0] if peak / 4 <= 5. else tou[1]
+
+            self.assertAlmostEqual(out[bounds[s]:bounds[s + 1]].sum(), peak / 4 * (row[TierIndex.RATE] + row[TierIndex.ADJ]), places=4)
+            np.testing.assert_allclose(out[bounds[s]:bounds[s + 1]], out[bounds[s]])
+
+
+class TestWarmup(unittest.TestCase):
+
+    def test_warmup(self):
+        """Warmup compiles the kernels a bill needs."""
+        import openei_rates
+        from openei_rates.helpers import window
+
+        assert openei_rates.warmup() > 0.
+        assert window.window.signatures
+        assert not window.window_parallel.signatures
+
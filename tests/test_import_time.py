@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Import-time benchmark for `openei_rates`."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds, measured inside a fresh interpreter (startup excluded)
+IMPORT_BUDGET = float(os.environ.get('OPENEI_RATES_IMPORT_BUDGET', 0.5))
+
+HEAVY = ('numba', 'pandas', 'pandas.tseries.holiday', 'requests')
+
+PROBE = '''
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def probe(module):
+    out = subprocess.check_output(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY)],
+        cwd=ROOT
+    )
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+    """Importing the package and its client must not pull in the pricing stack."""
+
+    def test_package(self):
+        result = probe('openei_rates')
+
+        assert result['loaded'] == []
+        assert result['elapsed'] < IMPORT_BUDGET, result
+
+    def test_api(self):
+        result = probe('openei_rates.api')
+
+        assert result['loaded'] == []
+        assert result['elapsed'] < IMPORT_BUDGET, result
+
+    def test_client(self):
+        """The high-level client only loads pandas and numba once a schedule is built."""
+        result = probe('openei_rates.openei_rates')
+
+        assert result['loaded'] == []
+        assert result['elapsed'] < IMPORT_BUDGET, result
+
+    def test_no_root_logging(self):
+        out = subprocess.check_output(
+            [sys.executable, '-c', 'import logging, openei_rates; print(len(logging.getLogger().handlers))'],
+            cwd=ROOT
+        )
+        assert out.decode().strip() == '0'
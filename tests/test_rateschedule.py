@@ -5,9 +5,15 @@ from openei_rates import logger
 from openei_rates import openei_rates
 from openei_rates.rateschedule import RateSchedule
 from openei_rates import cli
+from openei_rates.helpers.costs import calculate_tou_cost
+from openei_rates.helpers.sched import get_tou_periods
+from openei_rates.helpers.threads import max_threads
 import pandas as pd
 import numpy as np
 
+from . import load_fixture
+
+
 class TestRateSchedule(unittest.TestCase):
     """Tests for `openei_rates` package."""
 
@@ -56,8 +62,337 @@ class TestRateSchedule(unittest.TestCase):
         print(df.head())
 
 
+class TestRateScheduleOffline(unittest.TestCase):
+    """Tests for `RateSchedule` that use local fixtures instead of the API."""
+
+    def setUp(self):
+        self.rs = RateSchedule(load_fixture('tou_energy.json'))
 
+        i = pd.date_range(start='2019-05-25', end='2019-07-10', freq='5min')
+        rng = np.random.RandomState(42)
+        self.s = pd.Series(data=rng.uniform(-2., 8., i.size), index=i)
 
+    def test_energy_cost_matches_per_row(self):
+        """The vectorized energy path should match pricing one interval at a time."""
+        rs = self.rs
+        interval_hours = 5. / 60.
 
+        expected = []
+        for ts, qty in self.s.items():
+            weekend = ts.normalize() in rs.holidays or ts.dayofweek not in rs.weekmask
+            sched = rs.energy_weekend_schedule if weekend else rs.energy_weekday_schedule
+            expected.append(calculate_tou_cost(qty * interval_hours, ts.month, ts.hour, sched, rs.energy_rates))
+
+        df = rs.get_costs(self.s, agg='day')
+
+        np.testing.assert_allclose(
+            df['energy_cost'].values,
+            pd.Series(expected, index=self.s.index).groupby(pd.Grouper(freq='D')).sum().values,
+            rtol=1e-12
+        )
+
+    def test_time_features(self):
+        """Holidays and weekends should both be flagged."""
+        i = pd.DatetimeIndex(['2019-07-04 12:00', '2019-07-05 12:00', '2019-07-06 12:00'])
+        months, hours, is_weekend = self.rs.time_features(i)
+
+        assert list(months) == [7, 7, 7]
+        assert list(hours) == [12, 12, 12]
+        assert list(is_weekend) == [True, False, True]
+
+    def test_shared_day_classifier(self):
+        """Schedules on the same calendar share one classifier."""
+        assert RateSchedule(load_fixture('tou_demand.json')).day_classifier is self.rs.day_classifier
+
+    def test_tou_periods(self):
+        """Periods from the cached hourly tables match resolving each timestamp."""
+        i = pd.date_range(start='2019-11-20', end='2020-03-10', freq='7min')
+        months, hours, is_weekend = self.rs.time_features(i)
+        expected = get_tou_periods(months, hours, is_weekend, self.rs.energy_weekday_schedule, self.rs.energy_weekend_schedule)
+
+        np.testing.assert_array_equal(self.rs.tou_periods(i), expected)
+        assert self.rs.hourly_periods(2020).size == 8784
+        assert self.rs.hourly_periods(2019) is self.rs.hourly_periods(2019)
+
+    def test_hourly_prices(self):
+        """Hourly prices are only defined without usage tiers."""
+        with self.assertRaises(ValueError):
+            self.rs.hourly_prices(2019)
+
+        rs = RateSchedule(load_fixture('tou_demand.json'))
+        buy, sell = rs.hourly_prices(2019)
+
+        assert buy.size == 8760
+        # July 3rd, 5pm is summer peak; July 4th is a holiday
+        hour = (pd.Timestamp('2019-07-03 17:00') - pd.Timestamp('2019-01-01')) // pd.Timedelta('1h')
+        np.testing.assert_allclose(buy[hour], np.float32(0.1611) + np.float32(0.002))
+        np.testing.assert_allclose(buy[hour + 24], np.float32(0.0969))
+
+
+class TestRateStructure(unittest.TestCase):
+    """Tests for `RateSchedule.build_tiered_structure`."""
+
+    struct = [
+        [{'rate': 0.1}],
+        [{'max': 100, 'rate': 0.2}, {'max': 200, 'rate': 0.3, 'adj': 0.01}, {'rate': 0.4}],
+        [{'max': 50, 'rate': 0.5, 'sell': 0.05}],
+    ]
+
+    def test_ragged(self):
+        from openei_rates.data_objects import TierIndex
+
+        a, counts = RateSchedule.build_tiered_structure(self.struct)
+
+        assert a.shape == (3, 3, TierIndex.ARRAY_LENGTH)
+        assert a.dtype == np.float32
+        np.testing.assert_array_equal(counts, [1, 3, 1])
+        assert np.isinf(a[0, 1:, TierIndex.MAX]).all()
+        np.testing.assert_array_equal(a[2, 2, 1:], a[2, 0, 1:])
+
+        # The array's tier counts are read back from the sentinels
+        np.testing.assert_array_equal(RateSchedule.build_tiered_structure(a)[1], counts)
+
+    def test_ragged_pricing(self):
+        """Padding does not change which tier a quantity is priced at."""
+        from openei_rates.helpers.sched import tier_cost
+
+        a = RateSchedule.build_rate_structure(self.struct)
+        for qty, period, expected in ((500., 0, 50.), (150., 1, 150. * 0.31), (80., 2, 40.), (-10., 2, -0.5)):
+            self.assertAlmostEqual(tier_cost(qty, a[period]), expected, places=4)
+
+
+class TestStructuresAt(unittest.TestCase):
+    """Tests for `RateSchedule.get_structures_at`."""
+
+    def setUp(self):
+        self.rs = RateSchedule(load_fixture('tou_demand.json'))
+        self.index = pd.date_range(start='2019-06-28', end='2019-07-06', freq='h')
+
+    def test_matches_tou_periods(self):
+        for name, stype, rates in (
+            ('demand', RateSchedule.SType.TOU_DEMAND, self.rs.demand_rates),
+            ('fd', RateSchedule.SType.FLAT_DEMAND, self.rs.flat_demand_rates),
+            ('coincident', RateSchedule.SType.COINCIDENT, self.rs.coincident_rates),
+        ):
+            periods, structures = self.rs.get_structures_at(self.index, name)
+            np.testing.assert_array_equal(periods, self.rs.tou_periods(self.index, stype))
+            np.testing.assert_array_equal(structures, rates[periods])
+
+    def test_single_timestamp(self):
+        """`get_structure_at` is one row of the batch lookup, holidays included."""
+        periods, structures = self.rs.get_structures_at(self.index, 'demand')
+        for i in (0, 17, 24 * 6 + 17):     # 2019-07-04 is a holiday
+            np.testing.assert_array_equal(self.rs.get_structure_at(self.index[i], 'demand'), structures[i])
+
+    def test_bad_schedule_type(self):
+        with self.assertRaises(AttributeError):
+            self.rs.get_structures_at(self.index, 'nope')
+
+
+class TestDemandCosts(unittest.TestCase):
+    """Tests for demand charges in `RateSchedule.get_costs`."""
+
+    def setUp(self):
+        info = load_fixture('tou_demand.json')
+        for key in ('coincidentratestructure', 'coincidentrateschedule'):
+            info.pop(key)
+        self.rs = RateSchedule(info)
+
+        i = pd.date_range(start='2019-07-01', end='2019-07-31 23:55', freq='5min')
+        self.s = pd.Series(data=1.0, index=i)
+        # A 15-minute, 20 kW peak on a summer weekday afternoon
+        self.s['2019-07-10 17:00':'2019-07-10 17:10'] = 20.0
+
+    def test_tou_demand_charge(self):
+        """A single peak sets both the TOU and flat demand charges."""
+        df = self.rs.get_costs(self.s, agg='month')
+
+        np.testing.assert_allclose(df['tou_demand_cost'].iloc[0], 20.0 * 12.25)
+        np.testing.assert_allclose(df['flat_demand_cost'].iloc[0], 20.0 * 9.5)
+        np.testing.assert_allclose(df['fixed_cost'].iloc[0], 150.0)
+
+    def test_month_end_assignment(self):
+        """Monthly charges can be booked on the last interval instead of spread."""
+        spread = self.rs.get_costs(self.s, agg='day')
+        booked = self.rs.get_costs(self.s, agg='day', distribute_monthly=False)
+
+        np.testing.assert_allclose(spread['tou_demand_cost'].sum(), booked['tou_demand_cost'].sum())
+        assert booked['tou_demand_cost'].iloc[:-1].sum() == 0.
+
+
+class TestCoincidentCosts(unittest.TestCase):
+    """Tests for coincident charges in `RateSchedule.get_costs`."""
+
+    def setUp(self):
+        self.rs = RateSchedule(load_fixture('tou_demand.json'))
+
+        i = pd.date_range(start='2019-06-25', end='2019-07-05', freq='15min')
+        rng = np.random.RandomState(13)
+        self.s = pd.Series(rng.uniform(-1., 25., i.size), index=i)
+
+    def test_matches_per_row(self):
+        rs = self.rs
+        expected = [
+            calculate_tou_cost(qty, ts.month, ts.hour, rs.coincident_schedule, rs.coincident_rates)
+            for ts, qty in self.s.items()
+        ]
+
+        df = rs.get_costs(self.s, agg='day')
+        np.testing.assert_allclose(
+            df['coincident_cost'].values,
+            pd.Series(expected, index=self.s.index).groupby(pd.Grouper(freq='D')).sum().values,
+            rtol=1e-12
+        )
+
+    def test_system_peaks(self):
+        """Coincident demand is only read at the intervals containing the system peaks."""
+        peaks = pd.DatetimeIndex(['2019-06-28 17:20', '2019-07-02 18:00', '2019-08-01 17:00'])
+        df = self.rs.get_costs(self.s, system_peaks=peaks)
+
+        expected = 3.0 * (self.s['2019-06-28 17:15'] + self.s['2019-07-02 18:00'])
+        np.testing.assert_allclose(df['coincident_cost'].sum(), expected)
+
+        batch = self.rs.get_batch_costs(np.vstack((self.s.values, self.s.values)), self.s.index, system_peaks=peaks)
+        np.testing.assert_allclose(batch.loc[1, 'coincident_cost'].values, df['coincident_cost'].values)
+
+    def test_system_peaks_in_one_interval(self):
+        """Two peaks in the same interval charge it once."""
+        peaks = ['2019-06-28 17:20', '2019-06-28 17:25']
+        expected = 3.0 * self.s['2019-06-28 17:15']
+
+        df = self.rs.get_costs(self.s, system_peaks=peaks)
+        np.testing.assert_allclose(df['coincident_cost'].sum(), expected)
+
+        batch = self.rs.get_batch_costs(self.s.values, self.s.index, system_peaks=peaks)
+        np.testing.assert_allclose(batch['coincident_cost'].sum(), expected)
+
+    def test_peak_positions_time_zones(self):
+        """Peaks and index may differ in whether they carry a time zone."""
+        naive = self.s.index
+        aware = naive.tz_localize('US/Pacific')
+        peaks = pd.DatetimeIndex(['2019-06-28 17:20', '2019-07-02 18:00'])
+        expected = RateSchedule.peak_positions(naive, peaks)
+
+        np.testing.assert_array_equal(RateSchedule.peak_positions(naive, peaks.tz_localize('US/Pacific')), expected)
+        np.testing.assert_array_equal(RateSchedule.peak_positions(aware, peaks), expected)
+        np.testing.assert_array_equal(RateSchedule.peak_positions(aware, peaks.tz_localize('US/Pacific')), expected)
+
+
+class TestRatchet(unittest.TestCase):
+    """Tests for ratcheted billing demand."""
+
+    def setUp(self):
+        self.rs = RateSchedule(load_fixture('tou_demand.json'))
+
+    def test_clip_matches_peak(self):
+        """With no trailing peaks, billing demand is the peak clipped like `Peak.clip`."""
+        from openei_rates.data_objects import Peak
+
+        qty = np.array([[0.5, 5., 42., 499., 900.]])
+        keys = np.arange(5) + 2019 * 12
+
+        rs = RateSchedule(load_fixture('tou_demand.json'))
+        rs.demand_ratchet_pct[:] = 0.0
+        billed = rs.billing_demands(qty, keys)[0]
+
+        for q, b in zip(qty[0], billed):
+            expected = Peak(0, q, 0, False, 0, q).clip(ceiling=rs.demand_maximum, floor=rs.demand_minimum)
+            self.assertAlmostEqual(b, expected)
+
+    def test_trailing_peak(self):
+        """A summer month is billed at 80% of the highest peak in the previous 11 months."""
+        # Jan 2019 .. Aug 2020
+        keys = np.arange(2019 * 12, 2019 * 12 + 20)
+        peaks = np.full((1, keys.size), 10.)
+        peaks[0, 1] = 100.                          # Feb 2019
+
+        billed = self.rs.billing_demands(peaks, keys)[0]
+
+        self.assertAlmostEqual(billed[5], 80., places=5)    # Jun 2019
+        self.assertAlmostEqual(billed[8], 80., places=5)    # Sep 2019
+        self.assertAlmostEqual(billed[9], 10.)              # Oct 2019 has no ratchet
+        self.assertAlmostEqual(billed[17], 10.)             # Jun 2020 is past the lookback
+
+    def test_history(self):
+        """Peaks from before the first month count toward the ratchet."""
+        billed = self.rs.billing_demands([[10.]], [2019 * 12 + 6], [[200., 50.]], [2018 * 12 + 6, 2019 * 12])
+        self.assertAlmostEqual(billed[0, 0], 40., places=5)
+
+    def test_legacy_spelling(self):
+        """Ratchets stored under the old misspelled key are still read."""
+        info = load_fixture('tou_demand.json')
+        info['demandrachetpercentage'] = info.pop('demandratchetpercentage')
+
+        np.testing.assert_array_equal(RateSchedule(info).demand_ratchet_pct, self.rs.demand_ratchet_pct)
+        assert self.rs.demand_ratchet_pct.any()
+
+    def test_batch_matches_get_costs(self):
+        index = pd.date_range(start='2019-01-01', end='2019-09-30 23:45', freq='15min')
+        rng = np.random.RandomState(7)
+        loads = rng.uniform(0., 30., (3, index.size))
+        loads[:, 96 * 40] = 400.     # A February spike ratchets the summer
+
+        batch = self.rs.get_batch_costs(loads, index, ratchet=True)
+        plain = self.rs.get_batch_costs(loads, index)
+        assert (batch['tou_demand_cost'].values >= plain['tou_demand_cost'].values - 1e-9).all()
+        assert (batch['tou_demand_cost'].values > plain['tou_demand_cost'].values + 1e-9).any()
+
+        columns = ['tou_demand_cost', 'flat_demand_cost', 'total']
+        for i in range(3):
+            single = self.rs.get_costs(pd.Series(loads[i], index=index), ratchet=True)
+            np.testing.assert_allclose(batch.loc[i, columns].values, single[columns].values, rtol=1e-9)
+
+
+class TestBatchCosts(unittest.TestCase):
+    """Tests for `RateSchedule.get_batch_costs`."""
+
+    def setUp(self):
+        self.rs = RateSchedule(load_fixture('tou_demand.json'))
+
+        self.index = pd.date_range(start='2019-05-01', end='2019-08-31 23:45', freq='15min')
+        rng = np.random.RandomState(3)
+        self.loads = rng.uniform(-1., 25., (4, self.index.size))
+
+    def test_matches_get_costs(self):
+        """Each meter's batch charges should match pricing it on its own."""
+        batch = self.rs.get_batch_costs(self.loads, self.index, meters=list('abcd'))
+
+        columns = ['qty', 'energy_cost', 'tou_demand_cost', 'coincident_cost', 'flat_demand_cost', 'fixed_cost', 'total']
+        for i, meter in enumerate('abcd'):
+            single = self.rs.get_costs(pd.Series(self.loads[i], index=self.index), agg='month')
+            np.testing.assert_allclose(
+                batch.loc[meter, columns].values,
+                single[columns].values,
+                rtol=1e-9
+            )
+
+    def test_cumulative_tiers_match_get_costs(self):
+        rs = RateSchedule(load_fixture('tou_energy.json'))
+        batch = rs.get_batch_costs(self.loads, self.index, meters=list('abcd'), cumulative_tiers=True)
+
+        for i, meter in enumerate('abcd'):
+            single = rs.get_costs(pd.Series(self.loads[i], index=self.index), cumulative_tiers=True)
+            np.testing.assert_allclose(batch.loc[meter, 'energy_cost'].values, single['energy_cost'].values, rtol=1e-9)
+
+    def test_parallel_matches_serial(self):
+        """Thread count and parallel mode must not change any result."""
+        serial = self.rs.get_batch_costs(self.loads, self.index, threads=1)
+        pd.testing.assert_frame_equal(self.rs.get_batch_costs(self.loads, self.index), serial)
+
+        s = pd.Series(self.loads[0], index=self.index)
+        for cumulative in (False, True):
+            single = self.rs.get_costs(s, agg='day', cumulative_tiers=cumulative)
+            pd.testing.assert_frame_equal(
+                self.rs.get_costs(s, agg='day', cumulative_tiers=cumulative, parallel=True, threads=max_threads()),
+                single,
+                check_exact=True
+            )
+
+    def test_bad_threads(self):
+        with self.assertRaises(ValueError):
+            self.rs.get_batch_costs(self.loads, self.index, threads=0)
+
+    def test_bad_shape(self):
+        with self.assertRaises(ValueError):
+            self.rs.get_batch_costs(self.loads[:, :-1], self.index)
 
-    
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `openei_rates.snapshot`."""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from openei_rates.rateschedule import RateSchedule
+from openei_rates.snapshot import Snapshot, import_snapshot, iter_dump
+
+from . import load_fixture
+
+
+class TestSnapshot(unittest.TestCase):
+    """Tests for importing and memory-mapping URDB dumps."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.items = [load_fixture('tou_energy.json'), load_fixture('tou_demand.json')]
+
+        # URDB dumps wrap ids and dates in extended JSON
+        dumped = dict(self.items[1])
+        dumped['startdate'] = {'$date': dumped['startdate'] * 1000}
+        self.dump = os.path.join(self.path, 'usurdb.json')
+        with open(self.dump, 'w') as f:
+            json.dump([self.items[0], dumped], f)
+
+        self.snap_dir = os.path.join(self.path, 'snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_iter_dump_json_lines(self):
+        """Line-delimited dumps stream the same rates as arrays."""
+        lines = os.path.join(self.path, 'usurdb.jsonl')
+        with open(lines, 'w') as f:
+            for item in self.items:
+                f.write(json.dumps(item) + '\n')
+
+        assert [d['label'] for d in iter_dump(lines)] == [d['label'] for d in iter_dump(self.dump)]
+
+    def test_iter_dump_csv(self):
+        """CSV exports have their flattened rate structures rebuilt."""
+        path = os.path.join(self.path, 'usurdb.csv')
+        with open(path, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow([
+                'label', 'startdate', 'energyweekdayschedule',
+                'energyratestructure/period0/tier0max', 'energyratestructure/period0/tier0rate',
+                'energyratestructure/period0/tier1rate', 'energyratestructure/period1/tier0rate',
+            ])
+            w.writerow(['abc', '2019-01-01 00:00:00', json.dumps([[0] * 24] * 12), '10', '0.1', '0.2', '0.3'])
+
+        d = next(iter_dump(path))
+
+        assert d['label'] == 'abc'
+        assert d['startdate'] == 1546300800
+        assert d['energyratestructure'] == [[{'max': 10, 'rate': 0.1}, {'rate': 0.2}], [{'rate': 0.3}]]
+
+    def test_csv_text_columns(self):
+        """Labels and names that look like numbers stay text, and the import keeps them."""
+        path = os.path.join(self.path, 'usurdb.csv')
+        with open(path, 'w', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['label', 'name', 'eia', 'fixedmonthlycharge', 'energyweekdayschedule', 'energyratestructure/period0/tier0rate'])
+            w.writerow(['539112345678901234567890', 'Infinity', '14328', '9.5', json.dumps([[0] * 24] * 12), '0.1'])
+            w.writerow(['53911234e5', '1', '14328', '', json.dumps([[0] * 24] * 12), '0.2'])
+
+        d = next(iter_dump(path))
+        assert d['label'] == '539112345678901234567890'
+        assert d['name'] == 'Infinity'
+        assert d['eia'] == 14328
+        assert d['fixedmonthlycharge'] == 9.5
+
+        assert import_snapshot(path, self.snap_dir) == 2
+
+        snap = Snapshot(self.snap_dir)
+        assert snap.rate_info('53911234e5')['name'] == '1'
+        assert '539112345678901234567890' in snap
+
+    def test_round_trip(self):
+        """Schedules built from a snapshot price the same as ones built from the API dict."""
+        assert import_snapshot(self.dump, self.snap_dir) == 2
+
+        snap = Snapshot(self.snap_dir)
+        assert len(snap) == 2
+        assert 'test-tou-demand' in snap
+        assert 'nope' not in snap
+
+        i = pd.date_range(start='2019-06-01', end='2019-07-31 23:45', freq='15min')
+        s = pd.Series(np.random.RandomState(1).uniform(0., 20., i.size), index=i)
+
+        for item in self.items:
+            info = dict(item)
+            for key in ('coincidentratestructure', 'coincidentrateschedule'):
+                info.pop(key, None)
+            expected = RateSchedule(info).get_costs(s, agg='month')
+
+            snapped = snap.rate_info(item['label'])
+            for key in ('coincidentratestructure', 'coincidentrateschedule'):
+                snapped.pop(key, None)
+            rs = RateSchedule(snapped)
+
+            # Built on the memory map, not copied
+            assert np.shares_memory(rs.energy_rates, snap.tiers)
+            assert np.shares_memory(rs.energy_weekday_schedule, snap.schedules)
+
+            pd.testing.assert_frame_equal(rs.get_costs(s, agg='month'), expected)
+
+    def test_ragged_tiers(self):
+        """Periods with fewer tiers are padded without changing which tier applies."""
+        item = load_fixture('tou_energy.json')
+        item['label'] = 'ragged'
+        item['energyratestructure'] = [
+            [{'max': 1.0, 'rate': 0.1}, {'max': 2.0, 'rate': 0.2}, {'rate': 0.3}],
+            [{'max': 1.0, 'rate': 0.5}],
+        ]
+        with open(self.dump, 'w') as f:
+            json.dump([item], f)
+        import_snapshot(self.dump, self.snap_dir)
+
+        rates = Snapshot(self.snap_dir).rate_info('ragged')['energyratestructure']
+
+        assert rates.shape == (2, 3, 4)
+        np.testing.assert_array_equal(rates[1, :, 1], [0.5, 0.5, 0.5])
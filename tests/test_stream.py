@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `openei_rates.stream`."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from openei_rates.rateschedule import RateSchedule
+from openei_rates.stream import BillStream, iter_csv
+
+from . import demand_schedules, load_fixture
+
+
+def chunked(s, size):
+    return [s.iloc[i:i + size] for i in range(0, s.size, size)]
+
+
+class TestBillStream(unittest.TestCase):
+    """Streaming billing should match billing the whole series at once."""
+
+    def setUp(self):
+        self.rs, self.coincident = demand_schedules()
+        self.tiered = RateSchedule(load_fixture('tou_energy.json'))
+
+        i = pd.date_range(start='2019-05-20', end='2019-09-03 07:55', freq='5min')
+        rng = np.random.RandomState(5)
+        self.s = pd.Series(rng.uniform(-2., 20., i.size), index=i)
+
+    def test_matches_get_costs(self):
+        for rs in (self.rs, self.tiered):
+            for cumulative in (False, True):
+                full = rs.get_costs(self.s, cumulative_tiers=cumulative)
+                for size in (50, 777, self.s.size):
+                    streamed = pd.DataFrame(list(rs.iter_costs(chunked(self.s, size), cumulative_tiers=cumulative)))
+
+                    assert list(streamed.index) == list(full.index)
+                    np.testing.assert_allclose(streamed.values, full.values, rtol=1e-9)
+
+    def test_ratchet_matches_get_costs(self):
+        s = self.s.copy()
+        s['2019-05-25 12:00':'2019-05-25 13:00'] = 200.
+        full = self.rs.get_costs(s, ratchet=True)
+        streamed = pd.DataFrame(list(self.rs.iter_costs(chunked(s, 777), ratchet=True)))
+        np.testing.assert_allclose(streamed.values, full.values, rtol=1e-9)
+
+    def test_peak_across_chunks(self):
+        """A demand window split between two chunks is still found."""
+        s = pd.Series(1.0, index=pd.date_range(start='2019-07-01', end='2019-07-31 23:55', freq='5min'))
+        s['2019-07-10 17:00':'2019-07-10 17:10'] = 20.0
+        split = s.index.get_loc(pd.Timestamp('2019-07-10 17:05'))
+
+        month = list(self.rs.iter_costs([s.iloc[:split], s.iloc[split:]]))[0]
+
+        np.testing.assert_allclose(month['tou_demand_cost'], 20.0 * 12.25)
+
+    def test_coincident_matches_batch(self):
+        batch = self.coincident.get_batch_costs(self.s.values, self.s.index)
+        streamed = pd.DataFrame(list(self.coincident.iter_costs(chunked(self.s, 1000))))
+
+        np.testing.assert_allclose(streamed['coincident_cost'].values, batch['coincident_cost'].values, rtol=1e-9)
+
+    def test_months_close_as_they_end(self):
+        stream = BillStream(self.rs)
+
+        assert stream.feed(self.s['2019-05-20':'2019-05-31']) == []
+        closed = stream.feed(self.s['2019-06-01':'2019-07-02'])
+        assert [m.name for m in closed] == [pd.Timestamp('2019-05-31'), pd.Timestamp('2019-06-30')]
+        assert len(stream.peak_history) == 2
+
+    def test_out_of_order(self):
+        stream = BillStream(self.rs)
+        stream.feed(self.s.iloc[100:200])
+
+        with self.assertRaises(ValueError):
+            stream.feed(self.s.iloc[150:300])
+
+    def test_csv(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+
+        f = os.path.join(path, 'load.csv')
+        self.s.rename('kw').to_csv(f, index_label='timestamp')
+
+        streamed = pd.DataFrame(list(self.rs.iter_costs(iter_csv(f, column='kw', chunksize=5000))))
+        np.testing.assert_allclose(streamed.values, self.rs.get_costs(self.s).values, rtol=1e-9)